@@ -0,0 +1,31 @@
+"""add icons (text[]) to cartas_diversas
+
+Revision ID: 20261017_01
+Revises: 20251021_01
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_01'
+down_revision = '20251021_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Ícones sugeridos a partir de 'presente'; preenchidos pela aplicação
+    # (POST /cartas/api/admin/icons/recompute). NULL = ainda não calculado.
+    op.add_column(
+        'cartas_diversas',
+        sa.Column('icons', postgresql.ARRAY(sa.Text()), nullable=True),
+        schema='public'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('cartas_diversas', 'icons', schema='public')
@@ -0,0 +1,31 @@
+"""add thumb_widths (integer[]) to cartas_diversas
+
+Revision ID: 20261017_02
+Revises: 20261017_01
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_02'
+down_revision = '20261017_01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Larguras das variantes WebP (<miniatura>_w{largura}.webp) gravadas junto com
+    # urlcarta_pq. NULL = somente a miniatura JPEG (gerada antes desta revisão).
+    op.add_column(
+        'cartas_diversas',
+        sa.Column('thumb_widths', postgresql.ARRAY(sa.Integer()), nullable=True),
+        schema='public'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('cartas_diversas', 'thumb_widths', schema='public')
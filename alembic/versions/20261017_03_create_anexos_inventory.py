@@ -0,0 +1,45 @@
+"""create anexos (inventory of bucket objects) and index cartas_diversas.urlcarta
+
+Revision ID: 20261017_03
+Revises: 20261017_02
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_03'
+down_revision = '20261017_02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Inventário dos objetos sob cartas/ no MinIO; preenchido pela aplicação
+    # (uploads/miniaturas/exclusões) e pela reconciliação
+    # (POST /relatorios/api/anexos/reconcile). Vazio = ainda não reconciliado.
+    op.create_table(
+        'anexos',
+        sa.Column('object_name', sa.Text(), primary_key=True),
+        sa.Column('id_carta', sa.Integer(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('content_type', sa.Text(), nullable=True),
+        sa.Column('last_modified', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('kind', sa.Text(), nullable=False),
+        sa.Column('checksum', sa.Text(), nullable=True),
+        sa.CheckConstraint("kind IN ('original', 'thumb')", name='ck_anexos_kind'),
+        schema='public'
+    )
+    op.create_index('idx_anexos_id_carta', 'anexos', ['id_carta'], schema='public')
+    op.create_index('idx_anexos_kind', 'anexos', ['kind'], schema='public')
+    # Relatórios cruzam anexos.object_name com cartas_diversas.urlcarta
+    op.create_index('idx_cartas_urlcarta', 'cartas_diversas', ['urlcarta'], schema='public')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_cartas_urlcarta', table_name='cartas_diversas', schema='public')
+    op.drop_index('idx_anexos_kind', table_name='anexos', schema='public')
+    op.drop_index('idx_anexos_id_carta', table_name='anexos', schema='public')
+    op.drop_table('anexos', schema='public')
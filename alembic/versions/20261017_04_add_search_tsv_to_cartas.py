@@ -0,0 +1,57 @@
+"""full-text search on cartas_diversas (search_tsv + GIN) and cod_carta index
+
+Revision ID: 20261017_04
+Revises: 20261017_03
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_04'
+down_revision = '20261017_03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # Configuração 'portuguese' com unaccent antes do stemmer: "João" e "joao" geram o mesmo lexema.
+    # to_tsvector com configuração fixa é IMMUTABLE, o que permite a coluna gerada.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_ts_config c JOIN pg_namespace n ON n.oid = c.cfgnamespace
+                WHERE c.cfgname = 'pt_unaccent' AND n.nspname = 'public'
+            ) THEN
+                CREATE TEXT SEARCH CONFIGURATION public.pt_unaccent (COPY = pg_catalog.portuguese);
+                ALTER TEXT SEARCH CONFIGURATION public.pt_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH public.unaccent, portuguese_stem;
+            END IF;
+        END
+        $$;
+    """)
+    # Pesos: nome (A) > presente (B) > observação (C), usados no ranking
+    op.execute("""
+        ALTER TABLE public.cartas_diversas
+        ADD COLUMN search_tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('public.pt_unaccent', coalesce(nome, '')), 'A') ||
+            setweight(to_tsvector('public.pt_unaccent', coalesce(presente, '')), 'B') ||
+            setweight(to_tsvector('public.pt_unaccent', coalesce(observacao, '')), 'C')
+        ) STORED
+    """)
+    op.create_index(
+        'idx_cartas_search_tsv', 'cartas_diversas', ['search_tsv'],
+        schema='public', postgresql_using='gin'
+    )
+    # Caminho numérico da pesquisa (id_carta já é UNIQUE)
+    op.create_index('idx_cartas_cod_carta', 'cartas_diversas', ['cod_carta'], schema='public')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_cartas_cod_carta', table_name='cartas_diversas', schema='public')
+    op.drop_index('idx_cartas_search_tsv', table_name='cartas_diversas', schema='public')
+    op.drop_column('cartas_diversas', 'search_tsv', schema='public')
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS public.pt_unaccent")
@@ -0,0 +1,38 @@
+"""trigram index on unaccented, lowercased cartas_diversas.nome
+
+Revision ID: 20261017_05
+Revises: 20261017_04
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_05'
+down_revision = '20261017_04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent(text) é STABLE (depende do search_path); com dicionário fixo e qualificado
+    # o resultado não muda, então o wrapper IMMUTABLE pode ser usado em índice de expressão.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION public.immutable_unaccent(text)
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+    # Atende LIKE '%...%' e os operadores de semelhança (%, %>) de CartasQueryMixin.name_match
+    op.execute("""
+        CREATE INDEX idx_cartas_nome_trgm ON public.cartas_diversas
+        USING gin (public.immutable_unaccent(lower(nome)) public.gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_cartas_nome_trgm', table_name='cartas_diversas', schema='public')
+    op.execute("DROP FUNCTION IF EXISTS public.immutable_unaccent(text)")
@@ -0,0 +1,31 @@
+"""add thumb_updated_at (timestamptz) to cartas_diversas
+
+Revision ID: 20261017_06
+Revises: 20261017_05
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261017_06'
+down_revision = '20261017_05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Geração da miniatura: regravada sob o mesmo nome (_thumb.jpg/_wN.webp) a cada
+    # regeneração, entra no ?v= e no ETag (ver media_delivery.media_version).
+    # NULL = miniatura gravada antes desta revisão.
+    op.add_column(
+        'cartas_diversas',
+        sa.Column('thumb_updated_at', sa.DateTime(timezone=True), nullable=True),
+        schema='public'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('cartas_diversas', 'thumb_updated_at', schema='public')
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from pydantic_settings import SettingsConfigDict
 from pydantic import Field
@@ -14,6 +15,19 @@ class Settings(BaseSettings):
     minio_secret_key: Optional[str] = Field(default=None, alias="MINIO_SECRET_KEY")
     minio_root_user: Optional[str] = Field(default=None, alias="MINIO_ROOT_USER")
     minio_root_password: Optional[str] = Field(default=None, alias="MINIO_ROOT_PASSWORD")
+    # Pool HTTP do cliente MinIO compartilhado
+    minio_max_connections: int = Field(default=20, alias="MINIO_MAX_CONNECTIONS")
+    minio_connect_timeout: float = Field(default=5.0, alias="MINIO_CONNECT_TIMEOUT")
+    minio_read_timeout: float = Field(default=60.0, alias="MINIO_READ_TIMEOUT")
+    minio_retries: int = Field(default=3, alias="MINIO_RETRIES")
+    # Orçamento (MB) de anexos baixados em processamento simultâneo por processo
+    download_budget_mb: int = Field(default=256, alias="DOWNLOAD_BUDGET_MB")
+    # Entregar anexos/miniaturas pela aplicação com cache HTTP (False = 302 para URL assinada)
+    media_proxy: bool = Field(default=True, alias="MEDIA_PROXY")
+    # Cache local em disco dos objetos entregues pela aplicação (0 = desligado)
+    media_cache_mb: int = Field(default=512, alias="MEDIA_CACHE_MB")
+    # Diretório do cache (vazio = <tmp>/noel-media-cache); compartilhado pelos workers
+    media_cache_dir: str = Field(default="", alias="MEDIA_CACHE_DIR")
     app_port: int = Field(default=8000, alias="APP_PORT")
     
     # Configurações de autenticação
@@ -23,6 +37,15 @@ class Settings(BaseSettings):
 
     # Tamanho padrão da miniatura gerada (LxA), ex.: "200x300"
     thumb_size: str = Field(default="200x300", alias="THUMB_SIZE")
+    # Larguras das variantes WebP para srcset, ex.: "120,240,480,960"
+    thumb_widths: str = Field(default="120,240,480,960", alias="THUMB_WIDTHS")
+    # Processos dedicados à geração de miniaturas em segundo plano
+    thumb_workers: int = Field(default=2, alias="THUMB_WORKERS")
+    # Gerar a miniatura automaticamente após cada upload de anexo
+    thumb_on_upload: bool = Field(default=True, alias="THUMB_ON_UPLOAD")
+
+    # Tamanho do threadpool que executa os handlers síncronos (banco, MinIO, Pillow)
+    threadpool_size: int = Field(default=40, alias="THREADPOOL_SIZE")
 
     # Domínio padrão para completar e-mails no login quando o usuário omite o domínio
     login_email_default_domain: str = Field(default="mpgo.mp.br", alias="LOGIN_EMAIL_DEFAULT_DOMAIN")
@@ -35,5 +58,17 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
+@lru_cache(maxsize=1)
 def get_settings() -> "Settings":
+    """Configurações em cache: ambiente e .env são lidos uma única vez por processo.
+
+    Use reload_settings() para reler (SIGHUP ou endpoint admin). Em testes,
+    get_settings.cache_clear() força nova leitura do ambiente.
+    """
     return Settings()  # type: ignore[call-arg]
+
+
+def reload_settings() -> "Settings":
+    """Descarta o cache e relê ambiente/.env, retornando as novas configurações."""
+    get_settings.cache_clear()
+    return get_settings()
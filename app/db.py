@@ -1,6 +1,7 @@
 """Database connection and session management for SQLAlchemy."""
 
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -57,6 +58,33 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """Garante o driver psycopg (3), que atende tanto o modo síncrono quanto o assíncrono."""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+# Engine assíncrono (psycopg async) com as mesmas configurações de pool do engine síncrono.
+# Usado pelas rotas públicas mais acessadas para atender muitas requisições por worker
+# sem ocupar threads do threadpool.
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    pool_size=5,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    echo=settings.environment == "development",
+    connect_args={"options": "-c search_path=public"}
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for all models
 Base = declarative_base()
 
@@ -128,3 +156,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency for FastAPI routes that use the async engine.
+    
+    Usage:
+        @app.get("/items/")
+        async def read_items(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(models.Item))
+            return result.scalars().all()
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -13,14 +13,18 @@ import anyio
 import psycopg
 import traceback
 import secrets
+import signal
+import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, Union, List
 import re
 
-from .config import get_settings
+from .config import get_settings, reload_settings
 from .db import get_db
 from .middleware import AuthMiddleware
 from .services import AuthService
+from .services.storage_service import get_storage_service, reset_storage_service
+from .services.thumbnail_jobs import shutdown_thumbnail_jobs
 from .dependencies import get_current_user, require_roles
 from .routers import cartas_router, relatorios_router, usuarios_router, modulos_router, permissoes_router
 from .utils.template_helpers import first_name_from_user
@@ -205,6 +209,53 @@ async def _log_version_on_startup() -> None:
     print(f"✅ Startup completed successfully!")
 
 
+@app.on_event("startup")
+async def _configure_threadpool() -> None:
+    # Os handlers dos routers são síncronos (Session, minio, Pillow/PyMuPDF) e o FastAPI
+    # os despacha para o threadpool do anyio; dimensioná-lo conforme THREADPOOL_SIZE.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(1, int(SETTINGS.threadpool_size))
+    logging.getLogger("uvicorn").info("🧵 Threadpool size: %s", limiter.total_tokens)
+
+
+@app.on_event("startup")
+async def _ensure_minio_bucket() -> None:
+    # Verificar/criar o bucket uma única vez; uploads posteriores não consultam mais o MinIO
+    try:
+        storage = get_storage_service()
+        await anyio.to_thread.run_sync(storage._ensure_bucket)
+        logging.getLogger("uvicorn").info("🪣 MinIO bucket pronto: %s", storage.bucket)
+    except Exception as exc:
+        logging.getLogger("uvicorn").warning("⚠️ Não foi possível preparar o bucket MinIO no startup: %s", exc)
+
+
+@app.on_event("shutdown")
+async def _stop_thumbnail_jobs() -> None:
+    # Encerrar o pool de processos de miniaturas junto com o worker
+    shutdown_thumbnail_jobs()
+
+
+def _reload_runtime_settings() -> None:
+    """Relê ambiente/.env e recria os serviços que dependem das configurações.
+
+    Valores consumidos na importação (engine do banco, middlewares) exigem reinício.
+    """
+    reload_settings()
+    reset_storage_service()
+    logging.getLogger("uvicorn").info("🔄 Configurações recarregadas")
+
+
+@app.on_event("startup")
+async def _install_sighup_reload() -> None:
+    # kill -HUP <pid> relê as configurações sem reiniciar o worker
+    if not hasattr(signal, "SIGHUP"):
+        return
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_runtime_settings)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+
+
 async def _check_minio_ready(*, debug: bool = False) -> Union[Dict[str, Any], bool]:
     """Check if MinIO is ready by calling its health endpoint."""
     if debug:
@@ -584,6 +635,15 @@ async def admin_sistema_page(
     )
 
 
+@app.post("/api/admin/settings/reload")
+async def api_reload_settings(
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"]))
+) -> Dict[str, Any]:
+    """Relê as configurações (.env/ambiente) sem reiniciar o processo (somente ADMIN)."""
+    await anyio.to_thread.run_sync(_reload_runtime_settings)
+    return {"success": True, "environment": get_settings().environment}
+
+
 # API de autenticação
 @app.post("/api/auth/login")
 async def api_login(
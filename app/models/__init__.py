@@ -9,3 +9,4 @@ from .cartas import CartaDiversa
 from .icon_presente import IconPresente
 from .auth import Role, UserRole
 from .grupo import Grupo
+from .anexo import Anexo
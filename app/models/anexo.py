@@ -0,0 +1,36 @@
+"""SQLAlchemy model for the 'anexos' table."""
+
+from sqlalchemy import BigInteger, CheckConstraint, Column, DateTime, Index, Integer, Text
+
+from app.db import Base
+
+
+class Anexo(Base):
+    """
+    Inventário dos objetos do bucket de anexos (prefixo cartas/).
+
+    Espelha a listagem do MinIO para que os relatórios de anexos sejam consultas
+    SQL indexadas em vez de varreduras do bucket. Mantido pelos fluxos de upload,
+    miniatura e exclusão e conferido pela reconciliação (ver anexos_inventory).
+    """
+    __tablename__ = "anexos"
+    __table_args__ = (
+        CheckConstraint("kind IN ('original', 'thumb')", name="ck_anexos_kind"),
+        Index("idx_anexos_id_carta", "id_carta"),
+        Index("idx_anexos_kind", "kind"),
+        {"schema": "public"}
+    )
+
+    object_name = Column(Text, primary_key=True)
+    # id_carta extraído do prefixo cartas/{id_carta}/ (sem FK: órfãos podem não ter carta)
+    id_carta = Column(Integer, nullable=True)
+    size = Column(BigInteger, nullable=False, default=0)
+    content_type = Column(Text, nullable=True)
+    last_modified = Column(DateTime(timezone=True), nullable=True)
+    # original = anexo enviado; thumb = miniatura JPEG ou variante WebP
+    kind = Column(Text, nullable=False)
+    # ETag do MinIO (MD5 do conteúdo em uploads de parte única)
+    checksum = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<Anexo(object_name='{self.object_name}', kind='{self.kind}')>"
@@ -2,13 +2,23 @@
 
 from sqlalchemy import (
     Column, Integer, Text, Boolean, DateTime, 
-    ForeignKey, CheckConstraint, Index, text
+    ForeignKey, CheckConstraint, Index, Computed, text
 )
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from app.db import Base
 
+# Configuração de texto 'portuguese' + unaccent criada na migração 20261017_04
+SEARCH_CONFIG = "public.pt_unaccent"
+# Expressão da coluna gerada search_tsv (pesos: nome A, presente B, observação C)
+SEARCH_TSV_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(nome, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(presente, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(observacao, '')), 'C')"
+)
+
 
 class CartaDiversa(Base):
     """
@@ -23,11 +33,15 @@ class CartaDiversa(Base):
         Index("idx_cartas_adotante", "adotante_email"),
         Index("idx_cartas_delbl", "del_bl"),
         Index("idx_cartas_entregue", "entregue_bl"),
+        Index("idx_cartas_urlcarta", "urlcarta"),
+        Index("idx_cartas_cod_carta", "cod_carta"),
+        Index("idx_cartas_search_tsv", "search_tsv", postgresql_using="gin"),
         {"schema": "public"}
     )
     
     id = Column(Integer, primary_key=True)
     id_carta = Column(Integer, nullable=False, unique=True)
+    # Índice GIN trigram em immutable_unaccent(lower(nome)) criado na migração 20261017_05
     nome = Column(Text, nullable=False)
     sexo = Column(Text, nullable=False)
     presente = Column(Text, nullable=False)
@@ -38,12 +52,20 @@ class CartaDiversa(Base):
     urlcarta = Column(Text, nullable=True)
     # URL/object_name da miniatura gerada (200x300)
     urlcarta_pq = Column(Text, nullable=True)
+    # Larguras das variantes WebP da miniatura (<nome>_w{largura}.webp); NULL = somente o JPEG
+    thumb_widths = Column(ARRAY(Integer), nullable=True)
+    # Quando a miniatura foi gravada (geração usada no ?v= e no ETag); NULL = anterior a isso
+    thumb_updated_at = Column(DateTime(timezone=True), nullable=True)
     # Idade da criança (opcional)
     idade = Column(Integer, nullable=True)
     # Grupo da cartinha (FK para grupos.id_grupo)
     id_grupo_key = Column(Integer, ForeignKey("public.grupos.id_grupo"), nullable=True)
     # Código extra/identificador adicional da carta
     cod_carta = Column(Integer, nullable=True)
+    # Ícones (FA6) sugeridos a partir do texto do presente; NULL = ainda não calculado
+    icons = Column(ARRAY(Text), nullable=True)
+    # Vetor de pesquisa gerado pelo banco (ver CartasQueryMixin.search_filters); não carregado por padrão
+    search_tsv = deferred(Column(TSVECTOR, Computed(SEARCH_TSV_SQL, persisted=True)))
     del_bl = Column(Boolean, nullable=False, default=False)
     del_time = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,5 +1,7 @@
 from .base import BaseRepository
 from .cartas_repository import CartasRepository
+from .cartas_async_repository import AsyncCartasRepository
 from .usuarios_repository import UsuariosRepository
+from .anexos_repository import AnexosRepository
 
-__all__ = ["BaseRepository", "CartasRepository", "UsuariosRepository"]
+__all__ = ["BaseRepository", "CartasRepository", "AsyncCartasRepository", "UsuariosRepository", "AnexosRepository"]
@@ -0,0 +1,166 @@
+from typing import Any, Dict, Iterable, List, Set
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy import Integer, Text, and_, any_, exists, func, literal
+
+from app.models import Anexo, CartaDiversa
+from app.services.thumbnail_service import THUMB_SUFFIX, derived_prefix, id_carta_from_object
+
+# Linhas por INSERT ... ON CONFLICT na sincronização
+UPSERT_BATCH = 500
+
+
+class AnexosRepository:
+    """
+    Inventário dos objetos do bucket (tabela anexos).
+
+    As linhas vêm da listagem do MinIO (ver app.services.anexos_inventory); os
+    relatórios de anexos órfãos/referenciados são consultas sobre esta tabela.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.model = Anexo
+
+    def count(self) -> int:
+        return self.db.query(func.count(self.model.object_name)).scalar() or 0
+
+    def known_names(self) -> Set[str]:
+        """object_names já inventariados (consulta só da coluna)."""
+        return {name for (name,) in self.db.query(self.model.object_name)}
+
+    def sync(self, rows: List[Dict[str, Any]], prefix: str) -> Dict[str, int]:
+        """
+        Iguala o inventário sob `prefix` às linhas informadas (listagem do bucket).
+
+        Insere/atualiza as linhas recebidas e remove as do prefixo que não vieram.
+
+        Returns:
+            {"upserted": n, "removed": n}
+        """
+        m = self.model
+        for start in range(0, len(rows), UPSERT_BATCH):
+            batch = rows[start:start + UPSERT_BATCH]
+            stmt = insert(m).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[m.object_name],
+                set_={
+                    "id_carta": stmt.excluded.id_carta,
+                    "size": stmt.excluded.size,
+                    # Tipo já conhecido (stat_object) prevalece sobre o deduzido da extensão
+                    "content_type": func.coalesce(m.content_type, stmt.excluded.content_type),
+                    "last_modified": stmt.excluded.last_modified,
+                    "kind": stmt.excluded.kind,
+                    "checksum": stmt.excluded.checksum,
+                },
+            )
+            self.db.execute(stmt)
+        names = [r["object_name"] for r in rows]
+        stale = self.db.query(m).filter(m.object_name.startswith(prefix, autoescape=True))
+        if names:
+            # Um único parâmetro array (a listagem completa pode ter dezenas de milhares de nomes)
+            stale = stale.filter(~(m.object_name == any_(literal(names, ARRAY(Text)))))
+        removed = stale.delete(synchronize_session=False)
+        self.db.commit()
+        return {"upserted": len(rows), "removed": removed}
+
+    def forget(self, object_names: Iterable[str]) -> int:
+        """Remove do inventário os objetos apagados do bucket."""
+        names = list(object_names)
+        if not names:
+            return 0
+        removed = (
+            self.db.query(self.model)
+            .filter(self.model.object_name == any_(literal(names, ARRAY(Text))))
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return removed
+
+    def orphan_originals(self, object_names: Iterable[str]) -> Set[str]:
+        """Quais dos object_names o inventário lista como anexo original órfão (ver orphans)."""
+        names = list(object_names)
+        if not names:
+            return set()
+        m = self.model
+        referenced = exists().where(and_(CartaDiversa.urlcarta == m.object_name, CartaDiversa.del_bl == False))
+        rows = (
+            self.db.query(m.object_name)
+            .filter(m.object_name == any_(literal(names, ARRAY(Text))), m.kind == "original", ~referenced)
+            .all()
+        )
+        return {name for (name,) in rows}
+
+    def referenced_names(self, object_names: Iterable[str]) -> Set[str]:
+        """Quais dos object_names estão em urlcarta ou urlcarta_pq de alguma cartinha ativa."""
+        names = list(object_names)
+        if not names:
+            return set()
+        wanted = literal(names, ARRAY(Text))
+        rows = (
+            self.db.query(CartaDiversa.urlcarta, CartaDiversa.urlcarta_pq)
+            .filter(
+                (CartaDiversa.urlcarta == any_(wanted)) | (CartaDiversa.urlcarta_pq == any_(wanted)),
+                CartaDiversa.del_bl == False,
+            )
+            .all()
+        )
+        found = {value for row in rows for value in row if value}
+        return found.intersection(names)
+
+    def derived_of(self, object_names: Iterable[str]) -> Dict[str, List[str]]:
+        """Miniaturas inventariadas de cada anexo original (mesmo prefixo, kind = thumb)."""
+        prefixes = {name: derived_prefix(name) for name in object_names}
+        ids = sorted({i for i in (id_carta_from_object(n) for n in prefixes) if i is not None})
+        result: Dict[str, List[str]] = {name: [] for name in prefixes}
+        if not ids:
+            return result
+        thumbs = (
+            self.db.query(self.model.object_name)
+            .filter(self.model.kind == "thumb", self.model.id_carta == any_(literal(ids, ARRAY(Integer))))
+            .all()
+        )
+        for (thumb_name,) in thumbs:
+            for name, prefix in prefixes.items():
+                if thumb_name.startswith(prefix):
+                    result[name].append(thumb_name)
+        return result
+
+    def _conventional_thumb(self):
+        # Mesmo critério de thumbnail_service.thumb_object_name, em SQL
+        return func.regexp_replace(self.model.object_name, r"\.[^.]*$", "") + literal(THUMB_SUFFIX)
+
+    def orphans(self) -> List[Dict[str, Any]]:
+        """Anexos originais não referenciados (urlcarta) por nenhuma cartinha ativa."""
+        m = self.model
+        thumb = aliased(Anexo)
+        referenced = exists().where(and_(CartaDiversa.urlcarta == m.object_name, CartaDiversa.del_bl == False))
+        rows = (
+            self.db.query(m.object_name, thumb.object_name, m.size, m.last_modified)
+            .outerjoin(thumb, thumb.object_name == self._conventional_thumb())
+            .filter(m.kind == "original", ~referenced)
+            .order_by(m.object_name)
+            .all()
+        )
+        return [
+            {"object_name": name, "thumb_object": thumb_name, "size": size, "last_modified": last_modified}
+            for name, thumb_name, size, last_modified in rows
+        ]
+
+    def referenced(self) -> List[Dict[str, Any]]:
+        """Anexos vinculados a cartinhas ativas, com a miniatura do banco ou da convenção."""
+        m = self.model
+        thumb = aliased(Anexo)
+        preferred_thumb = func.coalesce(CartaDiversa.urlcarta_pq, self._conventional_thumb())
+        rows = (
+            self.db.query(m.object_name, thumb.object_name, m.size, m.last_modified)
+            .join(CartaDiversa, and_(CartaDiversa.urlcarta == m.object_name, CartaDiversa.del_bl == False))
+            .outerjoin(thumb, thumb.object_name == preferred_thumb)
+            .distinct()
+            .order_by(m.object_name)
+            .all()
+        )
+        return [
+            {"object_name": name, "thumb_object": thumb_name, "size": size, "last_modified": last_modified}
+            for name, thumb_name, size, last_modified in rows
+        ]
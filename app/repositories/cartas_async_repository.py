@@ -0,0 +1,90 @@
+from typing import List, Optional, Any, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+import sqlalchemy as sa
+
+from app.models import CartaDiversa
+from app.repositories.cartas_repository import CartasQueryMixin
+
+
+class AsyncCartasRepository(CartasQueryMixin):
+    """
+    Caminhos de leitura de cartinhas sobre AsyncSession (psycopg async).
+    
+    Usa os mesmos construtores de consulta do CartasRepository; escritas
+    continuam no repositório síncrono. Relacionamentos usados pelos templates
+    (grupo) são sempre carregados de forma antecipada, pois lazy load não é
+    permitido em sessões assíncronas.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.model = CartaDiversa
+
+    async def use_name_similarity(self) -> None:
+        """Aplica NAME_SIMILARITY_THRESHOLD às pesquisas por nome desta transação."""
+        await self.db.execute(self._name_threshold_stmt())
+
+    async def get_by_id_carta(self, id_carta: int) -> Optional[CartaDiversa]:
+        """
+        Obtém uma cartinha pelo id_carta (com grupo carregado).
+        
+        Args:
+            id_carta: ID único da cartinha
+            
+        Returns:
+            Instância da cartinha ou None se não encontrada
+        """
+        result = await self.db.execute(
+            sa.select(self.model)
+            .options(joinedload(self.model.grupo))
+            .where(self.model.id_carta == id_carta)
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    async def count(self, filters: List[Any]) -> int:
+        """
+        Conta as cartinhas que atendem aos filtros.
+        
+        Args:
+            filters: Condições de filtro (ver status_filters/search_filters)
+        """
+        result = await self.db.execute(self._count_stmt(filters))
+        return int(result.scalar() or 0)
+
+    async def page_with_total(
+        self,
+        filters: List[Any],
+        skip: int = 0,
+        limit: int = 20,
+    ) -> Tuple[List[CartaDiversa], int]:
+        """
+        Página (offset) ordenada por id desc junto com o total exato do filtro.
+        
+        Returns:
+            Tupla (cartas, total)
+        """
+        rows = (await self.db.execute(self._page_stmt(filters, skip, limit))).all()
+        if not rows:
+            return [], (await self.count(filters) if skip else 0)
+        return [r[0] for r in rows], int(rows[0][1] or 0)
+
+    async def keyset_page(
+        self,
+        filters: List[Any],
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: int = 20,
+    ) -> Tuple[List[CartaDiversa], int, Optional[int], Optional[int]]:
+        """
+        Paginação por cursor (keyset) ordenada por id desc.
+        
+        Returns:
+            Tupla (cartas, total, next_cursor, prev_cursor); cursores None quando não há página
+        """
+        rows = (await self.db.execute(self._keyset_stmt(filters, after, before, limit))).all()
+        cartas, total, next_cursor, prev_cursor = self._keyset_result(rows, after, before, limit)
+        if total is None:
+            total = await self.count(filters)
+        return cartas, total, next_cursor, prev_cursor
@@ -1,14 +1,214 @@
-from typing import List, Optional, Dict, Any, Union
-from sqlalchemy.orm import Session
+from typing import List, Optional, Dict, Any, Iterator, Union, Tuple
+from sqlalchemy.orm import Session, aliased, joinedload
 from sqlalchemy import and_, or_, desc, func
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
 from datetime import datetime
+import re
 
-from app.models import CartaDiversa, Usuario
+from app.models import CartaDiversa, Grupo, Usuario
+from app.models.cartas import SEARCH_CONFIG
 from app.repositories.base import BaseRepository
+from app.repositories.icon_presente_repository import IconPresenteRepository
 from app.schemas.cartas import CartaCreate, CartaUpdate, CartaSchema
+from app.services.thumbnail_service import id_carta_from_object
 
-class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, CartaUpdate]):
+# Semelhança mínima de palavra (pg_trgm.word_similarity_threshold, padrão 0.6) para nomes
+# com erro de digitação: "jao" x "joao" fica em 0.5.
+NAME_SIMILARITY_THRESHOLD = 0.4
+
+# Textos de presente por UPDATE ... FROM (VALUES ...) em recompute_icons (2 parâmetros cada)
+RECOMPUTE_BATCH = 5000
+
+# Colunas ordenáveis do relatório de cartinhas (valor de ?sort=)
+REPORT_SORT_KEYS = ("id", "cod_carta", "grupo", "nome", "sexo", "idade", "presente", "status", "adotante")
+
+class CartasQueryMixin:
+    """
+    Construtores de consulta de listagem compartilhados pelos repositórios
+    síncrono (CartasRepository) e assíncrono (AsyncCartasRepository).
+    
+    Só montam instruções SQLAlchemy; quem executa é cada repositório.
+    """
+    
+    model = CartaDiversa
+
+    def status_filters(self, status: Optional[str], email: Optional[str] = None) -> List[Any]:
+        """
+        Condições de filtro da listagem de cartinhas para cada status.
+        
+        Args:
+            status: disponivel, adotadas, entregues, minhas ou None (todas ativas)
+            email: Email do usuário logado (necessário para 'minhas')
+            
+        Returns:
+            Lista de condições SQLAlchemy para usar em .filter(*conds)
+        """
+        m = self.model
+        if status == "disponivel":
+            return [m.del_bl == False, m.adotante_email == None, m.status == "disponível"]
+        if status == "adotadas":
+            return [m.del_bl == False, m.adotante_email != None, m.status == "adotada"]
+        if status == "entregues":
+            return [
+                m.del_bl == False,
+                or_(m.entregue_bl == True, m.status.ilike("%entregue%")),
+            ]
+        if status == "minhas" and email:
+            return [m.del_bl == False, m.adotante_email == email]
+        return [m.del_bl == False]
+
+    @staticmethod
+    def _numeric_query(query: str) -> Optional[int]:
+        """Valor inteiro da pesquisa quando ela é só dígitos (id_carta/cod_carta)."""
+        q = (query or "").strip()
+        if q.isdigit() and int(q) < 2 ** 31:
+            return int(q)
+        return None
+
+    def _tsquery(self, query: str):
+        """
+        tsquery com prefixo em cada termo ("jo mar" -> jo:* & mar:*), na configuração
+        portuguese + unaccent; None se a pesquisa não tiver palavras.
+        """
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            return None
+        return func.to_tsquery(
+            sa.cast(SEARCH_CONFIG, REGCONFIG),
+            " & ".join(f"{t}:*" for t in terms),
+        )
+
+    def search_filters(self, query: str) -> List[Any]:
+        """
+        Condições de pesquisa por texto em vários campos (apenas cartinhas ativas).
+        
+        Só dígitos: igualdade em id_carta/cod_carta (índices btree). Demais textos:
+        pesquisa textual em nome/presente/observação pela coluna search_tsv (GIN),
+        sem acentos e com prefixo em cada termo, ou nome parecido (trigramas, ver
+        name_match).
+        
+        Args:
+            query: Texto para pesquisar
+            
+        Returns:
+            Lista de condições SQLAlchemy para usar em .filter(*conds)
+        """
+        number = self._numeric_query(query)
+        if number is not None:
+            return [
+                self.model.del_bl == False,
+                or_(self.model.id_carta == number, self.model.cod_carta == number),
+            ]
+        tsquery = self._tsquery(query)
+        if tsquery is None:
+            return [self.model.del_bl == False, sa.false()]
+        return [
+            self.model.del_bl == False,
+            or_(self.model.search_tsv.op("@@")(tsquery), self.name_match(query)),
+        ]
+
+    @staticmethod
+    def name_key(expr):
+        """Forma normalizada (minúsculas, sem acentos) indexada por idx_cartas_nome_trgm."""
+        return func.public.immutable_unaccent(func.lower(expr), type_=sa.Text)
+
+    def name_match(self, query: str, fuzzy: bool = True):
+        """
+        Condição de nome "contendo" a pesquisa, sem acentos, pelo índice trigram.
+        
+        Com `fuzzy`, aceita também nomes com uma palavra parecida (operador %> do
+        pg_trgm, limite em pg_trgm.word_similarity_threshold): "Jão" encontra "João".
+        """
+        pattern = (query or "").strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        key = self.name_key(self.model.nome)
+        contains = key.like("%" + self.name_key(sa.literal(pattern)) + "%")
+        if not fuzzy:
+            return contains
+        return or_(contains, key.op("%>")(self.name_key(sa.literal(query.strip()))))
+
+    def _name_threshold_stmt(self):
+        # set_config(..., true): vale só até o fim da transação atual
+        return sa.select(func.set_config(
+            "pg_trgm.word_similarity_threshold", str(NAME_SIMILARITY_THRESHOLD), True
+        ))
+
+    def name_similarity(self, query: str):
+        """Semelhança (0..1) entre a pesquisa e a palavra mais próxima do nome, para ORDER BY."""
+        return func.word_similarity(self.name_key(sa.literal(query.strip())), self.name_key(self.model.nome))
+
+    def search_rank(self, query: str):
+        """Relevância da pesquisa textual (ts_rank_cd, pesos A/B/C) para ORDER BY."""
+        tsquery = self._tsquery(query)
+        if tsquery is None or self._numeric_query(query) is not None:
+            return None
+        return func.ts_rank_cd(self.model.search_tsv, tsquery)
+
+    def _total_column(self, filters: List[Any]):
+        """
+        Contagem total do conjunto filtrado como coluna extra da consulta da página.
+        
+        Subconsulta escalar não correlacionada: o PostgreSQL a executa uma única vez
+        (InitPlan), então página e total saem na mesma ida ao banco.
+        """
+        return (
+            sa.select(func.count())
+            .select_from(self.model)
+            .where(*filters)
+            .correlate(None)
+            .scalar_subquery()
+            .label("total")
+        )
+
+    def _count_stmt(self, filters: List[Any]):
+        return sa.select(func.count()).select_from(self.model).where(*filters)
+
+    def _page_stmt(self, filters: List[Any], skip: int, limit: int):
+        return (
+            sa.select(self.model, self._total_column(filters))
+            .options(joinedload(self.model.grupo))
+            .where(*filters)
+            .order_by(desc(self.model.id))
+            .offset(skip)
+            .limit(limit)
+        )
+
+    def _keyset_stmt(self, filters: List[Any], after: Optional[int], before: Optional[int], limit: int):
+        stmt = (
+            sa.select(self.model, self._total_column(filters))
+            .options(joinedload(self.model.grupo))
+            .where(*filters)
+        )
+        if before is not None:
+            # Buscar em ordem crescente a partir do cursor; _keyset_result inverte para manter id desc
+            return stmt.where(self.model.id > before).order_by(self.model.id.asc()).limit(limit + 1)
+        if after is not None:
+            stmt = stmt.where(self.model.id < after)
+        return stmt.order_by(desc(self.model.id)).limit(limit + 1)
+
+    @staticmethod
+    def _keyset_result(
+        rows: List[Any], after: Optional[int], before: Optional[int], limit: int
+    ) -> Tuple[List[CartaDiversa], Optional[int], Optional[int], Optional[int]]:
+        """Converte as linhas de _keyset_stmt em (cartas, total, next_cursor, prev_cursor); total None se vazio."""
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows = list(reversed(rows))
+        if not rows:
+            return [], None, None, None
+        cartas = [r[0] for r in rows]
+        total = int(rows[0][1] or 0)
+        if before is not None:
+            next_cursor = cartas[-1].id
+            prev_cursor = cartas[0].id if has_more else None
+        else:
+            next_cursor = cartas[-1].id if has_more else None
+            prev_cursor = cartas[0].id if after is not None else None
+        return cartas, total, next_cursor, prev_cursor
+
+
+class CartasRepository(CartasQueryMixin, BaseRepository[CartaDiversa, CartaSchema, CartaCreate, CartaUpdate]):
     """
     Repositório para operações com cartinhas.
     
@@ -17,6 +217,10 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
     
     def __init__(self, db: Session):
         super().__init__(CartaDiversa, db)
+
+    def use_name_similarity(self) -> None:
+        """Aplica NAME_SIMILARITY_THRESHOLD às pesquisas por nome desta transação."""
+        self.db.execute(self._name_threshold_stmt())
     
     def create_carta(self, payload: CartaCreate) -> CartaDiversa:
         """Cria uma cartinha, gerando id_carta automaticamente se não informado."""
@@ -34,6 +238,7 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
             observacao=data.get("observacao"),
             cod_carta=data.get("cod_carta"),
             id_grupo_key=data.get("id_grupo_key"),
+            icons=IconPresenteRepository(self.db).icons_for_present_text(data["presente"]),
             del_bl=False,
             created_at=datetime.now(),
             updated_at=datetime.now(),
@@ -109,6 +314,60 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
             )
         ).order_by(desc(self.model.id)).offset(skip).limit(limit).all()
     
+    def _count(self, filters: List[Any]) -> int:
+        return int(self.db.execute(self._count_stmt(filters)).scalar() or 0)
+
+    def page_with_total(
+        self,
+        filters: List[Any],
+        skip: int = 0,
+        limit: int = 20,
+    ) -> Tuple[List[CartaDiversa], int]:
+        """
+        Página (offset) ordenada por id desc junto com o total exato do filtro.
+        
+        Args:
+            filters: Condições de filtro (ver status_filters/search_filters)
+            skip: Número de registros para pular
+            limit: Tamanho da página
+            
+        Returns:
+            Tupla (cartas, total)
+        """
+        rows = self.db.execute(self._page_stmt(filters, skip, limit)).all()
+        if not rows:
+            # Página vazia não traz a coluna total; só precisa contar se não for a primeira
+            return [], (self._count(filters) if skip else 0)
+        return [r[0] for r in rows], int(rows[0][1] or 0)
+
+    def keyset_page(
+        self,
+        filters: List[Any],
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: int = 20,
+    ) -> Tuple[List[CartaDiversa], int, Optional[int], Optional[int]]:
+        """
+        Paginação por cursor (keyset) ordenada por id desc.
+        
+        O custo de cada página é o mesmo em qualquer profundidade, pois a consulta
+        parte do índice da PK (id < after / id > before) em vez de descartar linhas com OFFSET.
+        
+        Args:
+            filters: Condições de filtro (ver status_filters)
+            after: Retorna a página seguinte ao id informado (ids menores)
+            before: Retorna a página anterior ao id informado (ids maiores)
+            limit: Tamanho da página
+            
+        Returns:
+            Tupla (cartas, total, next_cursor, prev_cursor); cursores None quando não há página
+        """
+        rows = self.db.execute(self._keyset_stmt(filters, after, before, limit)).all()
+        cartas, total, next_cursor, prev_cursor = self._keyset_result(rows, after, before, limit)
+        if total is None:
+            total = self._count(filters)
+        return cartas, total, next_cursor, prev_cursor
+
     def adopt_carta(self, id_carta: int, email: str) -> Optional[CartaDiversa]:
         """
         Marca uma cartinha como adotada por um usuário, de forma atômica.
@@ -259,7 +518,7 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
     
     def search_cartas(self, query: str, skip: int = 0, limit: int = 100) -> List[CartaDiversa]:
         """
-        Pesquisa cartinhas por texto em vários campos.
+        Pesquisa cartinhas por texto em vários campos, das mais relevantes para as menos.
         
         Args:
             query: Texto para pesquisar
@@ -269,19 +528,153 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
         Returns:
             Lista de cartinhas que correspondem à pesquisa
         """
-        search = f"%{query}%"
+        rank = self.search_rank(query)
+        order = [desc(rank), desc(self.model.id)] if rank is not None else [desc(self.model.id)]
         return self.db.query(self.model).filter(
-            and_(
-                self.model.del_bl == False,
-                or_(
-                    self.model.nome.ilike(search),
-                    self.model.presente.ilike(search),
-                    self.model.observacao.ilike(search),
-                    # busca por cod_carta tanto texto quanto número
-                    sa.cast(self.model.cod_carta, sa.Text).ilike(search)
-                )
+            *self.search_filters(query)
+        ).order_by(*order).offset(skip).limit(limit).all()
+
+    def report_filters(self, q: Optional[str] = None, status: Optional[str] = None) -> List[Any]:
+        """
+        Condições do relatório de cartinhas (/relatorios/cartas): ativas, nome (ver
+        name_match) e status (disponivel, adotadas, entregues).
+        """
+        m = self.model
+        filters: List[Any] = [m.del_bl == False]
+        if q:
+            filters.append(self.name_match(q))
+        if status == "disponivel":
+            filters.append(m.status == "disponível")
+        elif status == "adotadas":
+            filters.append(m.status == "adotada")
+        elif status == "entregues":
+            filters.append(or_(m.entregue_bl == True, m.status.ilike("%entregue%")))
+        return filters
+
+    def report_stats(self, filters: List[Any]) -> Dict[str, Any]:
+        """
+        Totais por sexo, status e grupo do conjunto filtrado em uma única consulta
+        (GROUP BY GROUPING SETS).
+        
+        Returns:
+            {"total", "sexo": {"M", "F"}, "status": {...}, "grupos": {...}, "grupos_colors": {...}}
+        """
+        m = self.model
+        # Bits de grouping(): 1 = coluna fora do conjunto (sexo, status, ds_grupo, cor)
+        stmt = (
+            sa.select(
+                m.sexo, m.status, Grupo.ds_grupo, Grupo.cor,
+                func.grouping(m.sexo, m.status, Grupo.ds_grupo, Grupo.cor),
+                func.count(),
             )
-        ).order_by(desc(self.model.id)).offset(skip).limit(limit).all()
+            .select_from(m)
+            .outerjoin(Grupo, Grupo.id_grupo == m.id_grupo_key)
+            .where(*filters)
+            .group_by(func.grouping_sets(
+                sa.tuple_(m.sexo), sa.tuple_(m.status), sa.tuple_(Grupo.ds_grupo, Grupo.cor), sa.tuple_(),
+            ))
+        )
+        stats: Dict[str, Any] = {"total": 0, "sexo": {"M": 0, "F": 0}, "status": {}, "grupos": {}, "grupos_colors": {}}
+        for sexo, status, ds_grupo, cor, grouping, count in self.db.execute(stmt):
+            count = int(count or 0)
+            if grouping == 0b0111:
+                stats["sexo"][sexo] = count
+            elif grouping == 0b1011:
+                key = status or "indefinido"
+                stats["status"][key] = stats["status"].get(key, 0) + count
+            elif grouping == 0b1100:
+                key = ds_grupo or "Sem grupo"
+                stats["grupos"][key] = stats["grupos"].get(key, 0) + count
+                stats["grupos_colors"].setdefault(key, cor or None)
+            elif grouping == 0b1111:
+                stats["total"] = count
+        return stats
+
+    def report_order(self, sort: Optional[str] = None, descending: bool = False, rank: Any = None) -> List[Any]:
+        """
+        ORDER BY do relatório: coluna `sort` (ordenar por grupo exige o join com grupos)
+        ou, sem ela, `rank` desc (se houver) e id desc.
+        """
+        m = self.model
+        if sort not in REPORT_SORT_KEYS:
+            return ([desc(rank)] if rank is not None else []) + [desc(m.id)]
+        if sort == "grupo":
+            column = Grupo.ds_grupo
+        else:
+            column = {"id": m.id_carta, "adotante": m.adotante_email}.get(sort, getattr(m, sort, None))
+        column = column.desc() if descending else column.asc()
+        # id desempata para a paginação ser estável
+        return [column.nulls_last(), desc(m.id)]
+
+    def report_page(
+        self,
+        filters: List[Any],
+        sort: Optional[str] = None,
+        descending: bool = False,
+        rank: Any = None,
+        skip: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[CartaDiversa], int]:
+        """
+        Página do relatório de cartinhas (grupo carregado na mesma consulta) com o total.
+        
+        Args:
+            filters: Condições (ver report_filters)
+            sort, descending, rank: Ordem (ver report_order)
+            skip: Número de registros para pular
+            limit: Tamanho da página
+            
+        Returns:
+            Tupla (cartas, total)
+        """
+        m = self.model
+        stmt = (
+            sa.select(m, self._total_column(filters))
+            .options(joinedload(m.grupo))
+            .where(*filters)
+        )
+        if sort == "grupo":
+            stmt = stmt.outerjoin(Grupo, Grupo.id_grupo == m.id_grupo_key)
+        order = self.report_order(sort, descending, rank)
+        rows = self.db.execute(stmt.order_by(*order).offset(skip).limit(limit)).all()
+        if not rows:
+            return [], (self._count(filters) if skip else 0)
+        return [r[0] for r in rows], int(rows[0][1] or 0)
+
+    def report_export_rows(
+        self,
+        filters: List[Any],
+        sort: Optional[str] = None,
+        descending: bool = False,
+        rank: Any = None,
+        batch: int = 1000,
+    ) -> Iterator[Any]:
+        """
+        Linhas planas do relatório para exportação, na mesma ordem da página.
+        
+        Só as colunas exportadas (com nome do grupo, do adotante e de quem entregou,
+        via join), lidas de um cursor do lado do servidor em blocos de `batch`:
+        a memória não cresce com o número de cartinhas.
+        """
+        m = self.model
+        adotante = aliased(Usuario)
+        entregador = aliased(Usuario)
+        stmt = (
+            sa.select(
+                m.id_carta, m.cod_carta, Grupo.ds_grupo, m.nome, m.sexo, m.idade, m.presente, m.status,
+                m.adotante_email, adotante.display_name.label("adotante_nome"),
+                m.entregue_bl, m.entregue_em, entregador.display_name.label("entregue_por_nome"),
+                (m.urlcarta != None).label("tem_anexo"), (m.urlcarta_pq != None).label("tem_miniatura"),
+            )
+            .select_from(m)
+            .outerjoin(Grupo, Grupo.id_grupo == m.id_grupo_key)
+            .outerjoin(adotante, adotante.email == m.adotante_email)
+            .outerjoin(entregador, entregador.email == m.entregue_por_email)
+            .where(*filters)
+            .order_by(*self.report_order(sort, descending, rank))
+            .execution_options(stream_results=True, yield_per=batch)
+        )
+        yield from self.db.execute(stmt)
 
     def update(self, id: Any, obj_in: Union[CartaUpdate, Dict[str, Any]]) -> Optional[CartaDiversa]:
         """
@@ -300,6 +693,10 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
             if hasattr(db_obj, field):
                 setattr(db_obj, field, value)
         
+        # Recalcula os ícones persistidos quando o presente muda
+        if "presente" in obj_data:
+            db_obj.icons = IconPresenteRepository(self.db).icons_for_present_text(db_obj.presente or "")
+        
         # Sincroniza flags de entrega quando status é informado
         if "status" in obj_data:
             status_value = str(obj_data.get("status") or db_obj.status or "")
@@ -320,6 +717,149 @@ class CartasRepository(BaseRepository[CartaDiversa, CartaSchema, CartaCreate, Ca
         self.db.refresh(db_obj)
         return db_obj
     
+    def recompute_icons(self) -> int:
+        """
+        Recalcula a coluna icons de todas as cartinhas (após mudanças em icon_presente).
+        
+        O matcher roda uma vez por texto de presente distinto e todas as cartinhas são
+        atualizadas por UPDATE ... FROM (VALUES (presente, icons), ...), um comando por
+        bloco de RECOMPUTE_BATCH textos (limite de parâmetros do PostgreSQL).
+        
+        Returns:
+            Número de cartinhas atualizadas
+        """
+        icon_repo = IconPresenteRepository(self.db)
+        presentes = [row[0] for row in self.db.query(self.model.presente).distinct().all()]
+        icons = icon_repo.icons_for_present_texts(presentes)
+        pairs = list(zip(presentes, icons))
+        table = self.model.__table__
+        updated = 0
+        for start in range(0, len(pairs), RECOMPUTE_BATCH):
+            v = sa.values(
+                sa.column("presente", sa.Text), sa.column("icons", ARRAY(sa.Text)), name="v"
+            ).data(pairs[start:start + RECOMPUTE_BATCH])
+            result = self.db.execute(
+                sa.update(table)
+                .where(table.c.presente == v.c.presente)
+                .values(icons=v.c.icons)
+            )
+            updated += result.rowcount or 0
+        self.db.commit()
+        return updated
+
+    def _points_to(self, object_name: str):
+        """
+        urlcarta corresponde a object_name, como em StorageService.object_name_from_url:
+        o próprio object_name ou URL completa legada terminada em /object_name (sem a query string).
+        """
+        url = func.split_part(self.model.urlcarta, "?", 1)
+        return sa.or_(
+            self.model.urlcarta == object_name,
+            func.right(url, len(object_name) + 1) == "/" + object_name,
+        )
+
+    def set_thumbnail(
+        self, id_carta: int, object_name: str, thumb_name: Optional[str], widths: Optional[List[int]] = None
+    ) -> bool:
+        """
+        Grava a miniatura (urlcarta_pq) e as larguras WebP disponíveis com um único UPDATE.
+
+        Só se a carta ainda apontar para o anexo de origem: jobs fora de ordem ou de um
+        anexo já substituído não sobrescrevem a miniatura do anexo atual. O urlcarta é
+        comparado já normalizado (ver _points_to), então cartas com URL completa legada
+        também recebem a miniatura.
+
+        Args:
+            id_carta: ID da cartinha
+            object_name: Anexo (urlcarta) do qual a miniatura foi gerada
+            thumb_name: object_name da miniatura JPEG (None limpa o campo)
+            widths: Larguras das variantes WebP gravadas (None/vazio = nenhuma)
+
+        Returns:
+            True se alguma cartinha foi atualizada
+        """
+        result = self.db.execute(
+            sa.update(self.model)
+            .where(self.model.id_carta == id_carta, self._points_to(object_name))
+            .values(
+                urlcarta_pq=thumb_name,
+                thumb_widths=(list(widths) if widths else None),
+                thumb_updated_at=(func.now() if thumb_name else None),
+            )
+        )
+        self.db.commit()
+        return bool(result.rowcount)
+
+    def clear_deleted_attachments(self, object_names: List[str]) -> int:
+        """
+        Desvincula anexos apagados do bucket das cartinhas deletadas (del_bl) que os usam,
+        com um único UPDATE.
+
+        Só cartinhas cujo urlcarta é um dos objetos apagados; urlcarta_pq/thumb_widths só
+        são limpos quando a miniatura deriva desse anexo (mesmo prefixo, ver derived_prefix).
+
+        Returns:
+            Quantidade de cartinhas atualizadas
+        """
+        names = sorted(set(n for n in object_names if n))
+        ids = sorted({i for i in (id_carta_from_object(n) for n in names) if i is not None})
+        if not ids:
+            return 0
+        m = self.model
+        # derived_prefix(urlcarta) em SQL; no SET, urlcarta ainda é o valor anterior
+        prefix = func.regexp_replace(m.urlcarta, r"\.[^.]*$", "") + "_"
+        thumb_derived = func.coalesce(func.starts_with(m.urlcarta_pq, prefix), False)
+        result = self.db.execute(
+            sa.update(m)
+            .where(
+                m.id_carta == sa.any_(sa.literal(ids, ARRAY(sa.Integer))),
+                m.del_bl == True,
+                m.urlcarta == sa.any_(sa.literal(names, ARRAY(sa.Text))),
+            )
+            .values(
+                urlcarta=None,
+                urlcarta_pq=sa.case((thumb_derived, None), else_=m.urlcarta_pq),
+                thumb_widths=sa.case((thumb_derived, None), else_=m.thumb_widths),
+                thumb_updated_at=sa.case((thumb_derived, None), else_=m.thumb_updated_at),
+                updated_at=func.now(),
+            )
+        )
+        self.db.commit()
+        return result.rowcount or 0
+
+    def with_attachment(self) -> List[Tuple[int, str, Optional[str]]]:
+        """
+        Cartinhas ativas com anexo, somente as colunas usadas pela página de miniaturas.
+
+        Returns:
+            Lista de (id_carta, urlcarta, urlcarta_pq), do id mais recente para o mais antigo
+        """
+        rows = self.db.execute(
+            sa.select(self.model.id_carta, self.model.urlcarta, self.model.urlcarta_pq)
+            .where(self.model.del_bl == False, self.model.urlcarta != None)
+            .order_by(desc(self.model.id))
+        ).all()
+        return [(r[0], r[1], r[2]) for r in rows]
+
+    def without_thumbnail(self) -> List[Tuple[int, str]]:
+        """
+        Cartinhas ativas com anexo e sem miniatura registrada (ou só com o JPEG legado,
+        sem as variantes WebP).
+
+        Returns:
+            Lista de (id_carta, urlcarta), do id mais recente para o mais antigo
+        """
+        rows = self.db.execute(
+            sa.select(self.model.id_carta, self.model.urlcarta)
+            .where(
+                self.model.del_bl == False,
+                self.model.urlcarta != None,
+                or_(self.model.urlcarta_pq == None, self.model.thumb_widths == None),
+            )
+            .order_by(desc(self.model.id))
+        ).all()
+        return [(r[0], r[1]) for r in rows]
+
     def soft_delete(self, id_carta: int) -> bool:
         """
         Marca uma cartinha como deletada logicamente (soft delete).
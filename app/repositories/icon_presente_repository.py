@@ -1,8 +1,11 @@
-from typing import List
-import unicodedata
+from typing import List, Iterable, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy import func, cast, Text, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from app.models.icon_presente import IconPresente
+from app.services import icon_matcher
+from app.services.icon_matcher import IconMatcher, normalize_text, to_fa6_name
 
 
 class IconPresenteRepository:
@@ -10,43 +13,44 @@ class IconPresenteRepository:
         self.db = db
         self.model = IconPresente
 
-    @staticmethod
-    def _normalize_text(value: str) -> str:
-        if not value:
-            return ""
-        nfkd = unicodedata.normalize("NFKD", value)
-        only_ascii = "".join([c for c in nfkd if not unicodedata.combining(c)])
-        return only_ascii.lower()
-
-    @staticmethod
-    def _to_fa6_name(icon_code: str) -> str:
-        if not icon_code:
-            return ""
-        parts = icon_code.strip().split()
-        candidate = parts[-1] if parts else icon_code
-        if candidate.startswith("fa-"):
-            candidate = candidate[3:]
-        return candidate
+    _normalize_text = staticmethod(normalize_text)
+    _to_fa6_name = staticmethod(to_fa6_name)
+
+    def _signature(self) -> Optional[str]:
+        """Assinatura barata do conteúdo de icon_presente (detecta alterações feitas direto no banco)."""
+        row_text = func.concat_ws(":", cast(self.model.id, Text), self.model.keyword, self.model.icon_code)
+        return self.db.query(
+            func.md5(func.coalesce(
+                func.string_agg(row_text, aggregate_order_by(literal_column("'|'"), self.model.id)), ""
+            ))
+        ).scalar()
+
+    def matcher(self) -> IconMatcher:
+        """
+        Retorna o matcher compilado, compartilhado pelo processo.
+
+        A tabela só é relida quando sua assinatura muda; a assinatura é verificada
+        no máximo a cada icon_matcher.REFRESH_SECONDS.
+        """
+        cached, signature, needs_check = icon_matcher.get_cached_matcher()
+        if cached is not None and not needs_check:
+            return cached
+        current = self._signature()
+        if cached is not None and current == signature:
+            icon_matcher.mark_checked()
+            return cached
+        mappings = self.db.query(self.model.keyword, self.model.icon_code).order_by(self.model.id).all()
+        compiled = IconMatcher([(m.keyword, m.icon_code) for m in mappings])
+        icon_matcher.store_matcher(compiled, current)
+        return compiled
 
     def icons_for_present_text(self, text: str) -> List[str]:
         if not text:
             return []
-        t = self._normalize_text(text)
-        mappings = self.db.query(self.model).all()
-        icon_names: List[str] = []
-        seen = set()
-        for m in mappings:
-            if not (m.keyword and m.icon_code):
-                continue
-            keywords = [kw.strip() for kw in str(m.keyword).split(',') if kw.strip()]
-            for kw in keywords:
-                nkw = self._normalize_text(kw)
-                if nkw and nkw in t:
-                    base = self._to_fa6_name(str(m.icon_code))
-                    if base and base not in seen:
-                        icon_names.append(base)
-                        seen.add(base)
-                    break
-        return icon_names
+        return self.matcher().match(text)
+
+    def icons_for_present_texts(self, texts: Iterable[str]) -> List[List[str]]:
+        """Mapeia uma página inteira de textos de presente para ícones de uma só vez."""
+        return self.matcher().match_many(texts)
 
 
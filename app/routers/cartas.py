@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Query, status, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, status, Form, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from typing import Dict, Any, List, Optional
 from pathlib import Path
@@ -10,15 +12,27 @@ from app.version import read_version
 from app.config import get_settings
 from app.utils.template_helpers import first_name_from_user  # helper nome
 
-from app.db import get_db
+from app.db import get_db, get_async_db
 from app.dependencies import get_current_user, require_roles
 from app.dependencies import get_optional_user
-from app.repositories import CartasRepository
+from app.repositories import CartasRepository, AsyncCartasRepository
 from app.repositories.icon_presente_repository import IconPresenteRepository
 from app.schemas import CartaSchema, CartaCreate, CartaUpdate, CartaAdopt
-from app.services.storage_service import StorageService
+from app.services.storage_service import get_storage_service
+from app.services.anexos_inventory import invalidate_reports, sync_carta
+from app.services.icon_matcher import invalidate_icon_matcher
+from app.services.media_delivery import media_response, media_version
+from app.services.thumbnail_jobs import get_thumbnail_jobs
+from app.services.thumbnail_service import (
+    ThumbnailError,
+    generate_thumbnail,
+    id_carta_from_object,
+    pick_width,
+    thumb_object_name,
+    thumb_size_from_settings,
+    variant_object_name,
+)
 from app.models import Grupo
-import io
 
 logger = logging.getLogger("uvicorn")
 
@@ -34,6 +48,7 @@ templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] /
 # Expor versão do app globalmente para os templates deste router
 templates.env.globals["app_version"] = read_version()
 templates.env.globals["first_name_from_user"] = first_name_from_user
+templates.env.globals["media_version"] = media_version
 
 # Rotas para interface web
 
@@ -44,118 +59,61 @@ async def list_cartas(
     status: Optional[str] = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=5, le=100),
+    after: Optional[int] = Query(None, ge=1, description="Cursor: página seguinte ao id informado"),
+    before: Optional[int] = Query(None, ge=1, description="Cursor: página anterior ao id informado"),
     user: Optional[Dict[str, Any]] = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Lista de cartinhas com paginação e filtros. Público: sem login.
+
+    Anterior/Próxima usam paginação por cursor (after/before), com custo constante
+    em qualquer profundidade; `page` continua valendo para os links numerados.
+    Rota pública mais acessada: usa a sessão assíncrona para não ocupar threads.
     """
-    repository = CartasRepository(db)
-    icon_repo = IconPresenteRepository(db)
+    repository = AsyncCartasRepository(db)
     skip = (page - 1) * per_page
-    
-    # Filtrar por status se especificado
-    if status == "disponivel":
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .filter(
-                repository.model.del_bl == False,
-                repository.model.adotante_email == None,
-                repository.model.status == "disponível"
-            )
-            .order_by(repository.model.id.desc())
-            .offset(skip).limit(per_page)
-            .all()
-        )
-        total = repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            repository.model.adotante_email == None,
-            repository.model.status == "disponível"
-        ).count()
-    elif status == "adotadas":
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .filter(
-                repository.model.del_bl == False,
-                repository.model.adotante_email != None,
-                repository.model.status == "adotada"
-            )
-            .order_by(repository.model.id.desc())
-            .offset(skip).limit(per_page)
-            .all()
-        )
-        total = repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            repository.model.adotante_email != None,
-            repository.model.status == "adotada"
-        ).count()
-    elif status == "entregues":
-        from sqlalchemy import or_
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .filter(
-                repository.model.del_bl == False,
-                or_(
-                    repository.model.entregue_bl == True,
-                    repository.model.status.ilike("%entregue%"),
-                ),
-            )
-            .order_by(repository.model.id.desc())
-            .offset(skip).limit(per_page)
-            .all()
-        )
-        total = repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            or_(
-                repository.model.entregue_bl == True,
-                repository.model.status.ilike("%entregue%"),
-            ),
-        ).count()
-    elif status == "minhas" and user:
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .filter(
-                repository.model.del_bl == False,
-                repository.model.adotante_email == user["email"]
-            )
-            .order_by(repository.model.id.desc())
-            .offset(skip).limit(per_page)
-            .all()
-        )
-        total = repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            repository.model.adotante_email == user["email"]
-        ).count()
-    elif q:  # Pesquisa por texto
-        # Manter busca existente; grupos podem estar ausentes nesse modo
-        cartas = repository.search_cartas(q, skip=skip, limit=per_page)
-        total = len(cartas)  # Simplificado para este exemplo
+    next_cursor: Optional[int] = None
+    prev_cursor: Optional[int] = None
+    use_cursor = after is not None or before is not None
+
+    # Filtro de status tem precedência sobre a pesquisa por texto
+    filtra_status = status in ("disponivel", "adotadas", "entregues") or (status == "minhas" and user)
+    if q and not filtra_status:
+        await repository.use_name_similarity()
+        filters = repository.search_filters(q)
     else:
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .filter(repository.model.del_bl == False)
-            .order_by(repository.model.id.desc())
-            .offset(skip).limit(per_page)
-            .all()
+        filters = repository.status_filters(status, (user or {}).get("email"))
+
+    # Página e total exato na mesma consulta
+    if use_cursor:
+        cartas, total, next_cursor, prev_cursor = await repository.keyset_page(
+            filters, after=after, before=before, limit=per_page
         )
-        total = repository.db.query(repository.model).filter(
-            repository.model.del_bl == False
-        ).count()
+    else:
+        cartas, total = await repository.page_with_total(filters, skip=skip, limit=per_page)
     
     # Calcular informações de paginação
     total_pages = (total + per_page - 1) // per_page
-    has_next = page < total_pages
-    has_prev = page > 1
+    if use_cursor:
+        has_next = next_cursor is not None
+        has_prev = prev_cursor is not None
+    else:
+        has_next = page < total_pages
+        has_prev = page > 1
+        # Mesmo na primeira página numerada, Anterior/Próxima seguem por cursor
+        if cartas:
+            next_cursor = cartas[-1].id if has_next else None
+            prev_cursor = cartas[0].id if has_prev else None
     
-    # Mapear ícones sugeridos por id_carta para lookup simples no template
-    icons_by_id: dict[int, list[str]] = {}
-    for c in cartas:
-        icons_by_id[c.id_carta] = icon_repo.icons_for_present_text(getattr(c, 'presente', '') or '')
+    # Mapear ícones sugeridos por id_carta para lookup simples no template.
+    # Usa a coluna persistida; só calcula para cartas ainda sem ícones gravados.
+    icons_by_id: dict[int, list[str]] = {c.id_carta: list(c.icons) for c in cartas if c.icons is not None}
+    pendentes = [c for c in cartas if c.icons is None]
+    if pendentes:
+        textos = [getattr(c, 'presente', '') or '' for c in pendentes]
+        icons = await db.run_sync(lambda s: IconPresenteRepository(s).icons_for_present_texts(textos))
+        icons_by_id.update({c.id_carta: i for c, i in zip(pendentes, icons)})
 
     return templates.TemplateResponse(
         "cartas/list.html",
@@ -173,12 +131,14 @@ async def list_cartas(
                 "total_pages": total_pages,
                 "has_next": has_next,
                 "has_prev": has_prev,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
             }
         }
     )
 
 @router.get("/admin", response_class=HTMLResponse)
-async def admin_cartas(
+def admin_cartas(
     request: Request,
     q: Optional[str] = None,
     page: int = Query(1, ge=1),
@@ -190,52 +150,17 @@ async def admin_cartas(
     Administração de cartinhas (apenas para administradores).
     """
     repository = CartasRepository(db)
-    # Estatísticas agregadas (apenas cartinhas não deletadas logicamente)
-    from sqlalchemy import func
-    total_ativas = repository.db.query(func.count()).select_from(repository.model).filter(
-        repository.model.del_bl == False
-    ).scalar()
-    total_m = repository.db.query(func.count()).select_from(repository.model).filter(
-        repository.model.del_bl == False,
-        repository.model.sexo == 'M'
-    ).scalar()
-    total_f = repository.db.query(func.count()).select_from(repository.model).filter(
-        repository.model.del_bl == False,
-        repository.model.sexo == 'F'
-    ).scalar()
-    status_rows = repository.db.query(repository.model.status, func.count()).filter(
-        repository.model.del_bl == False
-    ).group_by(repository.model.status).all()
-    status_counts: Dict[str, int] = { (s or 'indefinido'): int(c) for (s, c) in status_rows }
-    # Contagem por grupos (nome amigável)
-    from sqlalchemy import select
-    from app.models import Grupo
-    group_counts_rows = (
-        repository.db.query(Grupo.ds_grupo, Grupo.cor, func.count())
-        .select_from(repository.model)
-        .join(Grupo, Grupo.id_grupo == repository.model.id_grupo_key, isouter=True)
-        .filter(repository.model.del_bl == False)
-        .group_by(Grupo.ds_grupo, Grupo.cor)
-        .all()
-    )
-    group_counts: Dict[str, int] = { (g or 'Sem grupo'): int(c) for (g, _cor, c) in group_counts_rows }
-    group_colors: Dict[str, Optional[str]] = { (g or 'Sem grupo'): (_cor or None) for (g, _cor, _c) in group_counts_rows }
+    # Estatísticas agregadas (apenas cartinhas não deletadas logicamente), em uma consulta
+    stats = repository.report_stats([repository.model.del_bl == False])
     skip = (page - 1) * per_page
     
     if q:
-        cartas = repository.search_cartas(q, skip=skip, limit=per_page)
-        total = len(cartas)  # Simplificado para este exemplo
+        repository.use_name_similarity()
+        filters = repository.search_filters(q)
     else:
-        # Incluir também as cartinhas deletadas logicamente e eager load grupo
-        cartas = (
-            repository.db.query(repository.model)
-            .options(joinedload(repository.model.grupo))
-            .order_by(repository.model.id.desc())
-            .offset(skip)
-            .limit(per_page)
-            .all()
-        )
-        total = repository.db.query(repository.model).count()
+        # Incluir também as cartinhas deletadas logicamente
+        filters = []
+    cartas, total = repository.page_with_total(filters, skip=skip, limit=per_page)
     
     # Calcular informações de paginação
     total_pages = (total + per_page - 1) // per_page
@@ -254,13 +179,7 @@ async def admin_cartas(
             "user": user,
             "q": q,
             "grupos": grupos,
-            "stats": {
-                "total": int(total_ativas or 0),
-                "sexo": {"M": int(total_m or 0), "F": int(total_f or 0)},
-                "status": status_counts,
-                "grupos": group_counts,
-                "grupos_colors": group_colors,
-            },
+            "stats": stats,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -274,62 +193,34 @@ async def admin_cartas(
 
 
 @router.get("/admin/miniaturas", response_class=HTMLResponse)
-async def admin_miniaturas_page(
+def admin_miniaturas_page(
     request: Request,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
 ):
     """Página para gerar miniaturas das imagens das cartinhas (ADMIN)."""
     repo = CartasRepository(db)
-    storage = StorageService()
-    # Cartas com URL
-    cartas = repo.db.query(repo.model).filter(
-        repo.model.del_bl == False,
-        repo.model.urlcarta != None
-    ).order_by(repo.model.id.desc()).all()
-
-    # Tentar extrair object_name e checar se miniatura já existe (suffix _thumb.jpg)
-    def extract_object(url_or_name: str) -> str:
-        """Extrai o object_name aceitando tanto URL completa quanto object_name puro.
-        Exemplos aceitos:
-        - 'cartas/10/anexo-xxx.png' (já é object_name)
-        - 'http://host/bucket/cartas/10/anexo-xxx.png?...'
-        - '.../cartas/10/anexo-xxx.png' (qualquer URL contendo prefixo 'cartas/')
-        """
-        if not url_or_name:
-            return ''
-        # Se já parecer um object_name
-        if url_or_name.startswith('cartas/'):
-            return url_or_name
-        base = url_or_name.split('?', 1)[0]
-        parts = base.split('/')
-        # Caso URL contenha explicitamente o bucket
-        if storage.bucket in parts:
-            idx = parts.index(storage.bucket)
-            return '/'.join(parts[idx+1:])
-        # Fallback: procurar prefixo conhecido
-        if 'cartas/' in base:
-            return base.split('cartas/', 1)[1].strip('/')
-        return ''
+    storage = get_storage_service()
+    # Cartas com URL (somente as colunas usadas)
+    cartas = repo.with_attachment()
+
+    # Sinal principal: urlcarta_pq preenchido. Para as demais, uma única listagem do
+    # prefixo cartas/ detecta miniaturas já gravadas (ex.: legado) sem um HEAD por objeto.
+    existing = None
+    if any(not urlcarta_pq for _id, _url, urlcarta_pq in cartas):
+        existing = storage.list_object_names("cartas/")
 
     items = []
-    client = storage._client()
-    for c in cartas:
-        obj = extract_object(getattr(c, 'urlcarta', '') or '')
+    for id_carta, urlcarta, urlcarta_pq in cartas:
+        obj = storage.object_name_from_url(urlcarta or '')
         if not obj:
             continue
-        thumb_name = obj.rsplit('.', 1)[0] + "_thumb.jpg"
-        has_thumb = False
-        # checar existência
-        try:
-            client.stat_object(storage.bucket, thumb_name)
-            has_thumb = True
-        except Exception:
-            has_thumb = False
+        thumb_name = thumb_object_name(obj)
+        has_thumb = bool(urlcarta_pq) or (existing is not None and thumb_name in existing)
         items.append({
-            "id_carta": c.id_carta,
+            "id_carta": id_carta,
             "object_name": obj,
-            "thumb_name": thumb_name,
+            "thumb_name": urlcarta_pq or thumb_name,
             "has_thumb": has_thumb,
         })
 
@@ -344,144 +235,98 @@ async def admin_miniaturas_page(
 
 
 @router.post("/admin/miniaturas/generate", response_model=Dict[str, Any])
-async def admin_generate_thumbnail(
+def admin_generate_thumbnail(
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
 ):
-    """Gera miniatura 200x300 para o objeto informado e grava no mesmo prefixo."""
-    storage = StorageService()
-    client = storage._client()
+    """Gera miniatura (THUMB_SIZE) para o objeto informado e grava no mesmo prefixo."""
+    storage = get_storage_service()
 
     object_name = (payload or {}).get("object_name")
     if not object_name:
         raise HTTPException(status_code=400, detail="object_name é obrigatório")
 
-    # Pré-verificação simples por extensão
-    is_pdf = object_name.lower().endswith('.pdf')
-
-    # Baixar objeto original em memória
-    response = None
+    thumb_w, thumb_h = thumb_size_from_settings()
     try:
-        response = client.get_object(storage.bucket, object_name)
-        data = response.read()
-    finally:
-        if response is not None:
-            try:
-                response.close()
-                response.release_conn()
-            except Exception:
-                pass
-
-    # Determinar tamanho desejado a partir de settings (THUMB_SIZE, ex.: "200x300")
-    def _parse_thumb_size(size_str: str) -> tuple[int, int]:
-        try:
-            s = (size_str or "").lower().replace(" ", "")
-            if "x" in s:
-                w_str, h_str = s.split("x", 1)
-                w = max(1, int(w_str))
-                h = max(1, int(h_str))
-                return (w, h)
-        except Exception:
-            pass
-        return (200, 300)
+        thumb_name, widths = generate_thumbnail(storage, object_name, (thumb_w, thumb_h))
+    except ThumbnailError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    url = storage.get_presigned_url(thumb_name)
 
-    settings = get_settings()
-    thumb_w, thumb_h = _parse_thumb_size(getattr(settings, "thumb_size", "200x300"))
+    # Persistir o caminho estável (object_name) da miniatura e as larguras WebP na carta (urlcarta_pq)
+    id_carta_ref = id_carta_from_object(object_name)
+    if id_carta_ref is not None:
+        CartasRepository(db).set_thumbnail(id_carta_ref, object_name, thumb_name, widths)
+        sync_carta(db, storage, id_carta_ref)
 
-    # Construir thumbnail
-    try:
-        out = io.BytesIO()
-        if is_pdf:
-            # Extrair a primeira imagem embutida da 1ª página do PDF
-            try:
-                from app.services.pdf_utils import extract_first_image_from_pdf_first_page
-            except Exception:
-                raise HTTPException(status_code=500, detail="Módulo de PDF indisponível")
-
-            try:
-                first = extract_first_image_from_pdf_first_page(data)
-            except ImportError as ie:
-                raise HTTPException(status_code=500, detail=str(ie))
-            except Exception:
-                first = None
-
-            if not first:
-                raise HTTPException(status_code=400, detail="PDF sem imagem embutida na 1ª página")
-
-            ext, img_bytes = first
-            # Redimensionar a imagem extraída com Pillow
-            try:
-                from PIL import Image  # lazy import
-            except ImportError:
-                raise HTTPException(status_code=500, detail="Dependência 'Pillow' não instalada. Execute: pip install Pillow")
-            with Image.open(io.BytesIO(img_bytes)) as im:
-                im = im.convert('RGB')
-                im.thumbnail((thumb_w, thumb_h))
-                im.save(out, format='JPEG', quality=85)
-                out.seek(0)
-        else:
-            # Fluxo padrão para imagens
-            try:
-                from PIL import Image  # lazy import
-            except ImportError:
-                raise HTTPException(status_code=500, detail="Dependência 'Pillow' não instalada. Execute: pip install Pillow")
-            with Image.open(io.BytesIO(data)) as im:
-                im = im.convert('RGB')
-                im.thumbnail((thumb_w, thumb_h))
-                im.save(out, format='JPEG', quality=85)
-                out.seek(0)
-    except HTTPException:
-        raise
-    except Exception:
-        raise HTTPException(status_code=400, detail="Falha ao gerar miniatura")
+    return {
+        "thumb_object": thumb_name,
+        "url": url,
+        "size": f"{thumb_w}x{thumb_h}",
+        "widths": widths,
+        "object_name": object_name,
+    }
 
-    thumb_name = object_name.rsplit('.', 1)[0] + "_thumb.jpg"
-    client.put_object(
-        storage.bucket,
-        thumb_name,
-        data=out,
-        length=out.getbuffer().nbytes,
-        content_type='image/jpeg'
-    )
-    url = storage.get_presigned_url(thumb_name)
 
-    # Persistir o caminho estável (object_name) da miniatura na carta correspondente (urlcarta_pq)
-    def _extract_id_carta_from_object(name: str) -> Optional[int]:
-        try:
-            parts = (name or "").split('/')
-            # esperado: cartas/{id_carta}/arquivo
-            if len(parts) >= 3 and parts[0] == 'cartas':
-                return int(parts[1])
-        except Exception:
-            return None
-        return None
+@router.post("/admin/miniaturas/jobs", response_model=Dict[str, Any])
+def admin_enqueue_thumbnail_job(
+    payload: Dict[str, Any],
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db),
+):
+    """
+    Enfileira a geração de miniaturas em segundo plano (ADMIN).
 
-    id_carta_ref = _extract_id_carta_from_object(object_name)
-    if id_carta_ref is not None:
-        repo = CartasRepository(db)
-        c = repo.get_by_id_carta(id_carta_ref)
-        if c:
-            # armazenar o identificador estável (object_name) que não expira
-            c.urlcarta_pq = thumb_name
-            db.add(c)
-            db.commit()
-            db.refresh(c)
+    Payload: {"object_names": [...]} para um conjunto escolhido ou
+    {"missing": true} para todas as cartinhas com anexo e sem miniatura.
+    """
+    payload = payload or {}
+    object_names = [str(n) for n in (payload.get("object_names") or []) if n]
+    if payload.get("missing"):
+        storage = get_storage_service()
+        for _id_carta, urlcarta in CartasRepository(db).without_thumbnail():
+            obj = storage.object_name_from_url(urlcarta or '')
+            if obj:
+                object_names.append(obj)
+    if not object_names:
+        raise HTTPException(status_code=400, detail="Nenhum objeto para gerar miniatura")
+
+    job = get_thumbnail_jobs().submit(object_names)
+    return job.to_dict()
+
+
+@router.get("/admin/miniaturas/jobs", response_model=List[Dict[str, Any]])
+def admin_list_thumbnail_jobs(
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+):
+    """Lista os jobs de miniaturas recentes deste processo (ADMIN)."""
+    return [job.to_dict() for job in get_thumbnail_jobs().list()]
 
-    return {"thumb_object": thumb_name, "url": url, "size": f"{thumb_w}x{thumb_h}", "object_name": object_name}
+
+@router.get("/admin/miniaturas/jobs/{job_id}", response_model=Dict[str, Any])
+def admin_thumbnail_job_status(
+    job_id: str,
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+):
+    """Progresso e falhas de um job de miniaturas (ADMIN)."""
+    job = get_thumbnail_jobs().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.to_dict()
 
 @router.get("/{id_carta}", response_class=HTMLResponse)
 async def view_carta(
     request: Request,
     id_carta: int,
     user: Optional[Dict[str, Any]] = Depends(get_optional_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Visualiza detalhes de uma cartinha. Público: sem login.
     """
-    repository = CartasRepository(db)
-    carta = repository.get_by_id_carta(id_carta)
+    repository = AsyncCartasRepository(db)
+    carta = await repository.get_by_id_carta(id_carta)
     
     if not carta or carta.del_bl:
         return RedirectResponse(url="/cartas?error=not_found", status_code=status.HTTP_302_FOUND)
@@ -508,7 +353,7 @@ async def view_carta(
         back_url = "/cartas"
 
     # Carregar grupos para selects
-    grupos_rows: List[Grupo] = db.query(Grupo).order_by(Grupo.ds_grupo.asc()).all()
+    grupos_rows: List[Grupo] = (await db.execute(select(Grupo).order_by(Grupo.ds_grupo.asc()))).scalars().all()
     grupos: List[Dict[str, Any]] = [{"id_grupo": g.id_grupo, "ds_grupo": g.ds_grupo} for g in grupos_rows]
 
     return templates.TemplateResponse(
@@ -526,7 +371,7 @@ async def view_carta(
     )
 
 @router.post("/adopt/{id_carta}")
-async def adopt_carta(
+def adopt_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -543,7 +388,7 @@ async def adopt_carta(
     return RedirectResponse(url=f"/cartas/{id_carta}?adopted=1", status_code=status.HTTP_302_FOUND)
 
 @router.post("/cancel/{id_carta}")
-async def cancel_adoption(
+def cancel_adoption(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -562,7 +407,7 @@ async def cancel_adoption(
 # Rotas de liberação e entrega
 
 @router.post("/release/{id_carta}")
-async def release_carta(
+def release_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -578,7 +423,7 @@ async def release_carta(
     return RedirectResponse(url=f"/cartas/{id_carta}", status_code=status.HTTP_302_FOUND)
 
 @router.post("/deliver/{id_carta}")
-async def deliver_carta(
+def deliver_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -593,7 +438,7 @@ async def deliver_carta(
     return RedirectResponse(url=f"/cartas/{id_carta}", status_code=status.HTTP_302_FOUND)
 
 @router.post("/undeliver/{id_carta}")
-async def undeliver_carta(
+def undeliver_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -610,7 +455,7 @@ async def undeliver_carta(
 # Upload/Download de anexos (ADMIN)
 
 @router.post("/api/admin/create", response_model=CartaSchema)
-async def api_create_carta(
+def api_create_carta(
     carta: CartaCreate,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -621,8 +466,22 @@ async def api_create_carta(
     repository = CartasRepository(db)
     return repository.create_carta(carta)
 
+@router.post("/api/admin/icons/recompute", response_model=dict)
+def api_recompute_icons(
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Recalcula os ícones gravados em todas as cartinhas após alterações em icon_presente (somente ADMIN).
+    """
+    invalidate_icon_matcher()
+    repository = CartasRepository(db)
+    updated = repository.recompute_icons()
+    logger.info("[Icons] Ícones recalculados para %s cartinhas", updated)
+    return {"success": True, "updated": updated}
+
 @router.put("/api/admin/{id_carta}", response_model=CartaSchema)
-async def api_update_carta(
+def api_update_carta(
     id_carta: int,
     carta: CartaUpdate,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
@@ -644,7 +503,7 @@ async def api_update_carta(
     return updated_carta
 
 @router.delete("/api/admin/{id_carta}", response_model=dict)
-async def api_delete_carta(
+def api_delete_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -657,11 +516,13 @@ async def api_delete_carta(
     
     if not success:
         raise HTTPException(status_code=404, detail="Cartinha não encontrada")
+    # O anexo da carta removida passa a ser órfão
+    invalidate_reports()
     
     return {"success": True, "message": "Cartinha removida com sucesso"}
 
 @router.post("/api/admin/{id_carta}/anexo", response_model=dict)
-async def api_upload_anexo(
+def api_upload_anexo(
     id_carta: int,
     file: UploadFile = File(...),
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
@@ -678,16 +539,22 @@ async def api_upload_anexo(
         logger.warning("[Upload] Cartinha não encontrada ou deletada id_carta=%s", id_carta)
         raise HTTPException(status_code=404, detail="Cartinha não encontrada")
 
-    storage = StorageService()
+    storage = get_storage_service()
     try:
         object_name = storage.upload_carta_anexo(id_carta, file)
         # Persistir o identificador estável do objeto (object_name) em vez de URL presignada expirada
         carta.urlcarta = object_name
+        # A miniatura do anexo anterior deixa de valer; a do novo é gravada pelo job
+        carta.urlcarta_pq = None
+        carta.thumb_widths = None
+        carta.thumb_updated_at = None
         carta.updated_at = carta.updated_at or None  # garantir mudança
         db.add(carta)
         db.commit()
         db.refresh(carta)
         logger.info("[Upload] Sucesso id_carta=%s object=%s", id_carta, object_name)
+        storage.enqueue_thumbnail(object_name)
+        sync_carta(db, storage, id_carta)
         # Retornar também uma URL presignada para uso imediato no cliente
         url = storage.get_presigned_url(object_name)
         return {"object_name": object_name, "url": url}
@@ -699,41 +566,21 @@ async def api_upload_anexo(
         raise HTTPException(status_code=500, detail="Falha inesperada ao enviar anexo") from exc
 
 @router.get("/api/{id_carta}/anexo", response_model=dict)
-async def api_get_anexo(
+def api_get_anexo(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db),
 ):
     """
     Retorna uma URL assinada temporária para o último anexo da carta (ADMIN por enquanto).
     """
-    storage = StorageService()
-    from sqlalchemy.orm import Session
-    from app.db import get_db
-    from fastapi import Depends as _Depends
+    storage = get_storage_service()
     # Obter carta para ler campo urlcarta (pode conter object_name ou URL antiga)
-    async def _get_urlcarta(db: Session = _Depends(get_db)):
-        repo = CartasRepository(db)
-        c = repo.get_by_id_carta(id_carta)
-        return getattr(c, 'urlcarta', None) if c else None
-    urlcarta = await _get_urlcarta()  # type: ignore
-
-    def _extract_object(url_or_name: str) -> str:
-        if not url_or_name:
-            return ''
-        # Se já parecer um object_name (começa com 'cartas/')
-        if url_or_name.startswith('cartas/'):
-            return url_or_name
-        base = url_or_name.split('?', 1)[0]
-        parts = base.split('/')
-        if storage.bucket in parts:
-            idx = parts.index(storage.bucket)
-            return '/'.join(parts[idx+1:])
-        # fallback: tentar localizar prefixo 'cartas/' em qualquer posição
-        if 'cartas/' in base:
-            return base.split('cartas/', 1)[1].strip('/')
-        return ''
-
-    object_name = _extract_object(urlcarta or '')
+    repo = CartasRepository(db)
+    c = repo.get_by_id_carta(id_carta)
+    urlcarta = getattr(c, 'urlcarta', None) if c else None
+
+    object_name = storage.object_name_from_url(urlcarta or '')
     if not object_name:
         # fallback para utilitário do storage, se existir
         try:
@@ -749,102 +596,118 @@ async def api_get_anexo(
 
 
 @router.get("/anexo/{id_carta}")
-async def public_redirect_to_anexo(
+def public_anexo(
     id_carta: int,
+    request: Request,
+    v: Optional[str] = Query(None, max_length=64),
     db: Session = Depends(get_db),
 ):
     """
-    Redireciona para uma URL assinada temporária do anexo da cartinha.
+    Entrega o anexo da cartinha com cache HTTP (ETag/304; imutável com `?v=`).
     Aberto (mesma política anterior de exibir anexo publicamente).
+    Com MEDIA_PROXY=false redireciona para uma URL assinada temporária.
     """
-    storage = StorageService()
+    storage = get_storage_service()
     # Buscar a carta e extrair o object_name do campo urlcarta (suporta legacy URL)
     repo = CartasRepository(db)
     c = repo.get_by_id_carta(id_carta)
     if not c or not getattr(c, 'urlcarta', None):
         raise HTTPException(status_code=404, detail="Anexo não encontrado")
-    urlcarta = c.urlcarta or ''
-    def _extract_object(url_or_name: str) -> str:
-        if not url_or_name:
-            return ''
-        if url_or_name.startswith('cartas/'):
-            return url_or_name
-        base = url_or_name.split('?', 1)[0]
-        parts = base.split('/')
-        if storage.bucket in parts:
-            idx = parts.index(storage.bucket)
-            return '/'.join(parts[idx+1:])
-        if 'cartas/' in base:
-            return base.split('cartas/', 1)[1].strip('/')
-        return ''
-    object_name = _extract_object(urlcarta)
+    object_name = storage.object_name_from_url(c.urlcarta or '')
     if not object_name:
         raise HTTPException(status_code=404, detail="Anexo não encontrado")
-    url = storage.get_presigned_url(object_name)
-    return RedirectResponse(url=url, status_code=302)
+    if not get_settings().media_proxy:
+        return RedirectResponse(url=storage.get_presigned_url(object_name), status_code=302)
+    return media_response(
+        request,
+        storage,
+        object_name,
+        version=v,
+        current_version=media_version(c.urlcarta),
+        filename=object_name.rsplit('/', 1)[-1],
+    )
 
 @router.get("/miniatura/{id_carta}")
-async def public_redirect_to_miniatura(
+def public_miniatura(
     id_carta: int,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=4096),
+    v: Optional[str] = Query(None, max_length=64),
     db: Session = Depends(get_db),
 ):
     """
-    Redireciona para uma URL assinada temporária da miniatura da cartinha.
+    Entrega a miniatura da cartinha com cache HTTP (ETag/304; imutável com `?v=`).
     Aberto (mesma política de exibir anexo publicamente).
+
+    Com `?w=` (srcset) escolhe a menor variante WebP com pelo menos essa largura,
+    se o navegador aceitar WebP; caso contrário, entrega a miniatura JPEG.
     """
-    storage = StorageService()
+    storage = get_storage_service()
     # Buscar a carta e extrair o object_name do campo urlcarta_pq
     repo = CartasRepository(db)
     c = repo.get_by_id_carta(id_carta)
     if not c or not getattr(c, 'urlcarta_pq', None):
         raise HTTPException(status_code=404, detail="Miniatura não encontrada")
     
-    thumb_object_name = c.urlcarta_pq
-    if not thumb_object_name:
+    thumb_name = c.urlcarta_pq
+    if not thumb_name:
         raise HTTPException(status_code=404, detail="Miniatura não encontrada")
-    
-    url = storage.get_presigned_url(thumb_object_name)
-    return RedirectResponse(url=url, status_code=302)
+
+    if w and c.thumb_widths and "image/webp" in request.headers.get("accept", ""):
+        thumb_name = variant_object_name(thumb_name, pick_width(c.thumb_widths, w))
+
+    if not get_settings().media_proxy:
+        return RedirectResponse(url=storage.get_presigned_url(thumb_name), status_code=302)
+    return media_response(
+        request,
+        storage,
+        thumb_name,
+        version=v,
+        current_version=media_version(c.urlcarta_pq, c.thumb_updated_at),
+        generation=c.thumb_updated_at,
+        vary_accept=bool(w),
+    )
 
 # API REST
 
 @router.get("/api", response_model=List[CartaSchema])
-async def api_list_cartas(
+def api_list_cartas(
+    response: Response,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    after: Optional[int] = Query(None, ge=1),
+    before: Optional[int] = Query(None, ge=1),
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     API para listar cartinhas.
+
+    O total do filtro vem no cabeçalho X-Total-Count. Com `after`/`before` usa
+    paginação por cursor; os cursores das páginas vizinhas vêm em X-Next-Cursor / X-Prev-Cursor.
     """
     repository = CartasRepository(db)
-    
-    if status == "disponivel":
-        return repository.get_available_cartas(skip=skip, limit=limit)
-    elif status == "adotadas":
-        return repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            repository.model.adotante_email != None,
-            repository.model.status == "adotada"
-        ).offset(skip).limit(limit).all()
-    elif status == "entregues":
-        from sqlalchemy import or_
-        return repository.db.query(repository.model).filter(
-            repository.model.del_bl == False,
-            or_(
-                repository.model.entregue_bl == True,
-                repository.model.status.ilike("%entregue%"),
-            ),
-        ).order_by(repository.model.id.desc()).offset(skip).limit(limit).all()
-    elif status == "minhas":
-        return repository.get_adopted_cartas(user["email"], skip=skip, limit=limit)
-    else:
-        return repository.get_active_cartas(skip=skip, limit=limit)
+
+    filters = repository.status_filters(status, user.get("email"))
+
+    if after is not None or before is not None:
+        cartas, total, next_cursor, prev_cursor = repository.keyset_page(
+            filters, after=after, before=before, limit=limit
+        )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        if prev_cursor is not None:
+            response.headers["X-Prev-Cursor"] = str(prev_cursor)
+        response.headers["X-Total-Count"] = str(total)
+        return cartas
+
+    cartas, total = repository.page_with_total(filters, skip=skip, limit=limit)
+    response.headers["X-Total-Count"] = str(total)
+    return cartas
 
 @router.get("/api/{id_carta}", response_model=CartaSchema)
-async def api_get_carta(
+def api_get_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -861,7 +724,7 @@ async def api_get_carta(
     return carta
 
 @router.post("/api/adopt", response_model=CartaSchema)
-async def api_adopt_carta(
+def api_adopt_carta(
     carta_adopt: CartaAdopt,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -878,7 +741,7 @@ async def api_adopt_carta(
     return carta
 
 @router.post("/api/cancel/{id_carta}", response_model=CartaSchema)
-async def api_cancel_adoption(
+def api_cancel_adoption(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -895,7 +758,7 @@ async def api_cancel_adoption(
     return carta
 
 @router.post("/api/release/{id_carta}", response_model=CartaSchema)
-async def api_release_carta(
+def api_release_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -911,7 +774,7 @@ async def api_release_carta(
     return carta
 
 @router.post("/api/deliver/{id_carta}", response_model=CartaSchema)
-async def api_deliver_carta(
+def api_deliver_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -926,7 +789,7 @@ async def api_deliver_carta(
     return carta
 
 @router.post("/api/undeliver/{id_carta}", response_model=CartaSchema)
-async def api_undeliver_carta(
+def api_undeliver_carta(
     id_carta: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
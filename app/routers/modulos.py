@@ -13,7 +13,7 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def list_modulos(
+def list_modulos(
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
     skip: int = Query(0, ge=0),
@@ -25,7 +25,7 @@ async def list_modulos(
 
 
 @router.post("/", response_model=Dict[str, Any])
-async def create_modulo(
+def create_modulo(
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
@@ -39,7 +39,7 @@ async def create_modulo(
 
 
 @router.patch("/{id_modulo}", response_model=Dict[str, Any])
-async def update_modulo(
+def update_modulo(
     id_modulo: int,
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
@@ -56,7 +56,7 @@ async def update_modulo(
 
 
 @router.delete("/{id_modulo}", response_model=Dict[str, Any])
-async def delete_modulo(
+def delete_modulo(
     id_modulo: int,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
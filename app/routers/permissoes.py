@@ -13,7 +13,7 @@ router = APIRouter(
 
 
 @router.get("/roles", response_model=List[Dict[str, Any]])
-async def list_roles(
+def list_roles(
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
 ):
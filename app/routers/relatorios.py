@@ -2,14 +2,21 @@ from typing import List, Dict, Any, Optional
 from pathlib import Path
 from datetime import datetime
 from fastapi import APIRouter, Depends, Request, Query, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+import os
 
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.dependencies import require_roles
-from app.repositories import CartasRepository
-from app.services.storage_service import StorageService
+from app.repositories import AnexosRepository, CartasRepository
+from app.repositories.cartas_repository import REPORT_SORT_KEYS
+from app.services.cartas_export import XLSX_MEDIA_TYPE, build_xlsx, stream_csv
+from app.services.anexos_inventory import cached_report, deletable_orphans, invalidate_reports, reconcile
+from app.services.media_delivery import media_version
+from app.services.storage_service import get_storage_service
+from app.services.thumbnail_service import derived_prefix, is_derived_object
 from app.version import read_version
 from app.utils.template_helpers import first_name_from_user
 
@@ -22,36 +29,11 @@ templates = Jinja2Templates(directory=str(Path(__file__).resolve().parents[1] /
 # Expor versão global
 templates.env.globals["app_version"] = read_version()
 templates.env.globals["first_name_from_user"] = first_name_from_user
-
-
-def _extract_object_name_from_url(url: str, bucket: str) -> Optional[str]:
-    """
-    Extrai o object_name de uma URL presignada do MinIO/S3.
-    Ex.: https://host/bucket/cartas/10/anexo-abc.pdf?X-Amz-...
-         -> cartas/10/anexo-abc.pdf
-    """
-    if not url:
-        return None
-    try:
-        # Se já for um object_name salvo diretamente
-        if url.startswith("cartas/"):
-            return url
-        # Remover querystring
-        base = url.split("?", 1)[0]
-        marker = f"/{bucket}/"
-        idx = base.find(marker)
-        if idx != -1:
-            return base[idx + len(marker):]
-        # Fallback: encontrar prefixo cartas/ em qualquer URL
-        if "cartas/" in base:
-            return base.split("cartas/", 1)[1].strip("/")
-        return None
-    except Exception:
-        return None
+templates.env.globals["media_version"] = media_version
 
 
 @router.get("/", response_class=HTMLResponse)
-async def relatorios_home(
+def relatorios_home(
     request: Request,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"]))
 ):
@@ -62,48 +44,28 @@ async def relatorios_home(
     )
 
 
+def _inventory(db: Session) -> AnexosRepository:
+    """
+    Repositório do inventário; na primeira consulta (tabela vazia) preenche a tabela anexos
+    com a listagem do bucket, sem alterar as cartinhas.
+    """
+    repo = AnexosRepository(db)
+    if repo.count() == 0:
+        reconcile(db, get_storage_service())
+    return repo
+
+
 @router.get("/anexos-orfaos", response_class=HTMLResponse)
-async def relatorio_anexos_orfaos(
+def relatorio_anexos_orfaos(
     request: Request,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
 ):
-    repo = CartasRepository(db)
-    storage = StorageService()
-
-    # Conjunto de object_names atualmente referenciados por alguma cartinha ativa (del_bl = False)
-    referenced: set[str] = set()
-    active_cartas = repo.db.query(repo.model).filter(repo.model.del_bl == False).all()
-    for c in active_cartas:
-        obj = _extract_object_name_from_url(getattr(c, "urlcarta", None) or "", storage.bucket)
-        if obj:
-            referenced.add(obj)
-
-    # Listar todos os objetos no bucket sob cartas/, mas agrupar para mostrar principal e miniatura relacionada
-    orfaos: List[Dict[str, Any]] = []
-    client = storage._client()
-    for obj in client.list_objects(storage.bucket, prefix="cartas/", recursive=True):
-        name = getattr(obj, "object_name", "")
-        # órfão se não está referenciado por nenhuma cartinha ativa
-        if not name or (name in referenced):
-            continue
-        # Evitar listar a miniatura como linha própria; preferir listar apenas o principal
-        if name.endswith("_thumb.jpg"):
-            continue
-        thumb_name = name.rsplit('.', 1)[0] + "_thumb.jpg"
-        has_thumb = False
-        try:
-            client.stat_object(storage.bucket, thumb_name)
-            has_thumb = True
-        except Exception:
-            has_thumb = False
-        orfaos.append({
-            "object_name": name,
-            "thumb_object": thumb_name if has_thumb else None,
-            "size": getattr(obj, "size", 0),
-            "last_modified": getattr(obj, "last_modified", None),
-        })
-
+    """
+    Lista anexos do inventário (tabela anexos) não referenciados por cartinhas ativas.
+    Miniaturas (JPEG/WebP) não aparecem como linha própria; a JPEG é indicada ao lado do principal.
+    """
+    orfaos = cached_report("orphans", lambda: _inventory(db).orphans())
     return templates.TemplateResponse(
         "relatorios/anexos_orfaos.html",
         {"request": request, "user": user, "anexos_orfaos": orfaos}
@@ -111,74 +73,56 @@ async def relatorio_anexos_orfaos(
 
 
 @router.get("/anexos-referenciados", response_class=HTMLResponse)
-async def relatorio_anexos_referenciados(
+def relatorio_anexos_referenciados(
     request: Request,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
 ):
     """
     Lista anexos que possuem correspondência a cartinhas no banco de dados (não deletadas logicamente).
+    A miniatura é a informada na carta (urlcarta_pq) ou, na falta, a da convenção _thumb.jpg.
     """
-    repo = CartasRepository(db)
-    storage = StorageService()
-
-    # Coletar todos os object_names referenciados por cartinhas ativas
-    referenced: set[str] = set()
-    active_cartas = repo.db.query(repo.model).filter(repo.model.del_bl == False).all()
-    for c in active_cartas:
-        obj = _extract_object_name_from_url(getattr(c, "urlcarta", None) or "", storage.bucket)
-        if obj:
-            referenced.add(obj)
-
-    # Mapear thumbs informadas no banco (urlcarta_pq)
-    thumb_by_main: dict[str, str] = {}
-    for c in active_cartas:
-        main_obj = _extract_object_name_from_url(getattr(c, "urlcarta", None) or "", storage.bucket)
-        thumb_obj = _extract_object_name_from_url(getattr(c, "urlcarta_pq", None) or "", storage.bucket)
-        if main_obj and thumb_obj:
-            thumb_by_main[main_obj] = thumb_obj
-
-    # Para obter detalhes (tamanho/data), varrer o bucket e incluir os que estão referenciados
-    referenciados: List[Dict[str, Any]] = []
-    client = storage._client()
-    for obj in client.list_objects(storage.bucket, prefix="cartas/", recursive=True):
-        name = getattr(obj, "object_name", "")
-        if name and (name in referenced):
-            # Determinar thumb preferencial: banco, senão por convenção
-            thumb_name = thumb_by_main.get(name) or (name.rsplit('.', 1)[0] + "_thumb.jpg")
-            has_thumb = False
-            try:
-                client.stat_object(storage.bucket, thumb_name)
-                has_thumb = True
-            except Exception:
-                has_thumb = False
-            referenciados.append({
-                "object_name": name,
-                "thumb_object": thumb_name if has_thumb else None,
-                "size": getattr(obj, "size", 0),
-                "last_modified": getattr(obj, "last_modified", None),
-            })
-
+    referenciados = cached_report("referenced", lambda: _inventory(db).referenced())
     return templates.TemplateResponse(
         "relatorios/anexos_referenciados.html",
         {"request": request, "user": user, "anexos_referenciados": referenciados}
     )
 
 
+@router.post("/api/anexos/reconcile")
+def api_reconcile_anexos(
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Reconcilia o inventário de anexos com a listagem atual do bucket e normaliza
+    urlcarta/urlcarta_pq legados (URL completa) para object_name.
+    """
+    return reconcile(db, get_storage_service(), normalize_urls=True)
+
+
 @router.get("/api/object-url")
-async def api_get_object_url(
+def api_get_object_url(
     object_name: str = Query(..., description="Nome do objeto no bucket (ex.: cartas/10/anexo-abc.pdf)"),
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"]))
 ) -> Dict[str, Any]:
     if not object_name or "/" not in object_name:
         raise HTTPException(status_code=400, detail="object_name inválido")
-    storage = StorageService()
+    storage = get_storage_service()
     url = storage.get_presigned_url(object_name)
     return {"url": url}
 
 
+@router.get("/api/storage-cache")
+def api_storage_cache_stats(
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"]))
+) -> Dict[str, Any]:
+    """Acertos/faltas do cache de URLs assinadas e ocupação do cache local (por processo)."""
+    return get_storage_service().cache_stats()
+
+
 @router.post("/api/delete-object")
-async def api_delete_object(
+def api_delete_object(
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db)
@@ -186,7 +130,7 @@ async def api_delete_object(
     object_name = (payload or {}).get("object_name")
     if not object_name:
         raise HTTPException(status_code=400, detail="object_name é obrigatório")
-    storage = StorageService()
+    storage = get_storage_service()
     
     # Extrair id_carta do object_name para limpar campos da carta deletada
     def _extract_id_carta_from_object(name: str) -> Optional[int]:
@@ -203,15 +147,22 @@ async def api_delete_object(
     
     # Apagar objeto principal
     storage.delete_object(object_name)
+    deleted = [object_name]
     
-    # Se for principal, tentar apagar miniatura correspondente
+    # Se for principal, tentar apagar as miniaturas correspondentes (JPEG e variantes WebP)
     try:
-        thumb_name = object_name.rsplit('.', 1)[0] + "_thumb.jpg"
-        storage.delete_object(thumb_name)
+        for derived in storage.list_object_names(derived_prefix(object_name)):
+            if is_derived_object(derived):
+                storage.delete_object(derived)
+                deleted.append(derived)
     except Exception:
         # ignorar se não existir
         pass
     
+    # Retirar do inventário de anexos o que foi apagado
+    AnexosRepository(db).forget(deleted)
+    invalidate_reports()
+
     # Se conseguimos extrair id_carta, limpar campos urlcarta e urlcarta_pq das cartas deletadas
     if id_carta is not None:
         repo = CartasRepository(db)
@@ -225,6 +176,8 @@ async def api_delete_object(
             # Limpar campos de anexo
             carta.urlcarta = None
             carta.urlcarta_pq = None
+            carta.thumb_widths = None
+            carta.thumb_updated_at = None
             carta.updated_at = datetime.now()
             db.add(carta)
         
@@ -234,49 +187,100 @@ async def api_delete_object(
     return {"success": True}
 
 
+@router.post("/api/delete-objects")
+def api_delete_objects(
+    payload: Dict[str, Any],
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Exclusão em lote de anexos órfãos e de suas miniaturas.
+
+    Payload: {"object_names": [...]} ou {"all_orphans": true}. Só anexos originais órfãos do
+    inventário são apagados; os que (ou cujas miniaturas) estão em uso são ignorados
+    (ver deletable_orphans). Usa exclusão em lote do MinIO e limpa urlcarta/urlcarta_pq
+    das cartinhas deletadas correspondentes com um único UPDATE.
+    """
+    payload = payload or {}
+    anexos = AnexosRepository(db)
+    if payload.get("all_orphans"):
+        names = [item["object_name"] for item in anexos.orphans()]
+    else:
+        names = payload.get("object_names")
+        if not isinstance(names, list) or not all(isinstance(n, str) and n for n in names):
+            raise HTTPException(status_code=400, detail="object_names (lista) ou all_orphans é obrigatório")
+        names = list(dict.fromkeys(names))
+
+    targets, derived, skipped = deletable_orphans(anexos, names)
+    storage = get_storage_service()
+    outcome = storage.delete_objects(targets + [d for n in targets for d in derived[n]])
+
+    results: List[Dict[str, Any]] = []
+    removed: List[str] = []
+    for name in names:
+        if name in skipped:
+            results.append({"object_name": name, "status": "skipped", "error": skipped[name]})
+            continue
+        error = outcome.get(name)
+        thumbs_removed = [d for d in derived[name] if outcome.get(d) is None]
+        removed.extend(thumbs_removed)
+        if error is None:
+            removed.append(name)
+        results.append({
+            "object_name": name,
+            "status": "deleted" if error is None else "error",
+            "error": error,
+            "thumbs_deleted": len(thumbs_removed),
+        })
+
+    anexos.forget(removed)
+    invalidate_reports()
+    cartas_updated = CartasRepository(db).clear_deleted_attachments(
+        [r["object_name"] for r in results if r["status"] == "deleted"]
+    )
+    return {
+        "deleted": sum(1 for r in results if r["status"] == "deleted"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "cartas_updated": cartas_updated,
+        "results": results,
+    }
+
+
 @router.get("/cartas", response_class=HTMLResponse)
-async def relatorio_todas_cartas(
+def relatorio_todas_cartas(
     request: Request,
     q: Optional[str] = Query(None, description="Filtrar por nome"),
     status: Optional[str] = Query(None, description="Status da cartinha"),
+    sort: Optional[str] = Query(None, description="Coluna de ordenação"),
+    dir: str = Query("asc", pattern="^(asc|desc)$", description="Direção da ordenação"),
+    page: int = Query(1, ge=1, description="Página"),
+    per_page: int = Query(50, ge=1, le=500, description="Itens por página"),
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
 ):
-    """Relatório com todas as cartinhas e informações de anexos/miniaturas."""
-    repo = CartasRepository(db)
+    """
+    Relatório com todas as cartinhas e informações de anexos/miniaturas.
 
-    query = repo.db.query(repo.model).filter(repo.model.del_bl == False)
+    Estatísticas do conjunto filtrado em uma consulta agregada; linhas paginadas e
+    ordenadas no banco (com a pesquisa por nome, mais parecidos primeiro).
+    """
+    repo = CartasRepository(db)
     if q:
-        # filtro simples por nome contendo
-        from sqlalchemy import func
-        query = query.filter(func.unaccent(func.coalesce(repo.model.nome, ""))).filter(
-            func.unaccent(repo.model.nome).ilike(f"%{q}%")
-        )
-    if status == "disponivel":
-        query = query.filter(repo.model.status == "disponível")
-    elif status == "adotadas":
-        query = query.filter(repo.model.status == "adotada")
-    elif status == "entregues":
-        from sqlalchemy import or_
-        query = query.filter(or_(repo.model.entregue_bl == True, repo.model.status.ilike("%entregue%")))
-
-    cartas = query.order_by(repo.model.id.desc()).all()
-
-    # Estatísticas baseadas no conjunto filtrado
-    total = len(cartas)
-    sexo_m = sum(1 for c in cartas if getattr(c, 'sexo', None) == 'M')
-    sexo_f = sum(1 for c in cartas if getattr(c, 'sexo', None) == 'F')
-    status_counts: Dict[str, int] = {}
-    for c in cartas:
-        key = getattr(c, 'status', None) or 'indefinido'
-        status_counts[key] = status_counts.get(key, 0) + 1
-
-    # Contagem por grupos (baseado no conjunto filtrado)
-    from app.models import Grupo
-    group_counts: Dict[str, int] = {}
-    for c in cartas:
-        name = c.grupo.ds_grupo if getattr(c, 'grupo', None) else 'Sem grupo'
-        group_counts[name] = group_counts.get(name, 0) + 1
+        repo.use_name_similarity()
+    filters = repo.report_filters(q, status)
+    stats = repo.report_stats(filters)
+    if sort not in REPORT_SORT_KEYS:
+        sort = None
+    cartas, total = repo.report_page(
+        filters,
+        sort=sort,
+        descending=dir == "desc",
+        rank=repo.name_similarity(q) if q else None,
+        skip=(page - 1) * per_page,
+        limit=per_page,
+    )
+    total_pages = (total + per_page - 1) // per_page
 
     return templates.TemplateResponse(
         "relatorios/cartas.html",
@@ -286,11 +290,59 @@ async def relatorio_todas_cartas(
             "cartas": cartas,
             "q": q,
             "status_filter": status,
-            "stats": {
+            "sort": sort,
+            "dir": dir,
+            "stats": stats,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
                 "total": total,
-                "sexo": {"M": sexo_m, "F": sexo_f},
-                "status": status_counts,
-                "grupos": group_counts,
+                "total_pages": total_pages,
+                "has_next": page < total_pages,
+                "has_prev": page > 1,
             },
         },
     )
+
+
+def _export_filename(ext: str) -> str:
+    return f"relatorio_cartas_{datetime.now():%Y%m%d_%H%M}.{ext}"
+
+
+@router.get("/cartas/export.csv")
+def exportar_cartas_csv(
+    q: Optional[str] = Query(None, description="Filtrar por nome"),
+    status: Optional[str] = Query(None, description="Status da cartinha"),
+    sort: Optional[str] = Query(None, description="Coluna de ordenação"),
+    dir: str = Query("asc", pattern="^(asc|desc)$", description="Direção da ordenação"),
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+):
+    """Relatório de cartinhas em CSV, com os filtros da página, enviado em streaming."""
+    body = stream_csv(SessionLocal, q=q, status=status, sort=sort, descending=dir == "desc")
+    return StreamingResponse(
+        body,
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{_export_filename("csv")}"'},
+    )
+
+
+@router.get("/cartas/export.xlsx")
+def exportar_cartas_xlsx(
+    q: Optional[str] = Query(None, description="Filtrar por nome"),
+    status: Optional[str] = Query(None, description="Status da cartinha"),
+    sort: Optional[str] = Query(None, description="Coluna de ordenação"),
+    dir: str = Query("asc", pattern="^(asc|desc)$", description="Direção da ordenação"),
+    user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
+    db: Session = Depends(get_db),
+):
+    """Relatório de cartinhas em XLSX, com os filtros da página (arquivo temporário, removido após o envio)."""
+    try:
+        path = build_xlsx(db, q=q, status=status, sort=sort, descending=dir == "desc")
+    except ImportError as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=_export_filename("xlsx"),
+        background=BackgroundTask(os.unlink, path),
+    )
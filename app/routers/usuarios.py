@@ -14,7 +14,7 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def list_usuarios(
+def list_usuarios(
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
     ativo: Optional[bool] = Query(None),
@@ -45,7 +45,7 @@ async def list_usuarios(
 
 
 @router.get("/roles", response_model=List[Dict[str, Any]])
-async def list_roles(
+def list_roles(
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
 ):
@@ -54,7 +54,7 @@ async def list_roles(
 
 
 @router.get("/{email}", response_model=Dict[str, Any])
-async def get_usuario(
+def get_usuario(
     email: str,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
@@ -75,7 +75,7 @@ async def get_usuario(
 
 
 @router.post("/", response_model=Dict[str, Any])
-async def create_usuario(
+def create_usuario(
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
     db: Session = Depends(get_db),
@@ -134,7 +134,7 @@ async def create_usuario(
 
 
 @router.patch("/{email}", response_model=Dict[str, Any])
-async def patch_usuario(
+def patch_usuario(
     email: str,
     payload: Dict[str, Any],
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
@@ -167,7 +167,7 @@ async def patch_usuario(
 
 
 @router.post("/{email}/roles/{role_code}", response_model=Dict[str, Any])
-async def add_role(
+def add_role(
     email: str,
     role_code: str,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
@@ -182,7 +182,7 @@ async def add_role(
 
 
 @router.delete("/{email}/roles/{role_code}", response_model=Dict[str, Any])
-async def remove_role(
+def remove_role(
     email: str,
     role_code: str,
     user: Dict[str, Any] = Depends(require_roles(["ADMIN"])),
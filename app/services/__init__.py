@@ -1,3 +1,10 @@
-from .auth_service import AuthService
+# Import preguiçoso: módulos puros (pdf_utils, thumbnail_service) são carregados
+# nos processos do pool de miniaturas sem abrir o banco via auth_service/models.
+def __getattr__(name):
+    if name == "AuthService":
+        from .auth_service import AuthService
+        return AuthService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["AuthService"]
@@ -0,0 +1,196 @@
+"""
+Inventário dos objetos do bucket (tabela anexos).
+
+- `object_row` converte um item da listagem do MinIO em linha do inventário
+  (id_carta e tipo derivados do nome; content_type pela extensão, pois a
+  listagem não traz o tipo).
+- `sync_carta` re-sincroniza um único prefixo cartas/{id_carta}/ após upload,
+  geração de miniatura ou exclusão; é best-effort (falhas só são registradas e
+  a reconciliação corrige depois).
+- `reconcile` compara o inventário inteiro com uma única listagem do bucket. Só os
+  objetos novos passam por stat_object (content_type real), em um pool de
+  STAT_WORKERS threads. Com normalize_urls (só a ação explícita do admin em
+  /api/anexos/reconcile), também grava urlcarta/urlcarta_pq legados (URL completa)
+  como object_name, para que os relatórios cruzem os dois por igualdade indexada.
+- `deletable_orphans` decide o que a exclusão em lote pode apagar: só anexos
+  originais órfãos do inventário cujas miniaturas também não estejam em uso.
+- Os relatórios ficam em cache por REPORT_TTL_SECONDS (por processo); qualquer
+  sincronização/reconciliação/exclusão descarta o cache (`invalidate_reports`) e
+  avança a geração, para que uma carga iniciada antes disso não seja guardada.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import mimetypes
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.models import CartaDiversa
+from app.repositories.anexos_repository import AnexosRepository
+from app.services.thumbnail_service import id_carta_from_object, is_derived_object, thumb_object_name
+
+logger = logging.getLogger("uvicorn")
+
+PREFIX = "cartas/"
+# Consultas stat_object simultâneas na reconciliação
+STAT_WORKERS = 8
+# Validade dos relatórios em cache (atualizações seguidas da página pelo admin)
+REPORT_TTL_SECONDS = 30.0
+
+_reports: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_reports_lock = threading.Lock()
+# Avança a cada invalidate_reports; cargas de uma geração anterior não entram no cache
+_reports_generation = 0
+
+
+def cached_report(name: str, loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Resultado do relatório `name`, recalculado no máximo a cada REPORT_TTL_SECONDS."""
+    now = time.monotonic()
+    with _reports_lock:
+        entry = _reports.get(name)
+        if entry is not None and now - entry[0] < REPORT_TTL_SECONDS:
+            return entry[1]
+        generation = _reports_generation
+    rows = loader()
+    with _reports_lock:
+        if generation == _reports_generation:
+            _reports[name] = (now, rows)
+    return rows
+
+
+def invalidate_reports() -> None:
+    """Descarta os relatórios em cache (o inventário mudou)."""
+    global _reports_generation
+    with _reports_lock:
+        _reports_generation += 1
+        _reports.clear()
+
+
+def object_row(item: Dict[str, Any], content_type: Optional[str] = None) -> Dict[str, Any]:
+    """Linha da tabela anexos para um item de StorageService.list_objects_info."""
+    name = item["object_name"]
+    return {
+        "object_name": name,
+        "id_carta": id_carta_from_object(name),
+        "size": int(item.get("size") or 0),
+        "content_type": content_type or mimetypes.guess_type(name)[0],
+        "last_modified": item.get("last_modified"),
+        "kind": "thumb" if is_derived_object(name) else "original",
+        "checksum": item.get("checksum"),
+    }
+
+
+def sync_carta(db: Session, storage, id_carta: Optional[int]) -> None:
+    """Atualiza o inventário do prefixo da carta a partir do bucket (best-effort)."""
+    if id_carta is None:
+        return
+    prefix = f"{PREFIX}{id_carta}/"
+    try:
+        rows = [object_row(item) for item in storage.list_objects_info(prefix)]
+        AnexosRepository(db).sync(rows, prefix)
+        invalidate_reports()
+    except Exception:
+        db.rollback()
+        logger.warning("[Anexos] Falha ao sincronizar inventário prefix=%s", prefix, exc_info=True)
+
+
+def _normalize_legacy_urls(db: Session, storage) -> int:
+    """Regrava urlcarta/urlcarta_pq em formato de URL completa como object_name (gravado no sync seguinte)."""
+    m = CartaDiversa
+    rows = (
+        db.query(m.id, m.urlcarta, m.urlcarta_pq)
+        .filter(
+            (m.urlcarta.isnot(None) & ~m.urlcarta.startswith(PREFIX))
+            | (m.urlcarta_pq.isnot(None) & ~m.urlcarta_pq.startswith(PREFIX))
+        )
+        .all()
+    )
+    changed = 0
+    for id_, urlcarta, urlcarta_pq in rows:
+        values = {}
+        for column, value in (("urlcarta", urlcarta), ("urlcarta_pq", urlcarta_pq)):
+            name = storage.object_name_from_url(value or "")
+            if value and name and name != value:
+                values[column] = name
+        if values:
+            db.query(m).filter(m.id == id_).update(values, synchronize_session=False)
+            changed += 1
+    return changed
+
+
+def _content_types(storage, names: List[str]) -> Dict[str, Optional[str]]:
+    """content_type real (stat_object) dos objetos, consultados em paralelo."""
+    if not names:
+        return {}
+    client = storage._client()
+
+    def _stat(name: str) -> Tuple[str, Optional[str]]:
+        try:
+            return name, getattr(client.stat_object(storage.bucket, name), "content_type", None)
+        except Exception:
+            return name, None
+
+    with ThreadPoolExecutor(max_workers=min(STAT_WORKERS, len(names)), thread_name_prefix="anexos-stat") as pool:
+        return dict(pool.map(_stat, names))
+
+
+def reconcile(db: Session, storage, normalize_urls: bool = False) -> Dict[str, int]:
+    """
+    Iguala o inventário à listagem atual do bucket (uma única listagem recursiva).
+
+    Args:
+        normalize_urls: Também regravar urlcarta/urlcarta_pq legados como object_name
+            (altera cartas_diversas; só na reconciliação pedida pelo admin)
+
+    Returns:
+        {"listed": n, "upserted": n, "removed": n, "normalized": n}
+    """
+    normalized = _normalize_legacy_urls(db, storage) if normalize_urls else 0
+    listing = storage.list_objects_info(PREFIX)
+    repo = AnexosRepository(db)
+    known = repo.known_names()
+    new_types = _content_types(storage, [i["object_name"] for i in listing if i["object_name"] not in known])
+    rows = [object_row(item, new_types.get(item["object_name"])) for item in listing]
+    result = repo.sync(rows, PREFIX)
+    invalidate_reports()
+    result.update({"listed": len(rows), "normalized": normalized})
+    logger.info(
+        "[Anexos] Reconciliação: %s objeto(s) (%s novo(s)), %s removido(s) do inventário, %s URL(s) normalizada(s)",
+        len(rows), len(new_types), result["removed"], normalized,
+    )
+    return result
+
+
+def deletable_orphans(
+    repo: AnexosRepository, object_names: List[str]
+) -> Tuple[List[str], Dict[str, List[str]], Dict[str, str]]:
+    """
+    Separa, dos object_names pedidos, os que podem ser apagados junto com as miniaturas.
+
+    Só anexos originais órfãos no inventário; nem eles nem suas miniaturas (inventariadas
+    ou pela convenção _thumb.jpg) podem estar em urlcarta/urlcarta_pq de cartinha ativa
+    (ex.: miniatura do anexo antigo ainda apontada enquanto a do novo é gerada).
+
+    Returns:
+        (alvos, miniaturas inventariadas de cada alvo, {nome ignorado: motivo})
+    """
+    orphans = repo.orphan_originals(object_names)
+    candidates = [n for n in object_names if n in orphans]
+    derived = repo.derived_of(candidates)
+    related = {n: {n, thumb_object_name(n), *derived[n]} for n in candidates}
+    in_use = repo.referenced_names(sorted(set().union(*related.values())))
+
+    targets: List[str] = []
+    skipped: Dict[str, str] = {}
+    for name in object_names:
+        if name not in orphans:
+            skipped[name] = "Não é anexo original órfão no inventário"
+        elif related[name] & in_use:
+            skipped[name] = "Referenciado por cartinha ativa"
+        else:
+            targets.append(name)
+    return targets, derived, skipped
@@ -0,0 +1,40 @@
+"""
+Orçamento de bytes em andamento (semáforo ponderado por tamanho).
+
+Limita quantos bytes de objetos baixados podem estar sendo processados ao mesmo
+tempo no processo: cada download reserva o tamanho do objeto e devolve ao final.
+Um objeto maior que o orçamento inteiro ainda é atendido, mas sozinho.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator
+import threading
+
+
+class ByteBudget:
+    """Semáforo em bytes: `reserve(n)` bloqueia enquanto em_andamento + n > limite."""
+
+    def __init__(self, limit_bytes: int) -> None:
+        self.limit = max(1, int(limit_bytes))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[None]:
+        nbytes = max(0, int(nbytes))
+        with self._cond:
+            while self._in_flight and self._in_flight + nbytes > self.limit:
+                self._cond.wait()
+            self._in_flight += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= nbytes
+                self._cond.notify_all()
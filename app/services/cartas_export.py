@@ -0,0 +1,152 @@
+"""
+Exportação do relatório de cartinhas (/relatorios/cartas) em CSV e XLSX.
+
+- Mesmos filtros e ordem da página (CartasRepository.report_filters/report_order);
+  as linhas vêm de CartasRepository.report_export_rows (cursor do lado do servidor,
+  EXPORT_BATCH linhas por vez), então a memória não depende do total de cartinhas.
+- CSV: gerado e enviado em blocos enquanto o cursor é lido. A consulta usa sessão
+  própria, aberta e fechada pelo gerador, pois a sessão de get_db é encerrada antes
+  do corpo do StreamingResponse ser enviado. Separador ';' e BOM UTF-8, para o Excel
+  em português abrir as colunas e os acentos corretamente.
+- Textos que começam como fórmula (=, +, -, @, tab, CR) recebem o prefixo ' nos dois
+  formatos (ver safe_cell); datas saem no horário local.
+- XLSX: openpyxl em modo write_only (cada linha vai direto para o arquivo temporário);
+  o arquivo pronto é enviado e removido em seguida.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+import csv
+import io
+import os
+import tempfile
+
+from sqlalchemy.orm import Session
+
+from app.repositories.cartas_repository import CartasRepository
+
+# Linhas lidas do cursor (e escritas no CSV) por vez
+EXPORT_BATCH = 1000
+CSV_DELIMITER = ";"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+HEADERS = [
+    "ID", "Cód. Carta", "Grupo", "Nome", "Sexo", "Idade", "Presente", "Status",
+    "Adotante (email)", "Adotante (nome)", "Entregue", "Entregue em", "Entregue por",
+    "Anexo", "Miniatura",
+]
+
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _yes_no(value: Any) -> str:
+    return "Sim" if value else "Não"
+
+
+def safe_cell(value: Any) -> Any:
+    """Texto digitado por usuários vira texto literal na planilha (prefixo ' antes de =, +, -, @...)."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _local(value: Optional[datetime]) -> Optional[datetime]:
+    # timestamptz vem em UTC; planilha mostra o horário local do servidor
+    return value.astimezone() if value is not None else None
+
+
+def row_values(row: Any) -> List[Any]:
+    """Valores de uma linha de report_export_rows, na ordem de HEADERS (entregue_em em horário local)."""
+    values = [
+        row.id_carta, row.cod_carta, row.ds_grupo or "", row.nome, row.sexo, row.idade, row.presente, row.status,
+        row.adotante_email or "", row.adotante_nome or "",
+        _yes_no(row.entregue_bl), _local(row.entregue_em), row.entregue_por_nome or "",
+        _yes_no(row.tem_anexo), _yes_no(row.tem_miniatura),
+    ]
+    return [safe_cell(v) for v in values]
+
+
+def report_rows(
+    db: Session,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: Optional[str] = None,
+    descending: bool = False,
+) -> Iterator[Any]:
+    """Linhas do relatório com os filtros/ordem da página (pesquisa por nome: mais parecidos primeiro)."""
+    repo = CartasRepository(db)
+    if q:
+        repo.use_name_similarity()
+    return repo.report_export_rows(
+        repo.report_filters(q, status),
+        sort=sort,
+        descending=descending,
+        rank=repo.name_similarity(q) if q else None,
+        batch=EXPORT_BATCH,
+    )
+
+
+def iter_csv(rows: Iterable[Any]) -> Iterator[bytes]:
+    """CSV (UTF-8 com BOM) em blocos de até EXPORT_BATCH linhas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITER)
+    buffer.write("\ufeff")
+    writer.writerow(HEADERS)
+    for count, row in enumerate(rows, start=1):
+        values = row_values(row)
+        if isinstance(values[11], datetime):
+            values[11] = values[11].strftime("%d/%m/%Y %H:%M")
+        writer.writerow(["" if v is None else v for v in values])
+        if count % EXPORT_BATCH == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_csv(session_factory: Callable[[], Session], **filters: Any) -> Iterator[bytes]:
+    """Corpo do StreamingResponse: abre a própria sessão e a fecha ao terminar (ou se o cliente desistir)."""
+    db = session_factory()
+    try:
+        yield from iter_csv(report_rows(db, **filters))
+    finally:
+        db.close()
+
+
+def write_xlsx(rows: Iterable[Any], path: str) -> None:
+    """
+    Grava a planilha em `path` com openpyxl em modo write_only.
+
+    Raises:
+        ImportError: openpyxl não instalado
+    """
+    try:
+        from openpyxl import Workbook  # lazy import
+    except ImportError:
+        raise ImportError("Dependência 'openpyxl' não instalada. Execute: pip install openpyxl")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Cartinhas")
+    ws.append(HEADERS)
+    for row in rows:
+        values = row_values(row)
+        if isinstance(values[11], datetime):
+            # Excel não guarda fuso horário
+            values[11] = values[11].replace(tzinfo=None)
+        ws.append(values)
+    wb.save(path)
+
+
+def build_xlsx(db: Session, **filters: Any) -> str:
+    """Gera o XLSX do relatório em um arquivo temporário e devolve o caminho (quem chama remove)."""
+    fd, path = tempfile.mkstemp(prefix="relatorio_cartas_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(report_rows(db, **filters), path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
@@ -0,0 +1,167 @@
+"""
+Cache local em disco (LRU) para objetos do MinIO.
+
+- Cada object_name vira um arquivo `<dir>/<hh>/<sha1>`; o nome não depende do
+  processo, então os workers do uvicorn compartilham o mesmo diretório.
+- Gravação atômica: o conteúdo vai para um temporário no mesmo diretório e só
+  aparece no nome final via os.replace (leitores nunca veem arquivo parcial).
+- O índice LRU (ordem de uso e bytes) fica em memória por processo e é
+  reconstruído a partir do diretório na inicialização (mais antigos primeiro);
+  acima do limite os menos usados são removidos.
+- Objetos maiores que 1/MAX_ENTRY_FRACTION do limite não são guardados.
+- O mtime do arquivo é o Last-Modified do objeto no MinIO.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Iterable, Optional
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger("uvicorn")
+
+# Um único objeto ocupa no máximo esta fração do cache
+MAX_ENTRY_FRACTION = 8
+_TMP_PREFIX = ".tmp-"
+
+
+class DiskCache:
+    """Arquivos locais por object_name com limite de bytes e descarte LRU."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max(1, int(max_bytes))
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total
+
+    @property
+    def max_entry_bytes(self) -> int:
+        return self.max_bytes // MAX_ENTRY_FRACTION
+
+    @staticmethod
+    def _key(object_name: str) -> str:
+        return hashlib.sha1(object_name.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self) -> None:
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if name.startswith(_TMP_PREFIX):
+                        # Sobra de gravação interrompida
+                        os.unlink(path)
+                        continue
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, name, st.st_size))
+        for _mtime, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        self._evict()
+        logger.info("[DiskCache] %s arquivo(s), %s bytes em %s", len(self._entries), self._total, self.directory)
+
+    def get(self, object_name: str) -> Optional[str]:
+        """Caminho do arquivo em cache (marcado como usado) ou None."""
+        key = self._key(object_name)
+        path = self._path(key)
+        with self._lock:
+            if key in self._entries:
+                if os.path.exists(path):
+                    self._entries.move_to_end(key)
+                    return path
+                # Removido por outro processo (invalidação/descarte)
+                self._total -= self._entries.pop(key)
+                return None
+        if os.path.exists(path):
+            # Gravado por outro processo: passar a contabilizar aqui
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return None
+            self._add(key, size)
+            return path
+        return None
+
+    def put(self, object_name: str, chunks: Iterable[bytes], mtime: Optional[float] = None) -> Optional[str]:
+        """
+        Grava o conteúdo de forma atômica e retorna o caminho final.
+
+        Retorna None (sem deixar arquivo) se o conteúdo passar de `max_entry_bytes`.
+        """
+        key = self._key(object_name)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=os.path.dirname(path))
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_entry_bytes:
+                        raise _TooLarge()
+                    fh.write(chunk)
+            if mtime is not None:
+                os.utime(tmp, (mtime, mtime))
+            os.replace(tmp, path)
+        except _TooLarge:
+            os.unlink(tmp)
+            return None
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._add(key, size)
+        return path
+
+    def invalidate(self, object_name: str) -> None:
+        """Remove o objeto do cache (também para os demais processos)."""
+        key = self._key(object_name)
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._total -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _add(self, key: str, size: int) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old
+            self._entries[key] = size
+            self._total += size
+            self._evict()
+
+    def _evict(self) -> None:
+        # Chamado com o lock (ou na inicialização); remove os menos usados
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+
+class _TooLarge(Exception):
+    pass
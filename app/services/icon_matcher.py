@@ -0,0 +1,153 @@
+"""Matcher compilado de palavras-chave → ícones de presente.
+
+Monta um autômato Aho-Corasick com as palavras-chave normalizadas da tabela
+`icon_presente`, de modo que cada texto de presente é percorrido uma única vez,
+independentemente da quantidade de palavras-chave cadastradas.
+
+O matcher é mantido por processo (ver `get_cached_matcher`/`invalidate_icon_matcher`);
+quem decide quando reconstruí-lo é o `IconPresenteRepository`.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import threading
+import time
+import unicodedata
+
+
+def normalize_text(value: str) -> str:
+    """Remove acentos (NFKD) e converte para minúsculas."""
+    if not value:
+        return ""
+    nfkd = unicodedata.normalize("NFKD", value)
+    only_ascii = "".join([c for c in nfkd if not unicodedata.combining(c)])
+    return only_ascii.lower()
+
+
+def to_fa6_name(icon_code: str) -> str:
+    """Converte 'fa-solid fa-gift' (ou 'fa-gift') no nome base do ícone ('gift')."""
+    if not icon_code:
+        return ""
+    parts = icon_code.strip().split()
+    candidate = parts[-1] if parts else icon_code
+    if candidate.startswith("fa-"):
+        candidate = candidate[3:]
+    return candidate
+
+
+class IconMatcher:
+    """
+    Autômato Aho-Corasick sobre as palavras-chave de `icon_presente`.
+
+    Cada mapeamento (keyword separada por vírgulas, icon_code) vira um índice;
+    o resultado preserva a ordem dos mapeamentos e não repete ícones, como a
+    busca linear anterior.
+    """
+
+    def __init__(self, mappings: Sequence[Tuple[str, str]]):
+        self._icons: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[int]] = [set()]
+
+        for idx, (keyword, icon_code) in enumerate(mappings):
+            self._icons.append(to_fa6_name(str(icon_code or "")))
+            if not (keyword and icon_code):
+                continue
+            for kw in str(keyword).split(","):
+                nkw = normalize_text(kw.strip())
+                if nkw:
+                    self._add(nkw, idx)
+        self._build_failure_links()
+
+    def _add(self, word: str, idx: int) -> None:
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._out[node].add(idx)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] |= self._out[self._fail[child]]
+
+    def match(self, text: str) -> List[str]:
+        """Retorna os nomes de ícones (FA6) sugeridos para o texto do presente."""
+        if not text:
+            return []
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        node = 0
+        for ch in normalize_text(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        icon_names: List[str] = []
+        seen = set()
+        for idx in sorted(found):
+            base = self._icons[idx]
+            if base and base not in seen:
+                icon_names.append(base)
+                seen.add(base)
+        return icon_names
+
+    def match_many(self, texts: Iterable[str]) -> List[List[str]]:
+        """Versão em lote de `match`, na mesma ordem dos textos recebidos."""
+        return [self.match(t or "") for t in texts]
+
+
+# Cache por processo: (matcher, assinatura da tabela, instante da última verificação)
+_lock = threading.Lock()
+_matcher: Optional[IconMatcher] = None
+_signature: Optional[str] = None
+_checked_at: float = 0.0
+
+# Intervalo mínimo entre verificações da assinatura da tabela no banco
+REFRESH_SECONDS = 60.0
+
+
+def get_cached_matcher() -> Tuple[Optional[IconMatcher], Optional[str], bool]:
+    """Retorna (matcher, assinatura, precisa_verificar)."""
+    with _lock:
+        stale = (time.monotonic() - _checked_at) >= REFRESH_SECONDS
+        return _matcher, _signature, (_matcher is None or stale)
+
+
+def store_matcher(matcher: IconMatcher, signature: Optional[str]) -> None:
+    global _matcher, _signature, _checked_at
+    with _lock:
+        _matcher = matcher
+        _signature = signature
+        _checked_at = time.monotonic()
+
+
+def mark_checked() -> None:
+    global _checked_at
+    with _lock:
+        _checked_at = time.monotonic()
+
+
+def invalidate_icon_matcher() -> None:
+    """Descarta o matcher compilado; o próximo uso reconstrói a partir do banco."""
+    global _matcher, _signature, _checked_at
+    with _lock:
+        _matcher = None
+        _signature = None
+        _checked_at = 0.0
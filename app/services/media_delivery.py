@@ -0,0 +1,161 @@
+"""
+Entrega de anexos e miniaturas pela própria aplicação (proxy do MinIO) com cache HTTP.
+
+- ETag e `?v=` vêm do object_name mais a geração do conteúdo. Anexos recebem um uuid
+  novo a cada upload (o nome basta); miniaturas são regravadas sob o mesmo nome
+  (regeneração, THUMB_SIZE), então entram com thumb_updated_at da carta. Assim um
+  `If-None-Match` válido é respondido com 304 sem consultar o MinIO.
+- Links gerados pelos templates levam `?v=<media_version>`; com a versão atual a
+  resposta é cacheável por um ano (`immutable`). Sem ela (links antigos/compartilhados)
+  o navegador revalida a cada uso e recebe 304 enquanto o conteúdo não mudar.
+- Objetos que cabem no cache local (MEDIA_CACHE_MB, ver StorageService.cache_object)
+  são servidos do disco com FileResponse; os demais (ou se o cache falhar ao gravar)
+  são repassados em streaming.
+- `MEDIA_PROXY=false` volta ao redirecionamento 302 para URL assinada.
+"""
+from __future__ import annotations
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+import hashlib
+import logging
+import mimetypes
+import os
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+logger = logging.getLogger("uvicorn")
+
+# Um ano: o conteúdo de um object_name nunca muda
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+CACHE_IMMUTABLE = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+# URL sem versão: pode passar a apontar para outro objeto, revalidar sempre (304 é barato)
+CACHE_REVALIDATE = "public, no-cache"
+
+
+def media_version(url_or_name: Optional[str], generation: Any = None) -> str:
+    """
+    Token curto de um object_name e da geração do seu conteúdo (usado em `?v=` e como ETag).
+
+    `generation` (ex.: thumb_updated_at) muda quando o objeto é regravado sob o mesmo nome.
+    """
+    key = url_or_name or ""
+    if generation is not None:
+        key = f"{key}|{generation.isoformat() if hasattr(generation, 'isoformat') else generation}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def object_etag(object_name: str, generation: Any = None) -> str:
+    return f'"{media_version(object_name, generation)}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: str, last_modified: Optional[str]) -> bool:
+    if not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def media_response(
+    request: Request,
+    storage,
+    object_name: str,
+    *,
+    version: Optional[str] = None,
+    current_version: Optional[str] = None,
+    generation: Any = None,
+    vary_accept: bool = False,
+    filename: Optional[str] = None,
+) -> Response:
+    """
+    Responde com o conteúdo do objeto em streaming, ou 304 se o cliente já o tem.
+
+    Args:
+        request: Requisição (cabeçalhos condicionais)
+        storage: StorageService
+        object_name: Objeto a entregar
+        version: Valor de `?v=` recebido
+        current_version: Versão atual do recurso; se igual a `version`, cache imutável
+        generation: Geração do conteúdo do objeto (entra no ETag, ver media_version)
+        vary_accept: Se o objeto escolhido depende do cabeçalho Accept (WebP)
+        filename: Nome sugerido em Content-Disposition (inline)
+    """
+    etag = object_etag(object_name, generation)
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": CACHE_IMMUTABLE if version and version == current_version else CACHE_REVALIDATE,
+    }
+    if vary_accept:
+        headers["Vary"] = "Accept"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    path = storage.cached_path(object_name)
+    obj = None
+    if path is None:
+        obj = storage.open_object(object_name)
+        try:
+            path = storage.cache_object(object_name, obj)
+        except OSError:
+            # Cache local sem espaço/permissão: a resposta já foi lida em parte, reabrir e repassar
+            logger.warning("[Media] Falha ao gravar cache local object=%s", object_name, exc_info=True)
+            storage.close_object(obj)
+            path, obj = None, storage.open_object(object_name)
+
+    if path is not None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Descartado do cache entre a gravação e a leitura: buscar de novo no MinIO
+            path, obj = None, storage.open_object(object_name)
+        else:
+            headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+    if obj is not None and path is None:
+        last_modified = obj.headers.get("Last-Modified")
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+
+    if_modified_since = request.headers.get("if-modified-since")
+    # If-Modified-Since só vale sem If-None-Match (RFC 9110 13.1.3)
+    if not if_none_match and if_modified_since and _not_modified_since(if_modified_since, headers.get("Last-Modified")):
+        if path is None:
+            storage.close_object(obj)
+        return Response(status_code=304, headers=headers)
+
+    if path is not None:
+        return FileResponse(
+            path,
+            media_type=mimetypes.guess_type(object_name)[0] or "application/octet-stream",
+            headers=headers,
+            filename=filename,
+            stat_result=stat,
+            content_disposition_type="inline",
+        )
+
+    length = obj.headers.get("Content-Length")
+    if length:
+        headers["Content-Length"] = length
+    if filename:
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    return StreamingResponse(
+        storage.iter_object(obj),
+        media_type=obj.headers.get("Content-Type") or "application/octet-stream",
+        headers=headers,
+    )
@@ -2,11 +2,35 @@
 
 This module provides helpers to extract images from PDF documents using
 PyMuPDF (fitz), without relying on external system tools.
+
+For thumbnails, `first_page_thumbnail_source` picks per document the cheaper of
+two paths: extracting the scanned image that fills page 1 (JPEG streams are
+returned as-is, no decode) or rasterizing page 1 straight at the output size,
+so the work scales with the thumbnail and not with the source.
 """
 
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
+
+
+# An embedded image covering at least this fraction of page 1 is treated as a scan
+SCAN_COVERAGE = 0.85
+# Non-JPEG embedded images are only extracted when they are at most this many
+# times larger (in pixels) than the rendered output; otherwise rendering is cheaper
+EXTRACT_PIXEL_FACTOR = 4.0
+# Upper bound for the render zoom (~288 DPI), to keep pathological pages bounded
+MAX_RENDER_ZOOM = 4.0
+
+
+def _import_fitz():
+    try:
+        import fitz  # type: ignore  # PyMuPDF
+    except Exception as exc:  # pragma: no cover - clear error path
+        raise ImportError(
+            "Dependência 'pymupdf' não instalada. Execute: pip install pymupdf"
+        ) from exc
+    return fitz
 
 
 def extract_first_image_from_pdf_first_page(pdf_bytes: bytes) -> Optional[Tuple[str, bytes]]:
@@ -24,12 +48,7 @@ def extract_first_image_from_pdf_first_page(pdf_bytes: bytes) -> Optional[Tuple[
         ImportError: If PyMuPDF (fitz) is not installed.
         Exception:   For any unexpected PDF parsing errors.
     """
-    try:
-        import fitz  # type: ignore  # PyMuPDF
-    except Exception as exc:  # pragma: no cover - clear error path
-        raise ImportError(
-            "Dependência 'pymupdf' não instalada. Execute: pip install pymupdf"
-        ) from exc
+    fitz = _import_fitz()
 
     try:
         with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
@@ -51,3 +70,88 @@ def extract_first_image_from_pdf_first_page(pdf_bytes: bytes) -> Optional[Tuple[
         raise
 
 
+def render_zoom(page_width: float, page_height: float, box: Tuple[int, int], min_width: int = 0) -> float:
+    """Zoom that fits the page into `box` and makes it at least `min_width` pixels wide.
+
+    Args:
+        page_width: Page width in points.
+        page_height: Page height in points.
+        box: (width, height) the page must fit into (e.g. THUMB_SIZE).
+        min_width: Minimum output width (e.g. the widest srcset variant).
+
+    Returns:
+        Zoom factor for `fitz.Matrix(zoom, zoom)`, capped at MAX_RENDER_ZOOM.
+    """
+    if page_width <= 0 or page_height <= 0:
+        return 1.0
+    fit = min(box[0] / page_width, box[1] / page_height)
+    zoom = max(fit, min_width / page_width)
+    return min(zoom, MAX_RENDER_ZOOM)
+
+
+def _dominant_image(doc, page) -> Optional[Tuple[int, int, int, str]]:
+    """Return (xref, width, height, filter) of the image covering most of the page, if any."""
+    page_area = abs(page.rect) or 1.0
+    best = None
+    best_coverage = 0.0
+    for img in page.get_images(full=True):
+        xref, width, height, img_filter = img[0], img[2], img[3], img[8]
+        try:
+            rects = page.get_image_rects(xref)
+        except Exception:
+            rects = []
+        coverage = sum(abs(r & page.rect) for r in rects) / page_area
+        if coverage > best_coverage:
+            best, best_coverage = (xref, width, height, img_filter), coverage
+    if best is not None and best_coverage >= SCAN_COVERAGE:
+        return best
+    return None
+
+
+def first_page_thumbnail_source(
+    pdf: Union[bytes, str], box: Tuple[int, int], min_width: int = 0
+) -> Optional[Tuple[str, bytes]]:
+    """Image bytes for thumbnailing page 1, via extraction or rasterization.
+
+    Extraction is used when page 1 is essentially one scanned image and reading it
+    is cheap: JPEG (DCTDecode) streams are returned untouched, so the thumbnail
+    decoder can use draft mode; other images only when they are not much larger
+    than the output. Otherwise (vector/text pages, small logos, huge non-JPEG
+    scans) page 1 is rendered directly at the zoom given by `render_zoom`.
+
+    Args:
+        pdf: Raw bytes of the PDF file, or a path to it (opened lazily from disk,
+            so large files are not read into memory).
+        box: (width, height) the thumbnail must fit into.
+        min_width: Minimum width of the largest output (srcset variants).
+
+    Returns:
+        A tuple (ext, image_bytes): the embedded image extension, or 'ppm' for a
+        rendered page. None if the PDF has no pages.
+
+    Raises:
+        ImportError: If PyMuPDF (fitz) is not installed.
+        Exception:   For any unexpected PDF parsing errors.
+    """
+    fitz = _import_fitz()
+
+    opened = fitz.open(pdf, filetype="pdf") if isinstance(pdf, str) else fitz.open(stream=pdf, filetype="pdf")
+    with opened as doc:
+        if doc.page_count < 1:
+            return None
+        page = doc.load_page(0)
+        zoom = render_zoom(page.rect.width, page.rect.height, box, min_width)
+
+        scan = _dominant_image(doc, page)
+        if scan is not None:
+            xref, width, height, img_filter = scan
+            rendered_pixels = (page.rect.width * zoom) * (page.rect.height * zoom)
+            if img_filter == "DCTDecode" or width * height <= EXTRACT_PIXEL_FACTOR * rendered_pixels:
+                img_dict = doc.extract_image(xref)
+                image_bytes = img_dict.get("image")
+                if image_bytes:
+                    return img_dict.get("ext", "png"), image_bytes
+
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False, colorspace=fitz.csRGB)
+        # PPM is a header plus raw RGB samples: no compression cost
+        return "ppm", pix.tobytes("ppm")
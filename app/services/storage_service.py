@@ -7,21 +7,31 @@ relacionados às cartinhas.
 Notas:
 - Importa o cliente MinIO de forma preguiçosa para evitar erros de import no startup
   caso a dependência ainda não esteja instalada.
+- Uma única instância por processo (get_storage_service) mantém um único cliente MinIO
+  com pool HTTP configurável (MINIO_MAX_CONNECTIONS, timeouts, retries).
 - Valida tipos MIME permitidos: application/pdf, image/jpeg, image/png, image/webp.
 - Gera chaves de objeto organizadas por prefixo (e.g., cartas/{id_carta}/anexo.ext).
 """
 from __future__ import annotations
 
-from typing import Optional, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, List, Set
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
 import os
 import mimetypes
+import socket
+import tempfile
+import threading
 import uuid
 import logging
 
 from fastapi import UploadFile, HTTPException, status
 
 from app.config import get_settings
+from app.services.byte_budget import ByteBudget
+from app.services.disk_cache import DiskCache
+from app.services.url_cache import PresignedUrlCache
 
 
 ALLOWED_MIME_TYPES = {
@@ -31,6 +41,11 @@ ALLOWED_MIME_TYPES = {
     "image/webp",
 }
 
+# Tamanho dos blocos lidos do MinIO nos downloads em streaming
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Objetos por requisição de exclusão em lote (limite do S3 DeleteObjects)
+DELETE_BATCH = 1000
+
 logger = logging.getLogger("uvicorn")
 
 
@@ -52,25 +67,90 @@ class StorageService:
             )
         self.access_key: str = access_key
         self.secret_key: str = secret_key
+        # Parâmetros do pool HTTP do cliente MinIO
+        self.max_connections: int = max(1, int(settings.minio_max_connections))
+        self.connect_timeout: float = float(settings.minio_connect_timeout)
+        self.read_timeout: float = float(settings.minio_read_timeout)
+        self.retries: int = max(0, int(settings.minio_retries))
+        self._minio = None
+        self._minio_lock = threading.Lock()
+        self._bucket_ready = False
+        # Bytes de objetos baixados em processamento simultâneo neste processo
+        self.download_budget = ByteBudget(max(1, int(settings.download_budget_mb)) * 1024 * 1024)
+        # URLs assinadas reaproveitadas enquanto tiverem validade suficiente
+        self.url_cache = PresignedUrlCache()
+        # Cache local dos objetos entregues por /cartas/anexo e /cartas/miniatura
+        self.media_cache: Optional[DiskCache] = None
+        if int(settings.media_cache_mb) > 0:
+            cache_dir = settings.media_cache_dir or os.path.join(tempfile.gettempdir(), "noel-media-cache")
+            try:
+                self.media_cache = DiskCache(cache_dir, int(settings.media_cache_mb) * 1024 * 1024)
+            except OSError:
+                logger.exception("[StorageService] Cache local indisponível dir=%s", cache_dir)
         logger.info("[StorageService] Configurado com endpoint=%s, bucket=%s, secure=%s", self.endpoint, self.bucket, str(self.endpoint.startswith("https://")))
 
-    def _client(self):
-        """Cria o cliente MinIO sob demanda."""
+    def _http_client(self):
+        """Pool HTTP (urllib3) compartilhado por todas as chamadas ao MinIO."""
+        import urllib3
+        from urllib3.connection import HTTPConnection
+
+        ca_certs = None
         try:
-            from minio import Minio
-        except Exception as exc:  # ImportError ou similar
-            logger.exception("[StorageService] Dependência 'minio' não instalada")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Dependência 'minio' não instalada"
-            ) from exc
-        # Detectar uso de http/https a partir do endpoint
-        secure = self.endpoint.startswith("https://")
-        endpoint = self.endpoint.replace("https://", "").replace("http://", "")
-        logger.debug("[StorageService] Criando cliente MinIO endpoint=%s secure=%s", endpoint, secure)
-        return Minio(endpoint, access_key=self.access_key, secret_key=self.secret_key, secure=secure)
+            import certifi
+            ca_certs = os.environ.get("SSL_CERT_FILE") or certifi.where()
+        except Exception:
+            ca_certs = os.environ.get("SSL_CERT_FILE")
+        return urllib3.PoolManager(
+            num_pools=4,
+            maxsize=self.max_connections,
+            block=False,
+            timeout=urllib3.Timeout(connect=self.connect_timeout, read=self.read_timeout),
+            retries=urllib3.Retry(
+                total=self.retries,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504],
+            ),
+            # Manter conexões ociosas vivas entre requisições
+            socket_options=HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)],
+            cert_reqs="CERT_REQUIRED" if ca_certs else "CERT_NONE",
+            ca_certs=ca_certs,
+        )
+
+    def _client(self):
+        """Retorna o cliente MinIO da instância, criado uma única vez sob demanda."""
+        if self._minio is not None:
+            return self._minio
+        with self._minio_lock:
+            if self._minio is not None:
+                return self._minio
+            try:
+                from minio import Minio
+            except Exception as exc:  # ImportError ou similar
+                logger.exception("[StorageService] Dependência 'minio' não instalada")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Dependência 'minio' não instalada"
+                ) from exc
+            # Detectar uso de http/https a partir do endpoint
+            secure = self.endpoint.startswith("https://")
+            endpoint = self.endpoint.replace("https://", "").replace("http://", "")
+            logger.debug(
+                "[StorageService] Criando cliente MinIO endpoint=%s secure=%s max_connections=%s",
+                endpoint, secure, self.max_connections,
+            )
+            self._minio = Minio(
+                endpoint,
+                access_key=self.access_key,
+                secret_key=self.secret_key,
+                secure=secure,
+                http_client=self._http_client(),
+            )
+            return self._minio
 
     def _ensure_bucket(self) -> None:
+        """Garante a existência do bucket; após o primeiro sucesso não consulta mais o MinIO."""
+        if self._bucket_ready:
+            return
         client = self._client()
         try:
             exists = client.bucket_exists(self.bucket)
@@ -78,6 +158,7 @@ class StorageService:
             if not exists:
                 logger.info("[StorageService] Criando bucket '%s'", self.bucket)
                 client.make_bucket(self.bucket)
+            self._bucket_ready = True
         except Exception as exc:
             logger.exception("[StorageService] Falha ao garantir bucket '%s'", self.bucket)
             raise HTTPException(
@@ -109,6 +190,9 @@ class StorageService:
     def upload_carta_anexo(self, id_carta: int, upload: UploadFile) -> str:
         """
         Faz upload de um anexo de cartinha e retorna o nome do objeto.
+
+        A miniatura é enfileirada à parte (enqueue_thumbnail), depois que a carta
+        passa a apontar para o novo anexo.
         """
         self._validate_mime(upload)
         self._ensure_bucket()
@@ -145,6 +229,7 @@ class StorageService:
                 content_type=upload.content_type,
             )
             logger.info("[StorageService] Upload concluído bucket=%s object=%s", self.bucket, object_name)
+            self._invalidate_cached(object_name)
         except Exception as exc:
             logger.exception("[StorageService] Falha no upload para bucket=%s object=%s", self.bucket, object_name)
             raise HTTPException(
@@ -153,12 +238,194 @@ class StorageService:
             ) from exc
         return object_name
 
+    @staticmethod
+    def enqueue_thumbnail(object_name: str, generate_thumbnail: Optional[bool] = None) -> bool:
+        """
+        Dispara a geração da miniatura em segundo plano (padrão: THUMB_ON_UPLOAD).
+
+        Chamar depois do commit que grava o novo urlcarta: o job só grava urlcarta_pq se
+        a carta ainda apontar para este anexo (ver CartasRepository.set_thumbnail).
+        Uma falha aqui não invalida o upload.
+        """
+        if generate_thumbnail is None:
+            generate_thumbnail = get_settings().thumb_on_upload
+        if not generate_thumbnail:
+            return False
+        try:
+            from app.services.thumbnail_jobs import get_thumbnail_jobs
+
+            get_thumbnail_jobs().submit([object_name])
+            return True
+        except Exception:
+            logger.exception("[StorageService] Falha ao enfileirar miniatura object=%s", object_name)
+            return False
+
+    def object_name_from_url(self, url_or_name: str) -> str:
+        """Extrai o object_name aceitando tanto URL completa quanto object_name puro.
+        Exemplos aceitos:
+        - 'cartas/10/anexo-xxx.png' (já é object_name)
+        - 'http://host/bucket/cartas/10/anexo-xxx.png?...'
+        - '.../cartas/10/anexo-xxx.png' (qualquer URL contendo prefixo 'cartas/')
+        """
+        if not url_or_name:
+            return ''
+        if url_or_name.startswith('cartas/'):
+            return url_or_name
+        base = url_or_name.split('?', 1)[0]
+        parts = base.split('/')
+        if self.bucket in parts:
+            idx = parts.index(self.bucket)
+            return '/'.join(parts[idx+1:])
+        if 'cartas/' in base:
+            return base.split('cartas/', 1)[1].strip('/')
+        return ''
+
+    @contextmanager
+    def download_to_tempfile(self, object_name: str) -> Iterator[str]:
+        """
+        Baixa o objeto em streaming para um arquivo temporário e fornece o caminho.
+
+        O conteúdo nunca é carregado inteiro na memória (blocos de DOWNLOAD_CHUNK_SIZE);
+        o tamanho do objeto fica reservado no orçamento DOWNLOAD_BUDGET_MB do processo
+        até o bloco `with` terminar, limitando quantos anexos grandes são processados
+        ao mesmo tempo. O arquivo é removido ao sair.
+        """
+        client = self._client()
+        size = int(getattr(client.stat_object(self.bucket, object_name), "size", 0) or 0)
+        suffix = os.path.splitext(object_name)[1]
+        with self.download_budget.reserve(size):
+            fd, path = tempfile.mkstemp(prefix="noel-obj-", suffix=suffix)
+            try:
+                response = None
+                try:
+                    response = client.get_object(self.bucket, object_name)
+                    with os.fdopen(fd, "wb") as fh:
+                        for chunk in response.stream(DOWNLOAD_CHUNK_SIZE):
+                            fh.write(chunk)
+                finally:
+                    if response is not None:
+                        try:
+                            response.close()
+                            response.release_conn()
+                        except Exception:
+                            pass
+                yield path
+            finally:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def open_object(self, object_name: str):
+        """
+        Abre o objeto para leitura em streaming (resposta HTTP do MinIO).
+
+        Os cabeçalhos (Content-Type, Content-Length, Last-Modified) ficam em `.headers`;
+        consumir com `iter_object` ou liberar com `close_object`.
+        """
+        client = self._client()
+        try:
+            return client.get_object(self.bucket, object_name)
+        except Exception as exc:
+            if getattr(exc, "code", None) in ("NoSuchKey", "NoSuchObject"):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Objeto não encontrado") from exc
+            logger.exception("[StorageService] Falha ao abrir object=%s", object_name)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Falha ao ler objeto MinIO"
+            ) from exc
+
+    @staticmethod
+    def close_object(response) -> None:
+        """Fecha a resposta de `open_object` e devolve a conexão ao pool."""
+        try:
+            response.close()
+            response.release_conn()
+        except Exception:
+            pass
+
+    def iter_object(self, response, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """Blocos do objeto aberto por `open_object`; a conexão é liberada ao final."""
+        try:
+            for chunk in response.stream(chunk_size):
+                yield chunk
+        finally:
+            self.close_object(response)
+
+    def cached_path(self, object_name: str) -> Optional[str]:
+        """Arquivo local do objeto, se já estiver no cache (MEDIA_CACHE_MB)."""
+        if self.media_cache is None:
+            return None
+        return self.media_cache.get(object_name)
+
+    def cache_object(self, object_name: str, response) -> Optional[str]:
+        """
+        Grava no cache local o objeto aberto por `open_object` e retorna o arquivo.
+
+        Retorna None sem consumir a resposta se o cache estiver desligado ou o objeto
+        não couber (tamanho ausente ou acima do limite por entrada).
+        """
+        if self.media_cache is None:
+            return None
+        length = response.headers.get("Content-Length")
+        if not length or int(length) > self.media_cache.max_entry_bytes:
+            return None
+        mtime = None
+        last_modified = response.headers.get("Last-Modified")
+        if last_modified:
+            try:
+                mtime = parsedate_to_datetime(last_modified).timestamp()
+            except (TypeError, ValueError):
+                mtime = None
+        return self.media_cache.put(object_name, self.iter_object(response), mtime=mtime)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contadores dos caches do processo (URLs assinadas e arquivos locais)."""
+        disk = None
+        if self.media_cache is not None:
+            disk = {
+                "directory": self.media_cache.directory,
+                "bytes": self.media_cache.total_bytes,
+                "max_bytes": self.media_cache.max_bytes,
+            }
+        return {"presigned_urls": self.url_cache.stats(), "disk": disk}
+
+    def _invalidate_cached(self, object_name: str) -> None:
+        if self.media_cache is not None:
+            self.media_cache.invalidate(object_name)
+
+    def put_bytes(self, object_name: str, data: bytes, content_type: str) -> None:
+        """Grava um objeto pequeno (ex.: miniatura) a partir de bytes em memória."""
+        import io
+
+        client = self._client()
+        client.put_object(
+            self.bucket,
+            object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+        )
+        # Miniaturas regeneradas mantêm o nome: descartar a cópia local antiga
+        self._invalidate_cached(object_name)
+
     def get_presigned_url(self, object_name: str, expires: timedelta = timedelta(minutes=15)) -> str:
-        """Gera URL assinado temporário para download do objeto."""
+        """
+        URL assinada temporária para download do objeto.
+
+        Reaproveita a URL gerada antes para o mesmo objeto e validade enquanto ela
+        ainda tiver ao menos metade do prazo (ver PresignedUrlCache).
+        """
+        expires_s = int(expires.total_seconds())
+        cached = self.url_cache.get(object_name, expires_s)
+        if cached is not None:
+            return cached
         client = self._client()
         try:
+            signed_at = self.url_cache.now()
             url = client.presigned_get_object(self.bucket, object_name, expires=expires)
-            logger.debug("[StorageService] URL assinada gerada object=%s expires=%ss", object_name, int(expires.total_seconds()))
+            self.url_cache.put(object_name, expires_s, url, signed_at=signed_at)
+            logger.debug("[StorageService] URL assinada gerada object=%s expires=%ss", object_name, expires_s)
             return url
         except Exception as exc:
             logger.exception("[StorageService] Falha ao gerar URL assinada object=%s", object_name)
@@ -172,6 +439,8 @@ class StorageService:
         client = self._client()
         try:
             client.remove_object(self.bucket, object_name)
+            self._invalidate_cached(object_name)
+            self.url_cache.discard(object_name)
             logger.info("[StorageService] Objeto removido bucket=%s object=%s", self.bucket, object_name)
         except Exception as exc:
             logger.exception("[StorageService] Falha ao remover object=%s", object_name)
@@ -180,6 +449,38 @@ class StorageService:
                 detail="Falha ao remover objeto MinIO"
             ) from exc
 
+    def delete_objects(self, object_names: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Remove vários objetos com exclusão em lote (remove_objects), DELETE_BATCH por requisição.
+
+        Returns:
+            {object_name: None se removido, ou a mensagem de erro}
+        """
+        from minio.deleteobjects import DeleteObject
+
+        client = self._client()
+        results: Dict[str, Optional[str]] = {}
+        names = list(dict.fromkeys(n for n in object_names if n))
+        for start in range(0, len(names), DELETE_BATCH):
+            batch = names[start:start + DELETE_BATCH]
+            try:
+                # O iterador de erros é preguiçoso: a exclusão só acontece ao consumi-lo
+                errors = {
+                    err.name: err.message or err.code
+                    for err in client.remove_objects(self.bucket, [DeleteObject(n) for n in batch])
+                }
+            except Exception as exc:
+                logger.exception("[StorageService] Falha na exclusão em lote (%s objetos)", len(batch))
+                errors = {n: str(exc) or "Falha ao remover objeto MinIO" for n in batch}
+            for name in batch:
+                results[name] = errors.get(name)
+                if name not in errors:
+                    self._invalidate_cached(name)
+                    self.url_cache.discard(name)
+        removed = sum(1 for e in results.values() if e is None)
+        logger.info("[StorageService] Exclusão em lote bucket=%s removidos=%s falhas=%s", self.bucket, removed, len(results) - removed)
+        return results
+
     def list_carta_anexos(self, id_carta: int) -> List[str]:
         """Lista nomes de objetos de anexos para a carta (prefixo cartas/{id_carta}/)."""
         client = self._client()
@@ -199,6 +500,51 @@ class StorageService:
                 detail="Falha ao listar anexos"
             ) from exc
 
+    def list_object_names(self, prefix: str = "cartas/") -> Set[str]:
+        """Nomes de todos os objetos sob o prefixo, obtidos em uma única listagem recursiva."""
+        client = self._client()
+        try:
+            names = {
+                getattr(obj, "object_name", "")
+                for obj in client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            }
+            names.discard("")
+            logger.debug("[StorageService] Listados %s objetos prefix=%s", len(names), prefix)
+            return names
+        except Exception as exc:
+            logger.exception("[StorageService] Falha ao listar objetos prefix=%s", prefix)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Falha ao listar objetos"
+            ) from exc
+
+    def list_objects_info(self, prefix: str = "cartas/") -> List[Dict[str, Any]]:
+        """
+        Metadados de todos os objetos sob o prefixo em uma única listagem recursiva.
+
+        Cada item: object_name, size, last_modified e checksum (ETag do MinIO).
+        """
+        client = self._client()
+        try:
+            items = [
+                {
+                    "object_name": getattr(obj, "object_name", ""),
+                    "size": int(getattr(obj, "size", 0) or 0),
+                    "last_modified": getattr(obj, "last_modified", None),
+                    "checksum": (getattr(obj, "etag", None) or "").strip('"') or None,
+                }
+                for obj in client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            ]
+            items = [i for i in items if i["object_name"]]
+            logger.debug("[StorageService] Listados %s objetos (com metadados) prefix=%s", len(items), prefix)
+            return items
+        except Exception as exc:
+            logger.exception("[StorageService] Falha ao listar objetos prefix=%s", prefix)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Falha ao listar objetos"
+            ) from exc
+
     def get_latest_carta_anexo_url(self, id_carta: int, expires: timedelta = timedelta(minutes=15)) -> Optional[str]:
         """Retorna URL assinada do anexo mais recente da carta, se existir."""
         client = self._client()
@@ -214,7 +560,7 @@ class StorageService:
             if not latest_obj:
                 logger.info("[StorageService] Nenhum anexo encontrado para id_carta=%s", id_carta)
                 return None
-            url = client.presigned_get_object(self.bucket, latest_obj, expires=expires)
+            url = self.get_presigned_url(latest_obj, expires=expires)
             logger.debug("[StorageService] URL mais recente gerada object=%s", latest_obj)
             return url
         except Exception as exc:
@@ -223,3 +569,25 @@ class StorageService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Falha ao obter URL do anexo mais recente"
             ) from exc
+
+
+_service: Optional[StorageService] = None
+_service_lock = threading.Lock()
+
+
+def get_storage_service() -> StorageService:
+    """Instância de StorageService (e do cliente MinIO) compartilhada pelo processo."""
+    global _service
+    if _service is not None:
+        return _service
+    with _service_lock:
+        if _service is None:
+            _service = StorageService()
+        return _service
+
+
+def reset_storage_service() -> None:
+    """Descarta a instância compartilhada; a próxima chamada relê as configurações."""
+    global _service
+    with _service_lock:
+        _service = None
@@ -0,0 +1,254 @@
+"""
+Fila de geração de miniaturas em segundo plano.
+
+- Cada job recebe uma lista de object_names e é processado fora da requisição.
+- Download/upload (MinIO) e a gravação de `urlcarta_pq` rodam em threads; a
+  decodificação/redimensionamento (Pillow/PyMuPDF) roda em um pool de processos
+  limitado a THUMB_WORKERS, sem disputar o GIL com os handlers.
+- O número de threads é igual ao de processos; os anexos são baixados em streaming
+  para arquivos temporários dentro do orçamento DOWNLOAD_BUDGET_MB (ver
+  StorageService.download_to_tempfile) e os processos leem direto do disco.
+- O estado dos jobs fica em memória do processo (por worker do uvicorn); jobs
+  concluídos além de MAX_JOBS são descartados, do mais antigo para o mais novo.
+- Uploads de anexo também enfileiram a miniatura aqui (ver StorageService).
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import multiprocessing
+import threading
+import uuid
+
+from app.config import get_settings
+from app.services.thumbnail_service import (
+    ThumbnailError,
+    id_carta_from_object,
+    render_thumbnails,
+    store_thumbnails,
+    thumb_size_from_settings,
+    thumb_widths_from_settings,
+)
+
+logger = logging.getLogger("uvicorn")
+
+# Quantidade de jobs concluídos mantidos para consulta de status
+MAX_JOBS = 20
+
+
+class ThumbnailJob:
+    """Progresso de um lote de miniaturas."""
+
+    def __init__(self, object_names: List[str], size: Tuple[int, int], widths: Sequence[int] = ()) -> None:
+        self.id: str = uuid.uuid4().hex[:12]
+        self.object_names = object_names
+        self.size = size
+        self.widths = list(widths)
+        self.total = len(object_names)
+        self.succeeded: List[str] = []
+        self.failures: List[Dict[str, str]] = []
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> int:
+        return len(self.succeeded) + len(self.failures)
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "finished"
+        return "running" if self.started_at is not None else "queued"
+
+    def mark_started(self) -> None:
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = datetime.now()
+
+    def record_success(self, object_name: str) -> bool:
+        """Registra um item concluído; retorna True se foi o último do job."""
+        with self._lock:
+            self.succeeded.append(object_name)
+            return self._finish_if_done()
+
+    def record_failure(self, object_name: str, error: str) -> bool:
+        """Registra uma falha; retorna True se foi o último item do job."""
+        with self._lock:
+            self.failures.append({"object_name": object_name, "error": error})
+            return self._finish_if_done()
+
+    def _finish_if_done(self) -> bool:
+        if self.done >= self.total and self.finished_at is None:
+            self.finished_at = datetime.now()
+            return True
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "total": self.total,
+                "done": self.done,
+                "succeeded": len(self.succeeded),
+                "failed": len(self.failures),
+                "succeeded_objects": list(self.succeeded),
+                "failures": list(self.failures),
+                "size": f"{self.size[0]}x{self.size[1]}",
+                "widths": list(self.widths),
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class ThumbnailJobManager:
+    """Executa jobs de miniaturas com um pool de processos limitado."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = max(1, int(workers))
+        self._procs: Optional[ProcessPoolExecutor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, ThumbnailJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._procs is None:
+                # spawn: não herdar conexões do banco nem locks das threads do servidor
+                self._procs = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._procs
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbs")
+            return self._threads
+
+    def _discard_process_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._procs is broken:
+                self._procs = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(
+        self,
+        object_names: Iterable[str],
+        size: Optional[Tuple[int, int]] = None,
+        widths: Optional[Sequence[int]] = None,
+    ) -> ThumbnailJob:
+        """Enfileira um job para os objetos informados (duplicados são ignorados)."""
+        names = list(dict.fromkeys(n for n in object_names if n))
+        job = ThumbnailJob(
+            names,
+            size or thumb_size_from_settings(),
+            thumb_widths_from_settings() if widths is None else widths,
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            # Descartar os jobs concluídos mais antigos; jobs em andamento continuam consultáveis
+            excess = len(self._jobs) - MAX_JOBS
+            for old_id in [j.id for j in self._jobs.values() if j.finished_at is not None][:max(0, excess)]:
+                del self._jobs[old_id]
+        if not names:
+            job.finished_at = job.created_at
+            return job
+        threads = self._thread_pool()
+        for name in names:
+            threads.submit(self._run_one, job, name)
+        logger.info("[Thumbs] Job %s enfileirado com %s objeto(s)", job.id, job.total)
+        return job
+
+    def get(self, job_id: str) -> Optional[ThumbnailJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[ThumbnailJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _render(self, path: str, is_pdf: bool, size: Tuple[int, int], widths: Sequence[int]) -> Dict[str, Any]:
+        pool = self._process_pool()
+        try:
+            return pool.submit(render_thumbnails, path, is_pdf, size, widths).result()
+        except BrokenProcessPool:
+            # Um worker morreu (ex.: OOM); recriar o pool para os próximos itens
+            self._discard_process_pool(pool)
+            raise
+
+    def _run_one(self, job: ThumbnailJob, object_name: str) -> None:
+        from app.db import SessionLocal
+        from app.repositories.cartas_repository import CartasRepository
+        from app.services.anexos_inventory import sync_carta
+        from app.services.storage_service import get_storage_service
+
+        job.mark_started()
+        try:
+            storage = get_storage_service()
+            # O processo do pool lê o anexo do arquivo temporário; nada trafega em memória
+            with storage.download_to_tempfile(object_name) as path:
+                rendered = self._render(path, object_name.lower().endswith('.pdf'), job.size, job.widths)
+            thumb_name, widths = store_thumbnails(storage, object_name, rendered)
+            id_carta = id_carta_from_object(object_name)
+            if id_carta is not None:
+                db = SessionLocal()
+                try:
+                    CartasRepository(db).set_thumbnail(id_carta, object_name, thumb_name, widths)
+                    sync_carta(db, storage, id_carta)
+                finally:
+                    db.close()
+        except ThumbnailError as exc:
+            finished = job.record_failure(object_name, str(exc))
+        except Exception:
+            logger.exception("[Thumbs] Falha no job %s object=%s", job.id, object_name)
+            finished = job.record_failure(object_name, "Falha ao gerar miniatura")
+        else:
+            finished = job.record_success(object_name)
+        if finished:
+            logger.info(
+                "[Thumbs] Job %s concluído: %s ok, %s falha(s)",
+                job.id, len(job.succeeded), len(job.failures),
+            )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            procs, threads = self._procs, self._threads
+            self._procs = None
+            self._threads = None
+        if threads is not None:
+            threads.shutdown(wait=False, cancel_futures=True)
+        if procs is not None:
+            procs.shutdown(wait=False, cancel_futures=True)
+
+
+_manager: Optional[ThumbnailJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_thumbnail_jobs() -> ThumbnailJobManager:
+    """Fila de miniaturas compartilhada pelo processo (dimensionada por THUMB_WORKERS)."""
+    global _manager
+    if _manager is not None:
+        return _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ThumbnailJobManager(get_settings().thumb_workers)
+        return _manager
+
+
+def shutdown_thumbnail_jobs() -> None:
+    """Encerra os pools da fila (jobs pendentes são cancelados)."""
+    global _manager
+    with _manager_lock:
+        manager, _manager = _manager, None
+    if manager is not None:
+        manager.shutdown()
@@ -0,0 +1,283 @@
+"""
+Geração de miniaturas a partir dos anexos das cartinhas.
+
+- Cada anexo gera, a partir de uma única decodificação:
+  - `<nome>_thumb.jpg`: JPEG no tamanho THUMB_SIZE (fallback e urlcarta_pq);
+  - `<nome>_w{largura}.webp`: variantes WebP por largura (THUMB_WIDTHS) para srcset.
+- `render_thumbnails` é puro (bytes → bytes) e não acessa banco nem MinIO, para poder
+  rodar em processos separados (ver `thumbnail_jobs`).
+- `generate_thumbnail` faz o ciclo completo: baixa o original, gera as miniaturas e
+  grava tudo no mesmo prefixo do MinIO.
+- PDFs usam a imagem digitalizada da 1ª página ou a página rasterizada no tamanho
+  de saída, o que for mais barato (ver `pdf_utils.first_page_thumbnail_source`).
+- Fotos grandes não são decodificadas em resolução total: JPEGs usam draft (escala
+  na decodificação) e os demais formatos passam por reduce() antes do LANCZOS.
+  Ver scripts/bench_thumbnails.py para medir tempo e pico de memória.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import io
+import math
+import re
+
+from app.config import get_settings
+
+
+# Conteúdo do anexo em memória ou caminho do arquivo baixado (ver download_to_tempfile)
+Source = Union[bytes, str]
+
+DEFAULT_THUMB_SIZE: Tuple[int, int] = (200, 300)
+DEFAULT_THUMB_WIDTHS: Tuple[int, ...] = (120, 240, 480, 960)
+THUMB_SUFFIX = "_thumb.jpg"
+JPEG_QUALITY = 85
+_VARIANT_RE = re.compile(r"_w\d+\.webp$")
+WEBP_QUALITY = 80
+# Folga mínima entre a imagem decodificada/reduzida e o maior alvo antes do LANCZOS
+# (mesmo critério de Image.thumbnail(reducing_gap=2.0))
+REDUCING_GAP = 2.0
+
+
+class ThumbnailError(Exception):
+    """Falha esperada na geração de miniatura (mensagem pronta para o cliente)."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+    def __reduce__(self):
+        # Preservar status_code ao voltar de um processo do pool
+        return (type(self), (str(self), self.status_code))
+
+
+def parse_thumb_size(size_str: str) -> Tuple[int, int]:
+    """Converte "LxA" (ex.: "200x300") em (largura, altura); inválido cai no padrão."""
+    try:
+        s = (size_str or "").lower().replace(" ", "")
+        if "x" in s:
+            w_str, h_str = s.split("x", 1)
+            w = max(1, int(w_str))
+            h = max(1, int(h_str))
+            return (w, h)
+    except Exception:
+        pass
+    return DEFAULT_THUMB_SIZE
+
+
+def thumb_size_from_settings() -> Tuple[int, int]:
+    """Tamanho configurado em THUMB_SIZE."""
+    return parse_thumb_size(getattr(get_settings(), "thumb_size", "200x300"))
+
+
+def parse_thumb_widths(widths_str: str) -> List[int]:
+    """Converte "120,240,480" em larguras crescentes e sem repetição; inválido cai no padrão."""
+    widths = set()
+    for part in (widths_str or "").split(","):
+        part = part.strip().lower().rstrip("w")
+        if part.isdigit() and int(part) > 0:
+            widths.add(int(part))
+    return sorted(widths) if widths else list(DEFAULT_THUMB_WIDTHS)
+
+
+def thumb_widths_from_settings() -> List[int]:
+    """Larguras configuradas em THUMB_WIDTHS."""
+    return parse_thumb_widths(getattr(get_settings(), "thumb_widths", ""))
+
+
+def thumb_object_name(object_name: str) -> str:
+    """Nome da miniatura no mesmo prefixo do original (sufixo _thumb.jpg)."""
+    return object_name.rsplit('.', 1)[0] + THUMB_SUFFIX
+
+
+def variant_object_name(thumb_name: str, width: int) -> str:
+    """Nome da variante WebP de uma largura, derivado do nome da miniatura JPEG."""
+    base = thumb_name[:-len(THUMB_SUFFIX)] if thumb_name.endswith(THUMB_SUFFIX) else thumb_name.rsplit('.', 1)[0]
+    return f"{base}_w{int(width)}.webp"
+
+
+def is_derived_object(object_name: str) -> bool:
+    """Se o objeto é uma miniatura (JPEG ou variante WebP) e não um anexo original."""
+    return object_name.endswith(THUMB_SUFFIX) or bool(_VARIANT_RE.search(object_name))
+
+
+def derived_prefix(object_name: str) -> str:
+    """Prefixo comum às miniaturas de um anexo (para listá-las/removê-las de uma vez)."""
+    return object_name.rsplit('.', 1)[0] + "_"
+
+
+def pick_width(available: Sequence[int], requested: int) -> Optional[int]:
+    """Menor largura disponível que atende a pedida (ou a maior, se nenhuma atender)."""
+    if not available:
+        return None
+    ordered = sorted(available)
+    for width in ordered:
+        if width >= requested:
+            return width
+    return ordered[-1]
+
+
+def id_carta_from_object(name: str) -> Optional[int]:
+    """Extrai o id_carta de um object_name no formato cartas/{id_carta}/arquivo."""
+    try:
+        parts = (name or "").split('/')
+        if len(parts) >= 3 and parts[0] == 'cartas':
+            return int(parts[1])
+    except Exception:
+        return None
+    return None
+
+
+def _source_image(source: Source, is_pdf: bool, box: Tuple[int, int], min_width: int = 0):
+    """Entrada para o Pillow: caminho/arquivo do anexo ou a imagem obtida do PDF."""
+    if not is_pdf:
+        return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        from app.services.pdf_utils import first_page_thumbnail_source
+    except Exception:
+        raise ThumbnailError("Módulo de PDF indisponível", status_code=500)
+
+    try:
+        # Extrai a imagem digitalizada ou rasteriza a 1ª página já no tamanho de saída
+        first = first_page_thumbnail_source(source, box, min_width)
+    except ImportError as ie:
+        raise ThumbnailError(str(ie), status_code=500)
+    except Exception:
+        first = None
+
+    if not first:
+        raise ThumbnailError("Falha ao ler a 1ª página do PDF")
+    _ext, img_bytes = first
+    return io.BytesIO(img_bytes)
+
+
+def _encode(im, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    im.save(out, format=fmt, quality=quality)
+    return out.getvalue()
+
+
+def _scaled_to_width(src: Tuple[int, int], width: int) -> Tuple[int, int]:
+    return (width, max(1, round(src[1] * width / src[0])))
+
+
+def _fit_box(src: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    # Tamanho (aproximado para cima) que Image.thumbnail(box) produziria, sem ampliar
+    scale = min(box[0] / src[0], box[1] / src[1], 1.0)
+    return (max(1, math.ceil(src[0] * scale)), max(1, math.ceil(src[1] * scale)))
+
+
+def _reduce(im, need: Tuple[int, int]):
+    """Reduz por fator inteiro (box, barato) enquanto sobrar REDUCING_GAP sobre o alvo."""
+    factor = int(min(im.width / (need[0] * REDUCING_GAP), im.height / (need[1] * REDUCING_GAP)))
+    if factor >= 2:
+        return im.reduce(factor)
+    return im
+
+
+def _effective_widths(widths: Sequence[int], source_width: int) -> List[int]:
+    # Sem ampliar: larguras a partir da original viram uma única variante, registrada com a
+    # largura real (o nome _w{largura}.webp e o descritor do srcset batem com a imagem)
+    smaller = [w for w in sorted(set(widths)) if w < source_width]
+    if any(w >= source_width for w in widths):
+        smaller.append(source_width)
+    return smaller
+
+
+def render_thumbnails(
+    source: Source,
+    is_pdf: bool,
+    size: Tuple[int, int] = DEFAULT_THUMB_SIZE,
+    widths: Sequence[int] = (),
+) -> Dict[str, object]:
+    """
+    Gera a miniatura JPEG e as variantes WebP a partir de uma única decodificação.
+
+    Args:
+        source: Anexo original (imagem ou PDF): bytes ou caminho de arquivo; com o
+            caminho, Pillow/PyMuPDF leem do disco sem carregar o arquivo inteiro
+        is_pdf: Se o anexo é um PDF
+        size: (largura, altura) máximas da miniatura JPEG
+        widths: Larguras das variantes WebP (vazio = somente o JPEG)
+
+    Returns:
+        {"jpeg": bytes, "webp": {largura real: bytes}} (pedidos acima da largura da
+        imagem viram uma variante na largura original)
+
+    Raises:
+        ThumbnailError: Dependência ausente, PDF ilegível ou imagem inválida
+    """
+    img_source = _source_image(source, is_pdf, size, max(widths, default=0))
+    try:
+        from PIL import Image  # lazy import
+    except ImportError:
+        raise ThumbnailError("Dependência 'Pillow' não instalada. Execute: pip install Pillow", status_code=500)
+
+    try:
+        with Image.open(img_source) as im:
+            src_w, src_h = im.size
+            targets = {w: _scaled_to_width((src_w, src_h), w) for w in _effective_widths(widths, src_w)}
+            jpeg_box = _fit_box((src_w, src_h), size)
+            need = (
+                max([jpeg_box[0]] + [t[0] for t in targets.values()]),
+                max([jpeg_box[1]] + [t[1] for t in targets.values()]),
+            )
+            # JPEG: decodificar já em escala reduzida (DCT 1/2, 1/4, 1/8), mantendo folga
+            # REDUCING_GAP sobre o maior alvo; nos demais formatos é no-op
+            im.draft('RGB', (int(need[0] * REDUCING_GAP), int(need[1] * REDUCING_GAP)))
+            base = _reduce(im.convert('RGB'), need)
+        jpeg_im = base.copy()
+        jpeg_im.thumbnail(size, Image.LANCZOS)
+        result: Dict[str, object] = {"jpeg": _encode(jpeg_im, 'JPEG', JPEG_QUALITY)}
+
+        # Da maior para a menor: cada variante é reduzida a partir da anterior
+        variants: Dict[int, bytes] = {}
+        current = base
+        for width in sorted(targets, reverse=True):
+            target = targets[width]
+            if target[0] < current.width:
+                current = current.resize(target, Image.LANCZOS)
+            variants[width] = _encode(current, 'WEBP', WEBP_QUALITY)
+        result["webp"] = variants
+        return result
+    except Exception:
+        raise ThumbnailError("Falha ao gerar miniatura")
+
+
+def render_thumbnail(source: Source, is_pdf: bool, size: Tuple[int, int] = DEFAULT_THUMB_SIZE) -> bytes:
+    """Gera somente a miniatura JPEG (ver `render_thumbnails`)."""
+    return render_thumbnails(source, is_pdf, size)["jpeg"]  # type: ignore[return-value]
+
+
+def store_thumbnails(storage, object_name: str, rendered: Dict[str, object]) -> Tuple[str, List[int]]:
+    """
+    Grava no MinIO o resultado de `render_thumbnails`.
+
+    Returns:
+        (object_name da miniatura JPEG, larguras WebP gravadas)
+    """
+    thumb_name = thumb_object_name(object_name)
+    variants: Dict[int, bytes] = rendered.get("webp") or {}  # type: ignore[assignment]
+    for width, payload in variants.items():
+        storage.put_bytes(variant_object_name(thumb_name, width), payload, content_type='image/webp')
+    # JPEG por último: urlcarta_pq só aponta para conjuntos completos
+    storage.put_bytes(thumb_name, rendered["jpeg"], content_type='image/jpeg')  # type: ignore[arg-type]
+    return thumb_name, sorted(variants)
+
+
+def generate_thumbnail(
+    storage,
+    object_name: str,
+    size: Optional[Tuple[int, int]] = None,
+    widths: Optional[Sequence[int]] = None,
+) -> Tuple[str, List[int]]:
+    """
+    Baixa o anexo, gera a miniatura JPEG e as variantes WebP e grava no MinIO.
+
+    Returns:
+        (object_name da miniatura JPEG, larguras WebP gravadas)
+    """
+    size = size or thumb_size_from_settings()
+    widths = thumb_widths_from_settings() if widths is None else widths
+    with storage.download_to_tempfile(object_name) as path:
+        rendered = render_thumbnails(path, object_name.lower().endswith('.pdf'), size, widths)
+    return store_thumbnails(storage, object_name, rendered)
@@ -0,0 +1,74 @@
+"""
+Cache em memória de URLs assinadas (presigned) do MinIO.
+
+- Chave: (object_name, validade pedida em segundos); cada validade é um "balde"
+  independente, então pedidos de 15 min e de 1 h não compartilham URL.
+- Uma URL é reaproveitada enquanto ainda tiver pelo menos MIN_REMAINING_RATIO da
+  validade pedida; assim quem a recebe sempre tem ao menos metade do prazo e o
+  navegador vê a mesma URL (e reaproveita o download) entre visualizações.
+- Tamanho limitado (LRU); contadores de acertos/faltas em `stats()`.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+
+# Fração mínima da validade que a URL reaproveitada ainda deve ter
+MIN_REMAINING_RATIO = 0.5
+DEFAULT_MAX_ENTRIES = 2048
+
+
+class PresignedUrlCache:
+    """URLs assinadas por (object_name, validade) com reaproveitamento até meia-vida."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, object_name: str, expires_s: int) -> Optional[str]:
+        key = (object_name, int(expires_s))
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] - now >= expires_s * MIN_REMAINING_RATIO:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, object_name: str, expires_s: int, url: str, signed_at: Optional[float] = None) -> None:
+        """Registra a URL; `signed_at` é o instante (relógio do cache) anterior à assinatura."""
+        signed_at = self._clock() if signed_at is None else signed_at
+        with self._lock:
+            self._entries[(object_name, int(expires_s))] = (url, signed_at + expires_s)
+            self._entries.move_to_end((object_name, int(expires_s)))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, object_name: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == object_name]:
+                del self._entries[key]
+
+    def now(self) -> float:
+        return self._clock()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
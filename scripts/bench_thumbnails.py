@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark da geração de miniaturas: tempo por imagem e pico de memória (RSS).
+
+Compara o pipeline anterior (decodificação em resolução total + thumbnail/resize)
+com `render_thumbnails` (draft JPEG + reduce). Cada medição roda em um processo
+novo, para que o pico de RSS reflita apenas aquela imagem.
+
+Uso:
+  python scripts/bench_thumbnails.py DIRETORIO_COM_IMAGENS
+  python scripts/bench_thumbnails.py --generate 4        # gera digitalizações sintéticas (12/48 MP)
+  python scripts/bench_thumbnails.py DIR --widths 120,240,480,960 --size 200x300 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".pdf"}
+
+
+def _max_rss_mb() -> float:
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS em bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _render_naive(data: bytes, size, widths) -> None:
+    """Pipeline anterior: decodifica em resolução total e redimensiona a partir dela."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as im:
+        base = im.convert("RGB")
+    jpeg_im = base.copy()
+    jpeg_im.thumbnail(size)
+    jpeg_im.save(io.BytesIO(), format="JPEG", quality=85)
+    for w in widths:
+        if w < base.width:
+            h = max(1, round(base.height * w / base.width))
+            base.resize((w, h), Image.LANCZOS).save(io.BytesIO(), format="WEBP", quality=80)
+
+
+def _measure(path: str, mode: str, size, widths):
+    """Executado no processo filho: retorna (segundos, RSS antes em MB, pico de RSS em MB)."""
+    from app.services.thumbnail_service import render_thumbnails
+
+    is_pdf = path.lower().endswith(".pdf")
+    data = Path(path).read_bytes() if mode == "naive" else None
+    rss_before = _max_rss_mb()
+    t0 = time.perf_counter()
+    if mode == "naive":
+        if is_pdf:
+            return None
+        _render_naive(data, size, widths)
+    else:
+        # Como em produção: o anexo baixado em arquivo temporário é lido direto do disco
+        render_thumbnails(path, is_pdf, size, widths)
+    return time.perf_counter() - t0, rss_before, _max_rss_mb()
+
+
+def _generate_corpus(target: Path, count: int) -> None:
+    """Digitalizações sintéticas: papel com ruído e linhas de 'escrita', JPEG q90."""
+    from PIL import Image, ImageDraw
+
+    sizes = [(4000, 3000), (8000, 6000)]  # ~12 MP e ~48 MP
+    for i in range(count):
+        w, h = sizes[i % len(sizes)]
+        im = Image.effect_noise((w, h), 24).convert("RGB")
+        draw = ImageDraw.Draw(im)
+        for y in range(h // 20, h, h // 20):
+            draw.line([(w // 20, y), (w - w // 20, y + (i % 7))], fill=(20, 20, 90), width=max(2, w // 800))
+        path = target / f"scan_{i:02d}_{w}x{h}.jpg"
+        im.save(path, format="JPEG", quality=90)
+        print(f"gerado {path.name}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", help="Diretório com imagens/PDFs de exemplo")
+    parser.add_argument("--generate", type=int, default=0, help="Gerar N digitalizações sintéticas")
+    parser.add_argument("--size", default="200x300", help="THUMB_SIZE (LxA)")
+    parser.add_argument("--widths", default="120,240,480,960", help="THUMB_WIDTHS")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições por imagem/modo")
+    args = parser.parse_args()
+
+    from app.services.thumbnail_service import parse_thumb_size, parse_thumb_widths
+
+    size = parse_thumb_size(args.size)
+    widths = parse_thumb_widths(args.widths)
+
+    tmp = None
+    if args.generate:
+        tmp = tempfile.TemporaryDirectory(prefix="bench_thumbs_")
+        corpus = Path(tmp.name)
+        # Gerar em outro processo: o pico de RSS é herdado pelos filhos e distorceria a base
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pool.submit(_generate_corpus, corpus, args.generate).result()
+    elif args.corpus:
+        corpus = Path(args.corpus)
+    else:
+        parser.error("informe um diretório ou --generate N")
+
+    files = sorted(p for p in corpus.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    if not files:
+        print("Nenhuma imagem encontrada.")
+        return 1
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"\n{'arquivo':<36} {'modo':<6} {'tempo (s)':>10} {'RSS base':>9} {'RSS pico':>9}")
+    totals = {"naive": [], "fast": []}
+    for path in files:
+        for mode in ("naive", "fast"):
+            runs = []
+            for _ in range(max(1, args.repeat)):
+                # Um processo por medição: o pico de RSS não acumula entre imagens
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    result = pool.submit(_measure, str(path), mode, size, widths).result()
+                if result is None:
+                    break
+                runs.append(result)
+            if not runs:
+                continue
+            elapsed = statistics.median(r[0] for r in runs)
+            before = max(r[1] for r in runs)
+            peak = max(r[2] for r in runs)
+            totals[mode].append((elapsed, peak))
+            print(f"{path.name[:36]:<36} {mode:<6} {elapsed:>10.3f} {before:>8.0f}M {peak:>8.0f}M")
+
+    for mode, rows in totals.items():
+        if rows:
+            print(
+                f"\n{mode}: tempo médio {statistics.mean(r[0] for r in rows):.3f}s"
+                f" · pico de RSS máximo {max(r[1] for r in rows):.0f}M"
+            )
+    if tmp is not None:
+        tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from app.services.anexos_inventory import object_row, sync_carta
+
+
+def test_object_row_derives_carta_and_kind():
+    when = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    row = object_row({"object_name": "cartas/12/anexo-abc.pdf", "size": 10, "last_modified": when, "checksum": "d41d"})
+    assert row == {
+        "object_name": "cartas/12/anexo-abc.pdf",
+        "id_carta": 12,
+        "size": 10,
+        "content_type": "application/pdf",
+        "last_modified": when,
+        "kind": "original",
+        "checksum": "d41d",
+    }
+    assert object_row({"object_name": "cartas/12/anexo-abc_thumb.jpg"})["kind"] == "thumb"
+    assert object_row({"object_name": "cartas/12/anexo-abc_w240.webp"})["content_type"] == "image/webp"
+
+
+def test_sync_carta_is_best_effort():
+    db = MagicMock()
+    storage = MagicMock()
+    storage.list_objects_info.side_effect = RuntimeError("minio fora")
+    sync_carta(db, storage, 12)  # não propaga
+    storage.list_objects_info.assert_called_once_with("cartas/12/")
+    db.rollback.assert_called_once()
+
+
+def test_report_cache_until_invalidated():
+    from app.services.anexos_inventory import cached_report, invalidate_reports
+
+    invalidate_reports()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [{"object_name": "cartas/1/a.pdf"}]
+
+    assert cached_report("orphans", loader) == cached_report("orphans", loader)
+    assert len(calls) == 1
+    invalidate_reports()
+    cached_report("orphans", loader)
+    assert len(calls) == 2
+
+
+def test_cached_report_drops_load_started_before_invalidation():
+    from app.services.anexos_inventory import cached_report, invalidate_reports
+
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            invalidate_reports()  # objeto apagado enquanto o relatório era montado
+        return [{"object_name": f"cartas/1/a{len(calls)}.pdf"}]
+
+    invalidate_reports()
+    assert cached_report("orphans", loader) == [{"object_name": "cartas/1/a1.pdf"}]
+    assert cached_report("orphans", loader) == [{"object_name": "cartas/1/a2.pdf"}]
+    assert len(calls) == 2
+
+
+def test_reconcile_stats_only_new_objects():
+    from unittest.mock import patch
+    from app.services import anexos_inventory
+
+    storage = MagicMock()
+    storage.list_objects_info.return_value = [
+        {"object_name": "cartas/1/velho.pdf", "size": 1},
+        {"object_name": "cartas/2/novo.png", "size": 2},
+    ]
+    storage._client.return_value.stat_object.return_value = MagicMock(content_type="image/png")
+    repo = MagicMock()
+    repo.known_names.return_value = {"cartas/1/velho.pdf"}
+    repo.sync.return_value = {"upserted": 2, "removed": 0}
+    with patch.object(anexos_inventory, "AnexosRepository", return_value=repo), \
+         patch.object(anexos_inventory, "_normalize_legacy_urls", return_value=0):
+        result = anexos_inventory.reconcile(MagicMock(), storage)
+
+    storage._client.return_value.stat_object.assert_called_once_with(storage.bucket, "cartas/2/novo.png")
+    rows = repo.sync.call_args[0][0]
+    assert [r["content_type"] for r in rows] == ["application/pdf", "image/png"]
+    assert result["listed"] == 2
+
+
+def test_reconcile_only_normalizes_urls_when_asked():
+    from unittest.mock import patch
+    from app.services import anexos_inventory
+
+    storage = MagicMock()
+    storage.list_objects_info.return_value = []
+    repo = MagicMock()
+    repo.known_names.return_value = set()
+    repo.sync.return_value = {"upserted": 0, "removed": 0}
+    with patch.object(anexos_inventory, "AnexosRepository", return_value=repo), \
+         patch.object(anexos_inventory, "_normalize_legacy_urls", return_value=3) as normalize:
+        assert anexos_inventory.reconcile(MagicMock(), storage)["normalized"] == 0
+        normalize.assert_not_called()
+        assert anexos_inventory.reconcile(MagicMock(), storage, normalize_urls=True)["normalized"] == 3
+        normalize.assert_called_once()
+
+
+class _FakeAnexos:
+    def __init__(self, orphans, derived, in_use):
+        self._orphans, self._derived, self._in_use = orphans, derived, in_use
+        self.checked = None
+
+    def orphan_originals(self, names):
+        return set(names) & self._orphans
+
+    def derived_of(self, names):
+        return {n: self._derived.get(n, []) for n in names}
+
+    def referenced_names(self, names):
+        self.checked = set(names)
+        return set(names) & self._in_use
+
+
+def test_deletable_orphans_only_unused_original_orphans():
+    from app.services.anexos_inventory import deletable_orphans
+
+    repo = _FakeAnexos(
+        orphans={"cartas/1/a.pdf", "cartas/2/b.jpg"},
+        derived={"cartas/1/a.pdf": ["cartas/1/a_thumb.jpg", "cartas/1/a_w240.webp"]},
+        # Carta 2 re-enviada: urlcarta_pq ainda aponta a miniatura do anexo antigo
+        in_use={"cartas/2/b_thumb.jpg", "cartas/3/c_thumb.jpg"},
+    )
+    names = ["cartas/1/a.pdf", "cartas/2/b.jpg", "cartas/3/c_thumb.jpg"]
+    targets, derived, skipped = deletable_orphans(repo, names)
+    assert targets == ["cartas/1/a.pdf"]
+    assert derived["cartas/1/a.pdf"] == ["cartas/1/a_thumb.jpg", "cartas/1/a_w240.webp"]
+    assert skipped == {
+        "cartas/2/b.jpg": "Referenciado por cartinha ativa",
+        "cartas/3/c_thumb.jpg": "Não é anexo original órfão no inventário",
+    }
+    assert {"cartas/1/a_thumb.jpg", "cartas/1/a_w240.webp", "cartas/2/b_thumb.jpg"} <= repo.checked
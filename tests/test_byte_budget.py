@@ -0,0 +1,59 @@
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from app.services.byte_budget import ByteBudget
+
+
+def test_budget_blocks_until_bytes_are_released():
+    budget = ByteBudget(100)
+    events = []
+
+    def worker(name, nbytes, hold):
+        with budget.reserve(nbytes):
+            events.append(("in", name, budget.in_flight))
+            time.sleep(hold)
+        events.append(("out", name))
+
+    first = threading.Thread(target=worker, args=("a", 80, 0.2))
+    first.start()
+    time.sleep(0.05)
+    second = threading.Thread(target=worker, args=("b", 50, 0))
+    second.start()
+    first.join()
+    second.join()
+
+    # "b" só entra depois que "a" libera; nunca há mais de 100 bytes em andamento
+    assert [e[:2] for e in events] == [("in", "a"), ("out", "a"), ("in", "b"), ("out", "b")]
+    assert all(e[2] <= 100 for e in events if e[0] == "in")
+    assert budget.in_flight == 0
+
+
+def test_oversized_reservation_runs_alone():
+    budget = ByteBudget(10)
+    with budget.reserve(50):
+        assert budget.in_flight == 50
+    assert budget.in_flight == 0
+
+
+def test_download_to_tempfile_streams_and_cleans_up(monkeypatch, tmp_path):
+    from app.config import get_settings
+    from app.services import storage_service
+
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "key")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "secret")
+    monkeypatch.setattr(get_settings(), "media_cache_dir", str(tmp_path))
+    storage = storage_service.StorageService()
+    client = MagicMock()
+    client.stat_object.return_value = MagicMock(size=6)
+    client.get_object.return_value.stream.return_value = iter([b"abc", b"def"])
+    monkeypatch.setattr(storage, "_client", lambda: client)
+
+    with storage.download_to_tempfile("cartas/1/anexo.pdf") as path:
+        assert path.endswith(".pdf")
+        assert Path(path).read_bytes() == b"abcdef"
+        assert storage.download_budget.in_flight == 6
+    assert not Path(path).exists()
+    assert storage.download_budget.in_flight == 0
+    client.get_object.return_value.release_conn.assert_called_once()
@@ -243,3 +243,112 @@ def test_api_list_cartas(mock_auth_user, mock_cartas_repo):
     assert data[0]["id_carta"] == 101
     assert data[0]["nome"] == "Criança 1"
     assert data[0]["presente"] == "Brinquedo"
+
+
+def _compile(conds):
+    from sqlalchemy import and_
+    from sqlalchemy.dialects import postgresql
+    compiled = and_(*conds).compile(dialect=postgresql.dialect())
+    return str(compiled), list(compiled.params.values())
+
+
+def test_search_filters_use_tsvector_with_prefix_terms():
+    repo = CartasRepository(MagicMock(spec=Session))
+    sql, params = _compile(repo.search_filters("  João  bonec "))
+    assert "search_tsv @@ to_tsquery" in sql
+    assert "João:* & bonec:*" in params
+    assert "ILIKE" not in sql.upper()
+
+
+def test_search_filters_numeric_query_matches_ids():
+    repo = CartasRepository(MagicMock(spec=Session))
+    sql, params = _compile(repo.search_filters("123"))
+    assert "cartas_diversas.id_carta =" in sql and "cartas_diversas.cod_carta =" in sql
+    assert 123 in params
+    assert "search_tsv" not in sql
+    assert repo.search_rank("123") is None
+
+
+def test_name_match_uses_trigram_key_and_escapes_wildcards():
+    repo = CartasRepository(MagicMock(spec=Session))
+    sql, params = _compile([repo.name_match(" 50%_Jão ")])
+    assert "immutable_unaccent(lower(public.cartas_diversas.nome)) LIKE" in sql
+    assert "%%>" in sql
+    assert "50\\%\\_Jão" in params and "50%_Jão" in params
+    sql, _ = _compile([repo.name_match("Jão", fuzzy=False)])
+    assert "%%>" not in sql
+
+
+def test_report_stats_single_grouping_sets_query():
+    db = MagicMock(spec=Session)
+    db.execute.return_value = [
+        ("M", None, None, None, 0b0111, 3),
+        ("F", None, None, None, 0b0111, 2),
+        (None, "adotada", None, None, 0b1011, 4),
+        (None, None, None, None, 0b1011, 1),
+        (None, None, "Correios", "#00FF00", 0b1100, 4),
+        (None, None, None, None, 0b1100, 1),
+        (None, None, None, None, 0b1111, 5),
+    ]
+    repo = CartasRepository(db)
+    stats = repo.report_stats(repo.report_filters(status="adotadas"))
+    assert db.execute.call_count == 1
+    assert "GROUPING SETS" in str(db.execute.call_args[0][0])
+    assert stats == {
+        "total": 5,
+        "sexo": {"M": 3, "F": 2},
+        "status": {"adotada": 4, "indefinido": 1},
+        "grupos": {"Correios": 4, "Sem grupo": 1},
+        "grupos_colors": {"Correios": "#00FF00", "Sem grupo": None},
+    }
+
+
+def test_clear_deleted_attachments_matches_deleted_object_names():
+    db = MagicMock(spec=Session)
+    db.execute.return_value.rowcount = 1
+    repo = CartasRepository(db)
+    assert repo.clear_deleted_attachments(["cartas/7/a.pdf", "cartas/7/a.pdf"]) == 1
+    sql, params = _compile([db.execute.call_args[0][0].whereclause])
+    assert "cartas_diversas.urlcarta = ANY" in sql and "del_bl = true" in sql
+    assert [7] in params and ["cartas/7/a.pdf"] in params
+    from sqlalchemy.dialects import postgresql
+    update_sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "starts_with(public.cartas_diversas.urlcarta_pq" in update_sql
+    assert repo.clear_deleted_attachments([]) == 0
+
+
+def test_set_thumbnail_requires_current_attachment():
+    db = MagicMock(spec=Session)
+    db.execute.return_value.rowcount = 0
+    repo = CartasRepository(db)
+    assert repo.set_thumbnail(7, "cartas/7/old.pdf", "cartas/7/old_thumb.jpg", [240]) is False
+    sql, params = _compile([db.execute.call_args[0][0].whereclause])
+    assert "cartas_diversas.urlcarta =" in sql
+    assert "cartas/7/old.pdf" in params
+
+
+def test_set_thumbnail_matches_legacy_full_url():
+    db = MagicMock(spec=Session)
+    db.execute.return_value.rowcount = 1
+    repo = CartasRepository(db)
+    assert repo.set_thumbnail(7, "cartas/7/a.pdf", "cartas/7/a_thumb.jpg", [240]) is True
+    sql, params = _compile([db.execute.call_args[0][0].whereclause])
+    # 'http://minio:9000/noel/cartas/7/a.pdf?X-Amz-...' → split_part(..., '?', 1) termina em /cartas/7/a.pdf
+    assert "right(split_part(public.cartas_diversas.urlcarta" in sql
+    assert "/cartas/7/a.pdf" in params
+    assert len("/cartas/7/a.pdf") in params
+
+
+def test_recompute_icons_single_update_from_values():
+    db = MagicMock(spec=Session)
+    db.query.return_value.distinct.return_value.all.return_value = [("bola",), ("boneca",)]
+    db.execute.return_value.rowcount = 5
+    with patch("app.repositories.cartas_repository.IconPresenteRepository") as icon_repo:
+        icon_repo.return_value.icons_for_present_texts.return_value = [["fa-futbol"], []]
+        assert CartasRepository(db).recompute_icons() == 5
+    assert db.execute.call_count == 1
+    from sqlalchemy.dialects import postgresql
+    sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "UPDATE public.cartas_diversas SET icons=v.icons" in sql
+    assert "FROM (VALUES (%(param_1)s, %(param_2)s::TEXT[])" in sql
+    assert "WHERE public.cartas_diversas.presente = v.presente" in sql
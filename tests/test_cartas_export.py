@@ -0,0 +1,77 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+import csv
+import io
+import time
+
+import pytest
+
+from app.services import cartas_export
+from app.services.cartas_export import HEADERS, iter_csv, write_xlsx
+
+Row = namedtuple("Row", [
+    "id_carta", "cod_carta", "ds_grupo", "nome", "sexo", "idade", "presente", "status",
+    "adotante_email", "adotante_nome", "entregue_bl", "entregue_em", "entregue_por_nome",
+    "tem_anexo", "tem_miniatura",
+])
+
+ENTREGUE_EM = datetime(2026, 12, 20, 14, 30, tzinfo=timezone.utc)
+
+
+def _rows(n):
+    for i in range(1, n + 1):
+        yield Row(i, None, "Correios", f"Criança {i}", "F", 7, "Bola; azul", "entregue",
+                  "a@b.com", "Ana", True, ENTREGUE_EM, "Admin", True, False)
+
+
+def test_csv_has_bom_header_and_semicolons():
+    data = b"".join(iter_csv(_rows(2))).decode("utf-8")
+    assert data.startswith("\ufeff")
+    lines = list(csv.reader(io.StringIO(data[1:]), delimiter=";"))
+    assert lines[0] == HEADERS
+    assert lines[1] == [
+        "1", "", "Correios", "Criança 1", "F", "7", "Bola; azul", "entregue",
+        "a@b.com", "Ana", "Sim", ENTREGUE_EM.astimezone().strftime("%d/%m/%Y %H:%M"), "Admin", "Sim", "Não",
+    ]
+    assert len(lines) == 3
+
+
+def test_csv_is_yielded_in_batches(monkeypatch):
+    monkeypatch.setattr(cartas_export, "EXPORT_BATCH", 10)
+    chunks = list(iter_csv(_rows(25)))
+    assert len(chunks) == 3
+    assert sum(c.count(b"\n") for c in chunks) == 26
+
+
+def test_xlsx_write_only_roundtrip(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = tmp_path / "r.xlsx"
+    write_xlsx(_rows(3), str(path))
+    rows = list(openpyxl.load_workbook(path, read_only=True).active.iter_rows(values_only=True))
+    assert list(rows[0]) == HEADERS
+    assert len(rows) == 4
+    assert rows[1][3] == "Criança 1"
+    assert rows[1][11] == ENTREGUE_EM.astimezone().replace(tzinfo=None)
+
+
+def test_formula_like_text_is_neutralized(tmp_path, monkeypatch):
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    try:
+        row = next(_rows(1))._replace(nome="=HYPERLINK(\"http://x\")", presente="+1", adotante_nome="@SUM(A1)")
+        values = cartas_export.row_values(row)
+        assert values[3] == "'=HYPERLINK(\"http://x\")"
+        assert values[6] == "'+1" and values[9] == "'@SUM(A1)"
+        assert cartas_export.safe_cell("-2") == "'-2" and cartas_export.safe_cell("\tx") == "'\tx"
+        assert cartas_export.safe_cell("Ana") == "Ana" and cartas_export.safe_cell(7) == 7
+        # 14:30 UTC = 11:30 em Brasília
+        assert values[11].strftime("%H:%M") == "11:30"
+
+        openpyxl = pytest.importorskip("openpyxl")
+        path = tmp_path / "r.xlsx"
+        write_xlsx([row], str(path))
+        cell = openpyxl.load_workbook(path).active["D2"]
+        assert cell.data_type == "s" and cell.value.startswith("'=")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.main import app
+from app.db import get_db, get_async_db
+
+
+@pytest.fixture
+def mock_db():
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    app.dependency_overrides[get_async_db] = lambda: MagicMock()
+    yield
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_async_db, None)
+
+
+@pytest.mark.asyncio
+async def test_slow_thumbnail_does_not_block_cartas_list(mock_db):
+    """Uma miniatura lenta (MinIO bloqueante) não deve travar o carregamento de /cartas."""
+    def slow_open_object(*args, **kwargs):
+        time.sleep(1.0)  # chamada síncrona bloqueante, como o cliente minio
+        return MagicMock(headers={"Content-Type": "image/jpeg"})
+
+    storage = MagicMock()
+    storage.open_object.side_effect = slow_open_object
+    storage.cached_path.return_value = None
+    storage.cache_object.return_value = None
+    storage.iter_object.side_effect = lambda obj: iter([b"jpeg"])
+    repo = MagicMock()
+    repo.get_by_id_carta.return_value = MagicMock(urlcarta_pq="cartas/1/anexo_thumb.jpg")
+    async_repo = MagicMock()
+    async_repo.status_filters.return_value = []
+    async_repo.page_with_total = AsyncMock(return_value=([], 0))
+
+    with patch("app.routers.cartas.get_storage_service", return_value=storage), \
+         patch("app.routers.cartas.CartasRepository", return_value=repo), \
+         patch("app.routers.cartas.AsyncCartasRepository", return_value=async_repo):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            t0 = time.perf_counter()
+
+            async def timed(url):
+                resp = await ac.get(url)
+                return resp, time.perf_counter() - t0
+
+            slow_task = asyncio.create_task(timed("/cartas/miniatura/1"))
+            await asyncio.sleep(0.1)  # garantir que a miniatura já está em andamento
+            list_resp, list_done_at = await timed("/cartas/")
+            slow_resp, slow_done_at = await slow_task
+
+    assert slow_resp.status_code == 200
+    assert list_resp.status_code == 200
+    assert slow_done_at >= 1.0
+    # A listagem termina enquanto a miniatura ainda está bloqueada no threadpool
+    assert list_done_at < 0.8
@@ -0,0 +1,20 @@
+from app.config import get_settings, reload_settings
+
+
+def test_get_settings_is_cached():
+    assert get_settings() is get_settings()
+
+
+def test_reload_settings_rereads_environment(monkeypatch):
+    before = get_settings()
+    monkeypatch.setenv("THUMB_SIZE", "120x180")
+    # Sem reload, o valor em cache é mantido
+    assert get_settings() is before
+    reloaded = reload_settings()
+    try:
+        assert reloaded is not before
+        assert reloaded.thumb_size == "120x180"
+        assert get_settings() is reloaded
+    finally:
+        monkeypatch.undo()
+        reload_settings()
@@ -0,0 +1,50 @@
+import os
+
+from app.services.disk_cache import DiskCache
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    path = cache.put("cartas/1/a.jpg", [b"abc", b"def"], mtime=1_700_000_000)
+    assert cache.get("cartas/1/a.jpg") == path
+    with open(path, "rb") as fh:
+        assert fh.read() == b"abcdef"
+    assert os.stat(path).st_mtime == 1_700_000_000
+    assert cache.total_bytes == 6
+    # Nenhum temporário sobra no diretório
+    assert not [n for _r, _d, files in os.walk(tmp_path) for n in files if n.startswith(".tmp-")]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), 800)  # até 100 bytes por entrada
+    for name in ("a", "b", "c", "d", "e", "f", "g", "h"):
+        cache.put(name, [b"x" * 100])
+    assert cache.get("a")  # "a" passa a ser o mais recente
+    cache.put("i", [b"x" * 100])
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("i")
+    assert cache.total_bytes <= 800
+
+
+def test_skips_objects_above_entry_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), 800)
+    assert cache.put("big", [b"x" * 60, b"x" * 60]) is None
+    assert cache.get("big") is None
+    assert cache.total_bytes == 0
+
+
+def test_invalidate_is_seen_by_other_instances(tmp_path):
+    first = DiskCache(str(tmp_path), 1000)
+    second = DiskCache(str(tmp_path), 1000)
+    first.put("cartas/1/a_thumb.jpg", [b"old"])
+    assert second.get("cartas/1/a_thumb.jpg")
+    first.invalidate("cartas/1/a_thumb.jpg")
+    assert second.get("cartas/1/a_thumb.jpg") is None
+    assert second.total_bytes == 0
+
+
+def test_reload_indexes_existing_files(tmp_path):
+    DiskCache(str(tmp_path), 1000).put("cartas/1/a.jpg", [b"abc"])
+    reopened = DiskCache(str(tmp_path), 1000)
+    assert reopened.total_bytes == 3
+    assert reopened.get("cartas/1/a.jpg")
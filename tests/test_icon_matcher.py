@@ -0,0 +1,32 @@
+from app.services.icon_matcher import IconMatcher
+
+
+MAPPINGS = [
+    ("boneca, barbie", "fa-solid fa-person-dress"),
+    ("bola", "fa-solid fa-futbol"),
+    ("bicicleta,bike", "fa-solid fa-bicycle"),
+    ("carrinho", "fa-car"),
+    ("", "fa-solid fa-ghost"),  # sem palavra-chave: nunca deve casar
+    ("jogo, quebra-cabeça", "fa-solid fa-puzzle-piece"),
+]
+
+
+def test_match_accent_and_case_insensitive():
+    matcher = IconMatcher(MAPPINGS)
+    assert matcher.match("Uma BONECA e um Quebra-Cabeca") == ["person-dress", "puzzle-piece"]
+
+
+def test_match_preserves_mapping_order_and_dedupes():
+    matcher = IconMatcher(MAPPINGS + [("bolinha", "fa-solid fa-futbol")])
+    # 'bola' e 'bolinha' mapeiam para o mesmo ícone
+    assert matcher.match("carrinho, bolinha e bola") == ["futbol", "car"]
+
+
+def test_match_overlapping_keywords():
+    matcher = IconMatcher([("bicicleta", "fa-bicycle"), ("cleta", "fa-x"), ("ta", "fa-y")])
+    assert matcher.match("bicicleta") == ["bicycle", "x", "y"]
+
+
+def test_match_many_and_empty_texts():
+    matcher = IconMatcher(MAPPINGS)
+    assert matcher.match_many(["bike", "", None, "nada"]) == [["bicycle"], [], [], []]
@@ -0,0 +1,139 @@
+from email.utils import parsedate_to_datetime
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.disk_cache import DiskCache
+from app.services.media_delivery import CACHE_IMMUTABLE, CACHE_REVALIDATE, media_response, media_version
+
+OBJECT = "cartas/10/anexo-abc_thumb.jpg"
+LAST_MODIFIED = "Wed, 14 Oct 2026 12:00:00 GMT"
+
+
+class _FakeObject:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.headers = {
+            "Content-Type": "image/jpeg",
+            "Content-Length": str(len(data)),
+            "Last-Modified": LAST_MODIFIED,
+        }
+        self.closed = False
+
+
+class _FakeStorage:
+    def __init__(self, cache=None) -> None:
+        self.opened = 0
+        self.last = None
+        self.cache = cache
+
+    def cached_path(self, object_name):
+        return self.cache.get(object_name) if self.cache else None
+
+    def cache_object(self, object_name, obj):
+        if not self.cache:
+            return None
+        return self.cache.put(object_name, self.iter_object(obj), mtime=parsedate_to_datetime(LAST_MODIFIED).timestamp())
+
+    def open_object(self, object_name):
+        self.opened += 1
+        self.last = _FakeObject(b"jpeg-bytes")
+        return self.last
+
+    def close_object(self, obj):
+        obj.closed = True
+
+    def iter_object(self, obj):
+        try:
+            yield obj.data
+        finally:
+            self.close_object(obj)
+
+
+def _client(storage):
+    app = FastAPI()
+
+    @app.get("/m")
+    def m(request: Request, v: str = None):
+        return media_response(request, storage, OBJECT, version=v, current_version=media_version(OBJECT))
+
+    return TestClient(app)
+
+
+def test_streams_object_with_cache_headers():
+    storage = _FakeStorage()
+    resp = _client(storage).get("/m", params={"v": media_version(OBJECT)})
+    assert resp.status_code == 200
+    assert resp.content == b"jpeg-bytes"
+    assert resp.headers["etag"] == f'"{media_version(OBJECT)}"'
+    assert resp.headers["last-modified"] == LAST_MODIFIED
+    assert resp.headers["cache-control"] == CACHE_IMMUTABLE
+    assert storage.last.closed
+
+
+def test_unversioned_url_must_revalidate():
+    resp = _client(_FakeStorage()).get("/m", params={"v": "antiga"})
+    assert resp.headers["cache-control"] == CACHE_REVALIDATE
+
+
+def test_if_none_match_answers_304_without_minio():
+    storage = _FakeStorage()
+    resp = _client(storage).get("/m", headers={"If-None-Match": f'W/"x", "{media_version(OBJECT)}"'})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert storage.opened == 0
+
+
+def test_if_modified_since_answers_304():
+    storage = _FakeStorage()
+    resp = _client(storage).get("/m", headers={"If-Modified-Since": "Thu, 15 Oct 2026 00:00:00 GMT"})
+    assert resp.status_code == 304
+    assert storage.last.closed
+
+    resp = _client(storage).get("/m", headers={"If-Modified-Since": "Tue, 13 Oct 2026 00:00:00 GMT"})
+    assert resp.status_code == 200
+
+
+def test_second_request_is_served_from_disk_cache(tmp_path):
+    storage = _FakeStorage(DiskCache(str(tmp_path), 1024 * 1024))
+    client = _client(storage)
+    first = client.get("/m")
+    second = client.get("/m")
+    assert first.content == second.content == b"jpeg-bytes"
+    assert storage.opened == 1
+    assert second.headers["content-type"] == "image/jpeg"
+    assert second.headers["etag"] == f'"{media_version(OBJECT)}"'
+    assert second.headers["last-modified"] == LAST_MODIFIED
+
+
+def test_cache_write_error_falls_back_to_minio_stream(tmp_path):
+    class _FullDisk(_FakeStorage):
+        def cache_object(self, object_name, obj):
+            next(self.iter_object(obj))  # parte da resposta já consumida
+            raise OSError(28, "No space left on device")
+
+    storage = _FullDisk(DiskCache(str(tmp_path), 1024 * 1024))
+    response = _client(storage).get("/m")
+    assert response.status_code == 200
+    assert response.content == b"jpeg-bytes"
+    assert storage.opened == 2
+    assert response.headers["etag"] == f'"{media_version(OBJECT)}"'
+
+
+def test_regenerated_thumbnail_gets_new_version_and_etag():
+    from datetime import datetime, timezone
+
+    first = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    second = datetime(2026, 10, 2, tzinfo=timezone.utc)
+    assert media_version(OBJECT, first) != media_version(OBJECT, second) != media_version(OBJECT)
+
+    app = FastAPI()
+
+    @app.get("/m")
+    def m(request: Request):
+        return media_response(request, _FakeStorage(), OBJECT, generation=second)
+
+    # ETag da geração anterior não vale mais: conteúdo novo, não 304
+    resp = TestClient(app).get("/m", headers={"If-None-Match": f'"{media_version(OBJECT, first)}"'})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] == f'"{media_version(OBJECT, second)}"'
@@ -0,0 +1,63 @@
+import io
+
+import fitz
+from PIL import Image
+
+from app.services.pdf_utils import first_page_thumbnail_source, render_zoom
+from app.services.thumbnail_service import render_thumbnails
+
+
+def _text_pdf() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((72, 72), "Querido Papai Noel, eu queria uma bicicleta.")
+    return doc.tobytes()
+
+
+def _scanned_pdf(fmt: str = "JPEG", size=(2480, 3508)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (220, 215, 200)).save(buf, format=fmt)
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=buf.getvalue())
+    return doc.tobytes()
+
+
+def test_render_zoom_fits_box_and_min_width():
+    assert render_zoom(595, 842, (200, 300)) == min(200 / 595, 300 / 842)
+    assert render_zoom(595, 842, (200, 300), min_width=960) == 960 / 595
+    assert render_zoom(595, 842, (200, 300), min_width=100000) == 4.0
+
+
+def test_text_pdf_is_rendered_at_output_size():
+    ext, data = first_page_thumbnail_source(_text_pdf(), (200, 300), 480)
+    assert ext == "ppm"
+    with Image.open(io.BytesIO(data)) as im:
+        assert im.width == 480
+
+
+def test_scanned_jpeg_pdf_is_extracted():
+    ext, data = first_page_thumbnail_source(_scanned_pdf(), (200, 300), 480)
+    assert ext in ("jpeg", "jpg")
+    with Image.open(io.BytesIO(data)) as im:
+        assert im.size == (2480, 3508)
+
+
+def test_large_non_jpeg_scan_is_rendered():
+    ext, _data = first_page_thumbnail_source(_scanned_pdf("PNG"), (200, 300), 240)
+    assert ext == "ppm"
+
+
+def test_text_pdf_thumbnail():
+    rendered = render_thumbnails(_text_pdf(), True, (200, 300), [120, 240])
+    assert sorted(rendered["webp"]) == [120, 240]
+    with Image.open(io.BytesIO(rendered["jpeg"])) as im:
+        assert im.width <= 200 and im.height <= 300
+
+
+def test_thumbnail_from_file_path(tmp_path):
+    pdf_path = tmp_path / "carta.pdf"
+    pdf_path.write_bytes(_scanned_pdf())
+    rendered = render_thumbnails(str(pdf_path), True, (200, 300), [120])
+    with Image.open(io.BytesIO(rendered["jpeg"])) as im:
+        assert im.size == (200, 283)
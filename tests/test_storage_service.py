@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock
+
+from minio.deleteobjects import DeleteError
+
+from app.config import get_settings
+from app.services import storage_service
+
+
+def _storage(monkeypatch, tmp_path, client):
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "key")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "secret")
+    # Cache local na pasta do teste, não em /tmp/noel-media-cache
+    monkeypatch.setattr(get_settings(), "media_cache_dir", str(tmp_path))
+    storage = storage_service.StorageService()
+    monkeypatch.setattr(storage, "_client", lambda: client)
+    return storage
+
+
+def test_delete_objects_batches_and_reports_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage_service, "DELETE_BATCH", 2)
+    batches = []
+
+    def remove_objects(bucket, objects):
+        names = [o._name for o in objects]
+        batches.append(names)
+        if "cartas/2/b.pdf" in names:
+            yield DeleteError("AccessDenied", "Acesso negado", "cartas/2/b.pdf", None)
+
+    client = MagicMock()
+    client.remove_objects.side_effect = remove_objects
+    storage = _storage(monkeypatch, tmp_path, client)
+
+    result = storage.delete_objects(["cartas/1/a.pdf", "cartas/2/b.pdf", "cartas/3/c.pdf", "cartas/1/a.pdf"])
+
+    assert batches == [["cartas/1/a.pdf", "cartas/2/b.pdf"], ["cartas/3/c.pdf"]]
+    assert result == {"cartas/1/a.pdf": None, "cartas/2/b.pdf": "Acesso negado", "cartas/3/c.pdf": None}
@@ -0,0 +1,117 @@
+import io
+import pickle
+
+import pytest
+from PIL import Image
+
+from app.services.thumbnail_jobs import ThumbnailJob
+from app.services.thumbnail_service import (
+    ThumbnailError,
+    id_carta_from_object,
+    is_derived_object,
+    parse_thumb_size,
+    parse_thumb_widths,
+    pick_width,
+    render_thumbnail,
+    render_thumbnails,
+    thumb_object_name,
+    variant_object_name,
+)
+
+
+def _png_bytes(size=(800, 600)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_render_thumbnail_fits_requested_box():
+    out = render_thumbnail(_png_bytes(), False, (200, 300))
+    with Image.open(io.BytesIO(out)) as im:
+        assert im.format == "JPEG"
+        assert im.size == (200, 150)
+
+
+def test_render_thumbnails_webp_variants_without_upscaling():
+    rendered = render_thumbnails(_png_bytes((800, 600)), False, (200, 300), [120, 480, 960, 1920])
+    # 960 e 1920 passam da largura original: uma variante só, registrada como 800
+    assert sorted(rendered["webp"]) == [120, 480, 800]
+    for width, payload in rendered["webp"].items():
+        with Image.open(io.BytesIO(payload)) as im:
+            assert im.format == "WEBP"
+            assert im.width == width
+    with Image.open(io.BytesIO(rendered["webp"][120])) as im:
+        assert im.size == (120, 90)
+    with Image.open(io.BytesIO(rendered["jpeg"])) as im:
+        assert im.size == (200, 150)
+
+
+def test_render_thumbnail_invalid_image():
+    with pytest.raises(ThumbnailError) as exc:
+        render_thumbnail(b"nao e imagem", False, (200, 300))
+    assert exc.value.status_code == 400
+
+
+def test_thumbnail_error_survives_pickle():
+    err = pickle.loads(pickle.dumps(ThumbnailError("Módulo de PDF indisponível", status_code=500)))
+    assert str(err) == "Módulo de PDF indisponível"
+    assert err.status_code == 500
+
+
+def test_names_and_sizes():
+    assert parse_thumb_size("150x200") == (150, 200)
+    assert parse_thumb_size("lixo") == (200, 300)
+    assert thumb_object_name("cartas/10/anexo-abc.png") == "cartas/10/anexo-abc_thumb.jpg"
+    assert id_carta_from_object("cartas/10/anexo-abc.png") == 10
+    assert id_carta_from_object("outros/anexo.png") is None
+    assert parse_thumb_widths("480, 120w,240,lixo") == [120, 240, 480]
+    assert parse_thumb_widths("") == [120, 240, 480, 960]
+    assert variant_object_name("cartas/10/anexo-abc_thumb.jpg", 240) == "cartas/10/anexo-abc_w240.webp"
+    assert pick_width([120, 240, 480], 200) == 240
+    assert pick_width([120, 240, 480], 2000) == 480
+    assert pick_width([], 200) is None
+    assert is_derived_object("cartas/10/anexo-abc_thumb.jpg")
+    assert is_derived_object("cartas/10/anexo-abc_w480.webp")
+    assert not is_derived_object("cartas/10/anexo-abc.webp")
+
+
+def test_job_progress():
+    job = ThumbnailJob(["a.png", "b.pdf"], (200, 300), [120, 240])
+    assert job.status == "queued"
+    job.mark_started()
+    assert job.record_success("a.png") is False
+    assert job.record_failure("b.pdf", "PDF sem imagem embutida na 1ª página") is True
+    data = job.to_dict()
+    assert data["status"] == "finished"
+    assert (data["done"], data["succeeded"], data["failed"]) == (2, 1, 1)
+    assert data["failures"][0]["object_name"] == "b.pdf"
+
+
+def test_upload_and_enqueue_thumbnail(monkeypatch, tmp_path):
+    from unittest.mock import MagicMock
+
+    from app.config import get_settings
+    from app.services import storage_service, thumbnail_jobs
+
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "key")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "secret")
+    monkeypatch.setattr(get_settings(), "media_cache_dir", str(tmp_path))
+    storage = storage_service.StorageService()
+    monkeypatch.setattr(storage, "_ensure_bucket", lambda: None)
+    monkeypatch.setattr(storage, "_client", lambda: MagicMock())
+    jobs = MagicMock()
+    monkeypatch.setattr(thumbnail_jobs, "get_thumbnail_jobs", lambda: jobs)
+
+    upload = MagicMock(filename="carta.png", content_type="image/png")
+    upload.file = io.BytesIO(_png_bytes())
+    object_name = storage.upload_carta_anexo(10, upload)
+
+    assert object_name.startswith("cartas/10/anexo-")
+    # Só depois do commit de urlcarta (feito pelo router)
+    jobs.submit.assert_not_called()
+    assert storage.enqueue_thumbnail(object_name, generate_thumbnail=True)
+    jobs.submit.assert_called_once_with([object_name])
+
+    jobs.reset_mock()
+    assert not storage.enqueue_thumbnail(object_name, generate_thumbnail=False)
+    jobs.submit.assert_not_called()
@@ -0,0 +1,43 @@
+from app.services.url_cache import PresignedUrlCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_reuses_url_until_half_life():
+    clock = _Clock()
+    cache = PresignedUrlCache(clock=clock)
+    assert cache.get("cartas/1/a.jpg", 900) is None
+    cache.put("cartas/1/a.jpg", 900, "http://minio/a?sig=1")
+
+    clock.now += 400
+    assert cache.get("cartas/1/a.jpg", 900) == "http://minio/a?sig=1"
+    # Restam menos de 450s: gerar uma nova
+    clock.now += 100
+    assert cache.get("cartas/1/a.jpg", 900) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_expiry_buckets_are_independent():
+    cache = PresignedUrlCache(clock=_Clock())
+    cache.put("cartas/1/a.jpg", 900, "curta")
+    assert cache.get("cartas/1/a.jpg", 3600) is None
+    assert cache.get("cartas/1/a.jpg", 900) == "curta"
+
+
+def test_bounded_lru_and_discard():
+    cache = PresignedUrlCache(max_entries=2, clock=_Clock())
+    cache.put("a", 900, "ua")
+    cache.put("b", 900, "ub")
+    assert cache.get("a", 900) == "ua"
+    cache.put("c", 900, "uc")
+    assert cache.get("b", 900) is None
+    cache.discard("a")
+    assert cache.get("a", 900) is None
+    assert cache.stats()["size"] == 1